@@ -76,6 +76,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "survey.idempotency.IdempotencyMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -133,6 +134,40 @@ else:
         }
     }
 
+# SQLite (développement, benchmarks) : transactions IMMEDIATE, le verrou
+# d'écriture est pris dès BEGIN et attendu (timeout) au lieu d'échouer avec
+# « database is locked » quand deux transactions écrivent en même temps.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"].setdefault("OPTIONS", {}).update({"transaction_mode": "IMMEDIATE", "timeout": 20})
+
+
+# Cache (définitions d'enquêtes et résumés, voir survey/cache.py)
+# LocMemCache est propre à chaque processus : en production multi-processus,
+# définir REDIS_URL (ex. redis://localhost:6379/0, paquet `redis` requis).
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "market-survey",
+        }
+    }
+
+SURVEY_CACHE_TIMEOUT = int(os.getenv("SURVEY_CACHE_TIMEOUT", 300))
+
+# Écriture différée des soumissions publiques (voir survey/spool.py) :
+# lancer aussi `python manage.py drain_submissions`.
+SUBMISSION_SPOOL_ENABLED = os.getenv("SUBMISSION_SPOOL_ENABLED", "False") == "True"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,87 @@
+# survey/analytics.py
+"""
+Agrégations des réponses d'une enquête.
+
+Toutes les fonctions travaillent en un nombre constant de requêtes, quel que
+soit le nombre de questions ou de choix de l'enquête.
+"""
+from collections import defaultdict
+
+from django.db.models import Count
+
+from .models import Response
+from . import cache, tallies
+
+CHOICE_TYPES = ("single", "multiple")
+
+
+def choice_counts(survey):
+    """
+    Retourne {choice_id: nombre de réponses ayant sélectionné ce choix}.
+    Une seule requête groupée sur la table de liaison Response.selected_choices.
+    """
+    through = Response.selected_choices.through
+    rows = (
+        through.objects.filter(response__survey=survey)
+        .values("choice_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    return {row["choice_id"]: row["n"] for row in rows}
+
+
+def free_text_answers(survey):
+    """
+    Retourne {question_id: [answer_text, ...]} pour les questions hors choix
+    (texte libre, numérique). Une seule requête.
+    """
+    answers = defaultdict(list)
+    rows = (
+        Response.objects.filter(survey=survey)
+        .exclude(question__question_type__in=CHOICE_TYPES)
+        .exclude(answer_text="")
+        .order_by("id")
+        .values_list("question_id", "answer_text")
+    )
+    for question_id, answer_text in rows:
+        if answer_text and str(answer_text).strip():
+            answers[question_id].append(answer_text)
+    return answers
+
+
+def build_chart_data(survey, counts=None):
+    """
+    Construit la structure attendue par les graphiques du résumé :
+      - choix : {"text", "type", "labels", "data"}
+      - autres : {"text", "type", "answers"}
+
+    `counts` permet de fournir des comptes déjà calculés ({choice_id: n}).
+    """
+    if counts is None:
+        counts = choice_counts(survey)
+    answers = free_text_answers(survey)
+
+    chart_data = []
+    for question in survey.questions.prefetch_related("choices"):
+        entry = {"id": question.id, "text": question.text, "type": question.question_type}
+        if question.question_type in CHOICE_TYPES:
+            choices = list(question.choices.all())
+            entry["labels"] = [c.text for c in choices]
+            entry["data"] = [counts.get(c.id, 0) for c in choices]
+        else:
+            entry["answers"] = answers.get(question.id, [])
+        chart_data.append(entry)
+    return chart_data
+
+
+def cached_chart_data(survey):
+    """
+    build_chart_data() à partir des compteurs ChoiceTally, à travers le cache :
+    invalidé par toute modification de la définition ou des réponses.
+    """
+    return cache.get_or_compute(
+        survey,
+        "chart_data",
+        lambda: build_chart_data(survey, counts=tallies.choice_counts(survey)),
+        depends_on=(cache.DEFINITION, cache.RESPONSES),
+    )
@@ -1,25 +1,44 @@
 # survey/api_views.py
 import json
 import logging
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count
 from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.http import FileResponse
+from django.urls import reverse
 
 from django.contrib.auth import get_user_model
 
-from .models import Survey, Response as SurveyResponse, Respondent, Question, Choice
+from .models import Survey, Response as SurveyResponse, Respondent, Question, ExportJob
 from .serializers import (
     SurveySerializer,
     ResponseSerializer,
     RespondentSerializer,
     RespondentSyncSerializer,
+    BatchSyncSerializer,
+    SurveyReadSerializer,
+    ExportJobSerializer,
+    survey_read_queryset,
+    requested_fields,
+    flat_requested,
 )
+from .analytics import cached_chart_data
+from . import dashboard, export_jobs, rollups, spool, tallies, wordclouds
+from .sync import sync_interviews, STATUS_ERROR, STATUS_STALE
+from .changes import changes_since, InvalidCursor
+from .pagination import KeysetPagination
+from .conditional import not_modified, set_validators, survey_validators
+from .ingest import ingest_responses, MODES as INGEST_MODES, MODE_ATOMIC, MODE_PARTIAL
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 
 logger = logging.getLogger(__name__)
@@ -34,13 +53,31 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return getattr(obj, "owner", None) == request.user
 
 
+def _parse_bound(raw, tzinfo):
+    """ISO date or datetime -> aware datetime (naive values in `tzinfo`), or None."""
+    try:
+        moment = parse_datetime(raw)
+        if moment is None:
+            day = parse_date(raw)
+            moment = datetime.combine(day, datetime.min.time()) if day is not None else None
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, tzinfo)
+    return moment
+
+
 class SurveyViewSet(viewsets.ModelViewSet):
     queryset = Survey.objects.all().prefetch_related("questions__choices")
     serializer_class = SurveySerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["owner"]
 
+    # lecture : sérialisation directe en dict (SurveyReadSerializer)
+    read_actions = ("list", "retrieve", "summary")
+
     # allow JSON + multipart (for image upload)
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
@@ -58,6 +95,17 @@ class SurveyViewSet(viewsets.ModelViewSet):
     # Public : rien
         return Survey.objects.all()
 
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return SurveyReadSerializer
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.read_actions:
+            queryset = survey_read_queryset(queryset)
+        return queryset
+
     def get_serializer(self, *args, **kwargs):
         """
         Decode 'questions' when request is multipart/form-data and questions arrives as a JSON string.
@@ -84,11 +132,143 @@ class SurveyViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def definition_validators(self):
+        """ETag / Last-Modified de la définition, lus sur la seule ligne Survey (périmètre de get_queryset)."""
+        try:
+            return survey_validators(self.get_queryset(), self.kwargs[self.lookup_field], "survey")
+        except (TypeError, ValueError):
+            return None  # pk invalide : get_object() renverra 404
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.definition_validators()
+        cached = not_modified(request, validators)
+        if cached is not None:
+            return cached
+        response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, validators) if validators else response
+
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticatedOrReadOnly])
     def summary(self, request, pk=None):
+        validators = self.definition_validators()
+        cached = not_modified(request, validators)
+        if cached is not None:
+            return cached
         survey = self.get_object()
         serializer = self.get_serializer(survey)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), validators)
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def analytics(self, request, pk=None):
+        """
+        GET /api/surveys/<id>/analytics/
+        Choice counts and free-text answers per question (same payload as the HTML summary charts).
+        Owner or staff only, like the HTML summary: 404 for anyone else (get_queryset).
+        """
+        survey = self.get_object()
+        return Response(
+            {
+                "survey_id": survey.id,
+                "respondents": survey.respondents.count(),
+                "questions": cached_chart_data(survey),
+            }
+        )
+
+    @action(detail=True, methods=["post"], url_path="exports", permission_classes=[IsAuthenticated, IsOwnerOrReadOnly])
+    def start_export(self, request, pk=None):
+        """
+        POST /api/surveys/<id>/exports/  Body: {"format": "xlsx" | "csv" | "parquet" | "arrow" | "pdf"}
+        Queues the export (202); poll GET /api/exports/<job_id>/ then download from its download_url.
+        """
+        survey = self.get_object()
+        fmt = request.data.get("format", "xlsx")
+        if fmt not in export_jobs.available_formats():
+            return Response(
+                {"format": [f"Format invalide. Formats disponibles : {', '.join(export_jobs.available_formats())}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        job = export_jobs.enqueue(survey, request.user, fmt)
+        data = ExportJobSerializer(job, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": reverse("api-exports-detail", args=[job.id])})
+
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def timeseries(self, request, pk=None):
+        """
+        GET /api/surveys/<id>/timeseries/?interval=hour|day|week&start=&end=&by=interviewer&tz=
+        Respondents and responses per period, read from the hourly rollups.
+        start/end: ISO date or datetime (default: the last 7 days); tz: IANA name
+        used for day/week boundaries (default: TIME_ZONE). Empty periods are omitted.
+        """
+        survey = self.get_object()
+        params = request.query_params
+        interval = params.get("interval", "hour")
+        if interval not in rollups.INTERVALS:
+            return Response({"interval": [f"Choose one of: {', '.join(rollups.INTERVALS)}."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            tzinfo = ZoneInfo(params["tz"]) if params.get("tz") else timezone.get_current_timezone()
+        except (ZoneInfoNotFoundError, ValueError):
+            return Response({"tz": ["Unknown time zone."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        bounds = {}
+        for name in ("start", "end"):
+            if params.get(name):
+                bounds[name] = _parse_bound(params[name], tzinfo)
+                if bounds[name] is None:
+                    return Response({name: ["Expected an ISO date or datetime."]}, status=status.HTTP_400_BAD_REQUEST)
+        end = bounds.get("end") or timezone.now()
+        start = bounds.get("start") or end - timedelta(days=7)
+        max_days = getattr(settings, "TIMESERIES_MAX_DAYS", 366)
+        if not start < end or end - start > timedelta(days=max_days):
+            return Response({"detail": f"start must precede end, at most {max_days} days apart."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        by_interviewer = params.get("by") == "interviewer"
+        return Response(
+            {
+                "survey_id": survey.id,
+                "interval": interval,
+                "start": start,
+                "end": end,
+                "series": rollups.series(survey, start, end, interval, by_interviewer, tzinfo),
+            }
+        )
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Export jobs of the current user (admins see all).
+      - GET /api/exports/<id>/           status and progress
+      - GET /api/exports/<id>/download/  file, once status is "done" and until expires_at
+    """
+    queryset = ExportJob.objects.select_related("survey").exclude(format=wordclouds.WORDCLOUD)
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff or user.is_superuser:
+            return self.queryset
+        return self.queryset.filter(requested_by=user)
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status == export_jobs.EXPIRED or (job.expires_at and job.expires_at <= timezone.now()):
+            return Response({"detail": "Export expiré, relancez-le."}, status=status.HTTP_410_GONE)
+        if job.status != export_jobs.DONE or not os.path.exists(job.file_path):
+            return Response(
+                {"detail": f"Export non disponible (statut : {job.status}).", "progress": job.progress},
+                status=status.HTTP_409_CONFLICT,
+            )
+        extension, content_type, _, _ = export_jobs.FORMATS[job.format]
+        return FileResponse(
+            open(job.file_path, "rb"),
+            as_attachment=True,
+            filename=f"{job.survey.title}_export.{extension}",
+            content_type=content_type,
+        )
 
 
 class RespondentViewSet(viewsets.ModelViewSet):
@@ -98,14 +278,24 @@ class RespondentViewSet(viewsets.ModelViewSet):
     queryset = Respondent.objects.all().select_related("survey")
     serializer_class = RespondentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["survey"]
 
+    def perform_update(self, serializer):
+        # rollups are keyed by interviewer name: move them along with a rename
+        with transaction.atomic():
+            old_name = Respondent.objects.select_for_update().values_list("interviewer_name", flat=True).get(
+                pk=serializer.instance.pk
+            )
+            respondent = serializer.save()
+            rollups.rename_respondents([(respondent, old_name)])
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        # safe delete of related answers (DB cascade usually handles it)
-        instance.answers.all().delete()
-        return super().destroy(request, *args, **kwargs)
+        # answers, counters and respondent go together, in one transaction
+        tallies.delete_respondents(Respondent.objects.filter(pk=instance.pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ResponseViewSet(viewsets.ModelViewSet):
@@ -113,6 +303,8 @@ class ResponseViewSet(viewsets.ModelViewSet):
     CRUD for Response.
     Supports:
       - GET /api/responses/?survey=<id>
+        optional: ?page_size=<n>&cursor=<c> (keyset pagination on created_at, id),
+        ?fields=id,question,answer_text (sparse fieldset), ?flat=1 (respondent_id instead of nested respondent)
       - POST /api/responses/ (single)
       - POST /api/responses/bulk/ (bulk create)
     """
@@ -121,6 +313,7 @@ class ResponseViewSet(viewsets.ModelViewSet):
     )
     serializer_class = ResponseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["respondent", "question"]
 
@@ -134,12 +327,21 @@ class ResponseViewSet(viewsets.ModelViewSet):
 
         # USER NORMAL = seulement ses enquêtes
         elif user.is_authenticated:
-            qs = qs.filter(question__survey__owner=user)
+            qs = qs.filter(survey__owner=user)
 
         # filtre optionnel par survey
         survey_id = self.request.query_params.get("survey")
         if survey_id:
-            qs = qs.filter(question__survey__id=survey_id)
+            qs = qs.filter(survey_id=survey_id)
+
+        # ne charge que ce que la représentation utilise
+        if self.request.method == "GET":
+            wanted = requested_fields(self.request)
+            qs = qs.select_related(None)
+            if not flat_requested(self.request) and (wanted is None or "respondent" in wanted):
+                qs = qs.select_related("respondent")
+            if wanted is not None and "selected_choices" not in wanted:
+                qs = qs.prefetch_related(None)
 
         return qs
 
@@ -172,18 +374,50 @@ class ResponseViewSet(viewsets.ModelViewSet):
                     participant_name=resp_data.get("participant_name", "") or "",
                     created_by=survey_ref.owner if survey_ref else None
                 )
-                serializer.save(respondent=respondent_obj)
+                instance = serializer.save(respondent=respondent_obj)
+                tallies.apply_responses(SurveyResponse.objects.filter(pk=instance.pk))
                 return
 
             # default: serializer handles respondent_id / respondent_data
             question = serializer.validated_data.get("question")
             survey_owner = question.survey.owner if question and question.survey else None
 
-            serializer.save(created_by=survey_owner)        
+            instance = serializer.save(created_by=survey_owner)
+            tallies.apply_responses(SurveyResponse.objects.filter(pk=instance.pk))
             return
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            current = SurveyResponse.objects.filter(pk=serializer.instance.pk)
+            respondent_id = serializer.instance.respondent_id
+            old_name = Respondent.objects.select_for_update().filter(pk=respondent_id).values_list(
+                "interviewer_name", flat=True
+            ).first()
+            tallies.apply_responses(current, sign=-1)
+            instance = serializer.save()
+            tallies.apply_responses(current)
+            # nested respondent_data may rename the respondent: its other responses follow
+            if instance.respondent_id == respondent_id and old_name is not None:
+                rollups.rename_respondents([(instance.respondent, old_name)], exclude=[instance.pk])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            tallies.apply_responses(SurveyResponse.objects.filter(pk=instance.pk), sign=-1)
+            instance.delete()
+
     @action(detail=False, methods=["post"], permission_classes=[IsAuthenticatedOrReadOnly])
     def bulk(self, request):
+        """
+        POST /api/responses/bulk/?mode=atomic|partial&chunk_size=<n>
+        Body: { "responses": [ <payload de POST /api/responses/>, ... ] }
+        (mode and chunk_size may also be sent in the body.)
+        The whole batch is validated against ids fetched once and written with bulk_create.
+        Returns compact per-index results: {"results": [{"index", "id"}], "errors": [{"index", ...}]}.
+        mode=atomic (default): nothing is written if any item is invalid.
+        mode=partial: valid items are committed in chunks of chunk_size, each under
+        its own savepoint; invalid items and failed chunks are reported by index so
+        the client can resend only those. "atomic": false is accepted as mode=partial.
+        """
         payload = request.data or {}
         items = payload.get("responses") or payload.get("data") or []
         if not isinstance(items, list) or len(items) == 0:
@@ -192,26 +426,33 @@ class ResponseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        created = []
-        errors = []
-        with transaction.atomic():
-            for idx, item in enumerate(items):
-                ser = self.get_serializer(data=item)
-                if not ser.is_valid():
-                    errors.append({"index": idx, "errors": ser.errors})
-                    break
-                try:
-                    instance = ser.save()
-                    created.append(self.get_serializer(instance).data)
-                except Exception as e:
-                    errors.append({"index": idx, "exception": str(e)})
-                    break
-
-            if errors:
-                transaction.set_rollback(True)
-                return Response({"created": created, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        mode = request.query_params.get("mode") or payload.get("mode")
+        if mode is None:
+            mode = MODE_PARTIAL if payload.get("atomic", True) in (False, "false", "0", 0) else MODE_ATOMIC
+        if mode not in INGEST_MODES:
+            return Response(
+                {"detail": f"mode must be one of: {', '.join(INGEST_MODES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        chunk_size = request.query_params.get("chunk_size") or payload.get("chunk_size")
+        if chunk_size is not None:
+            try:
+                chunk_size = int(chunk_size)
+                if chunk_size < 1:
+                    raise ValueError(chunk_size)
+            except (TypeError, ValueError):
+                return Response(
+                    {"detail": "chunk_size must be a positive integer."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-        return Response({"created": created}, status=status.HTTP_201_CREATED)
+        results, errors = ingest_responses(items, mode=mode, chunk_size=chunk_size)
+        if errors and not results:
+            return Response({"results": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        body = {"results": results}
+        if errors:
+            body["errors"] = errors
+        return Response(body, status=status.HTTP_201_CREATED)
 
 
 # ---------- utilitaire detection admin ----------
@@ -259,41 +500,34 @@ def me_view(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_summary(request):
-    user = request.user
-
-    total_surveys = Survey.objects.filter(owner=user).count()
-
-    total_responses = SurveyResponse.objects.filter(
-        question__survey__owner=user
-    ).count()
-
-    qs = (
-        Survey.objects.filter(owner=user)
-        .annotate(responses=Count("questions__responses"))
-        .order_by("-responses")[:10]
-    )
-
-    top = []
-    for s in qs:
-        top.append(
-            {
-                "id": s.id,
-                "title": s.title,
-                "description": s.description,
-                "responses": s.responses or 0,
-            }
-        )
-
+    """
+    Owner dashboard, read from a single DashboardSnapshot row.
+    Recomputed when older than DASHBOARD_SNAPSHOT_MAX_AGE; ?fresh=1 forces a full recount.
+    """
+    fresh = request.query_params.get("fresh") in ("1", "true")
+    snapshot = dashboard.snapshot(request.user, fresh=fresh)
     return Response(
         {
-            "total_surveys": total_surveys,
-            "total_responses": total_responses,
-            "top_surveys": top,
+            "total_surveys": snapshot.total_surveys,
+            "total_respondents": snapshot.total_respondents,
+            "total_responses": snapshot.total_responses,
+            "top_surveys": snapshot.top_surveys,
+            "refreshed_at": snapshot.refreshed_at,
         },
         status=status.HTTP_200_OK,
     )
 
 
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def submission_spool_stats(request):
+    """
+    Monitoring of the public submission spool (write-behind mode):
+    queue depth, age of the oldest submission and cumulative counters.
+    """
+    return Response({"enabled": spool.enabled(), **spool.stats()}, status=status.HTTP_200_OK)
+
+
 # -------------------------------------------------
 # Endpoint for mobile/offline sync
 # -------------------------------------------------
@@ -303,91 +537,109 @@ def mobile_sync_respondent(request):
     """
     Reçoit une interview complète. 
     Le nom de l'interviewer est automatiquement forcé avec le nom du propriétaire de l'enquête.
+    Avec "mode": "delta", seules les réponses modifiées sont réécrites et le détail
+    par réponse (created / updated / unchanged / deleted) est renvoyé dans "answers".
     """
     ser = RespondentSyncSerializer(data=request.data)
     if not ser.is_valid():
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    data = ser.validated_data
-    client_uuid = data["client_uuid"]
-    survey_id = data["survey_id"]
-    participant_name = data.get("participant_name", "")
-    updated_at_local = data["updated_at_local"]
-    answers_payload = data["answers"]
+    result = sync_interviews([ser.validated_data])[0]
 
-    try:
-        # On récupère l'enquête pour accéder à son propriétaire (owner)
-        survey = Survey.objects.select_related('owner').get(id=survey_id)
-    except Survey.DoesNotExist:
-        return Response({"survey_id": ["Survey introuvable."]}, status=status.HTTP_400_BAD_REQUEST)
+    if result["status"] == STATUS_ERROR:
+        return Response({"detail": result["detail"]}, status=status.HTTP_400_BAD_REQUEST)
 
-    # --- LOGIQUE D'IDENTIFICATION AUTOMATIQUE ---
-    # On utilise le username du créateur du lien comme nom de collecteur
-    auto_interviewer_name = survey.owner.username if survey.owner else "Anonyme"
+    if result["status"] == STATUS_STALE:
+        return Response(
+            {
+                "detail": result["detail"],
+                "respondent_id": result.get("respondent_id"),
+                "client_uuid": result["client_uuid"],
+                "revision": result.get("revision"),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    payload = {
+        "detail": "Synchro réussie",
+        "respondent_id": result["respondent_id"],
+        "client_uuid": result["client_uuid"],
+        "revision": result["revision"],
+        "interviewer_assigned": result["interviewer_assigned"]
+    }
+    if "answers" in result:
+        payload["answers"] = result["answers"]
+    return Response(payload, status=status.HTTP_200_OK)
 
-    with transaction.atomic():
+
+@api_view(["POST"])
+@permission_classes([permissions.AllowAny])
+def mobile_sync_batch(request):
+    """
+    POST /api/mobile/sync/batch/
+    Body: { "interviews": [ <payload de /api/mobile/sync/>, ... ], "mode": "replace" | "delta" }
+    Retourne un statut par interview (created / updated / stale / error / invalid),
+    dans l'ordre reçu. Les interviews valides sont écrites même si d'autres sont invalides.
+    """
+    batch = BatchSyncSerializer(data=request.data)
+    if not batch.is_valid():
+        return Response(batch.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    items = batch.validated_data["interviews"]
+    max_items = getattr(settings, "MOBILE_SYNC_BATCH_MAX", 500)
+    if len(items) > max_items:
+        return Response(
+            {"detail": f"Lot trop volumineux ({len(items)} interviews, maximum {max_items})."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # ids d'enquêtes existantes chargés une fois pour tout le lot
+    # (même conversion que l'IntegerField du sérialiseur : "12" est accepté)
+    raw_ids = set()
+    for item in items:
         try:
-            # On cherche si ce répondant existe déjà (cas de mise à jour/synchro multiple)
-            respondent = Respondent.objects.select_for_update().get(client_uuid=client_uuid, survey=survey)
+            raw_ids.add(int(item.get("survey_id")))
+        except (TypeError, ValueError):
+            continue
+    survey_ids = set(Survey.objects.filter(id__in=raw_ids).values_list("id", flat=True))
 
-            if respondent.updated_at_local and respondent.updated_at_local >= updated_at_local:
-                return Response(
-                    {
-                        "detail": "Version plus récente déjà présente sur le serveur.",
-                        "respondent_id": respondent.id,
-                        "client_uuid": str(respondent.client_uuid),
-                    },
-                    status=status.HTTP_200_OK,
-                )
+    default_mode = batch.validated_data.get("mode")
 
-            # Mise à jour de l'existant
-            respondent.interviewer_name = auto_interviewer_name
-            respondent.participant_name = participant_name
-            respondent.status = "synced"
-            respondent.save()
-
-            # Nettoyage des anciennes réponses pour ré-écriture
-            SurveyResponse.objects.filter(respondent=respondent).delete()
-
-        except Respondent.DoesNotExist:
-            # Création du nouveau répondant avec le nom forcé
-            respondent = Respondent.objects.create(
-                survey=survey,
-                interviewer_name=auto_interviewer_name,
-                participant_name=participant_name,
-                client_uuid=client_uuid,
-                status="synced",
-                created_by=survey.owner  # On lie techniquement la réponse au compte du proprio
-            )
+    results = [None] * len(items)
+    valid_positions, valid_data = [], []
+    for idx, item in enumerate(items):
+        if default_mode and "mode" not in item:
+            item = {**item, "mode": default_mode}
+        ser = RespondentSyncSerializer(data=item, context={"survey_ids": survey_ids})
+        if ser.is_valid():
+            valid_positions.append(idx)
+            valid_data.append(ser.validated_data)
+        else:
+            results[idx] = {"status": "invalid", "client_uuid": item.get("client_uuid"), "errors": ser.errors}
 
-        # Création des réponses associées
-        for ans in answers_payload:
-            qid = ans.get("question_id")
-            answer_text = ans.get("answer_text", "") or ""
-            selected_choices_ids = ans.get("selected_choices", []) or []
+    for idx, result in zip(valid_positions, sync_interviews(valid_data)):
+        results[idx] = result
 
-            try:
-                question = Question.objects.get(id=qid, survey=survey)
-                answer_obj = SurveyResponse.objects.create(
-                    respondent=respondent,
-                    question=question,
-                    answer_text=answer_text,
-                    created_by=survey.owner
-                )
+    for idx, result in enumerate(results):
+        result["index"] = idx
 
-                if selected_choices_ids:
-                    choices = Choice.objects.filter(id__in=selected_choices_ids, question=question)
-                    answer_obj.selected_choices.set(choices)
-            except Question.DoesNotExist:
-                logger.warning("mobile_sync: question %s non trouvée pour l'enquête %s", qid, survey_id)
-                continue
+    return Response({"results": results}, status=status.HTTP_200_OK)
 
-    return Response(
-        {
-            "detail": "Synchro réussie",
-            "respondent_id": respondent.id,
-            "client_uuid": str(respondent.client_uuid),
-            "interviewer_assigned": auto_interviewer_name
-        },
-        status=status.HTTP_200_OK,
-    )
\ No newline at end of file
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def mobile_changes(request):
+    """
+    GET /api/mobile/changes/?since=<cursor>
+    Enquêtes, questions et choix créés / modifiés / supprimés depuis le curseur
+    (tout le catalogue sans curseur). Rappeler avec le "cursor" renvoyé tant que
+    "has_more" est vrai. Même périmètre que /api/surveys/ : ses propres enquêtes
+    pour un utilisateur connecté, tout pour un admin ou un client anonyme.
+    """
+    user = request.user
+    owner_id = user.id if user.is_authenticated and not (user.is_staff or user.is_superuser) else None
+    try:
+        data = changes_since(request.query_params.get("since"), owner_id=owner_id)
+    except InvalidCursor:
+        return Response({"detail": "Curseur invalide."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data, status=status.HTTP_200_OK)
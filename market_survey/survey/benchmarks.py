@@ -0,0 +1,567 @@
+# survey/benchmarks.py
+"""
+Scénarios de mesure de performance, lancés par `manage.py benchmark <scenario>`.
+
+Chaque scénario crée ses propres données dans une transaction annulée à la
+fin : la base n'est pas modifiée.
+"""
+import os
+import re
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Survey, Question, Choice, Respondent, Response
+
+try:  # indisponible sous Windows
+    import resource
+except ImportError:
+    resource = None
+
+User = get_user_model()
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo), ou None si non mesurable."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed_survey(owner, respondents, questions=10, choices=4, batch_size=5000):
+    """
+    Crée une enquête de `questions` questions (alternance choix unique / multiple / texte)
+    et `respondents` répondants ayant tous répondu à toutes les questions.
+    """
+    survey = Survey.objects.create(title=f"Benchmark {respondents}", owner=owner)
+    types = ["single", "multiple", "text"]
+    question_objs = Question.objects.bulk_create(
+        [
+            Question(survey=survey, text=f"Question {i}", question_type=types[i % 3], order=i)
+            for i in range(questions)
+        ]
+    )
+    choices_by_question = {}
+    for q in question_objs:
+        if q.question_type != "text":
+            choices_by_question[q.id] = Choice.objects.bulk_create(
+                [Choice(question=q, text=f"Option {j}") for j in range(choices)]
+            )
+
+    through = Response.selected_choices.through
+    for start in range(0, respondents, batch_size):
+        count = min(batch_size, respondents - start)
+        respondent_objs = Respondent.objects.bulk_create(
+            [
+                Respondent(
+                    survey=survey,
+                    interviewer_name=f"Enquêteur {(start + i) % 20}",
+                    participant_name=f"Participant {start + i}",
+                    client_uuid=uuid.uuid4(),
+                    status="synced",
+                    created_by=owner,
+                )
+                for i in range(count)
+            ]
+        )
+        response_objs = Response.objects.bulk_create(
+            [
+                Response(
+                    respondent=r,
+                    question=q,
+                    survey=survey,
+                    created_by=owner,
+                    answer_text="" if q.question_type != "text" else f"réponse libre {r.id % 97}",
+                )
+                for r in respondent_objs
+                for q in question_objs
+            ]
+        )
+        links = []
+        for k, response in enumerate(response_objs):
+            options = choices_by_question.get(response.question_id)
+            if options:
+                links.append(through(response_id=response.id, choice_id=options[k % len(options)].id))
+        through.objects.bulk_create(links, batch_size=batch_size)
+    return survey
+
+
+def run_rolled_back(func):
+    """Exécute func(owner) dans une transaction systématiquement annulée."""
+    with transaction.atomic():
+        owner = User.objects.create_user(f"bench-{uuid.uuid4().hex[:8]}")
+        try:
+            return func(owner)
+        finally:
+            transaction.set_rollback(True)
+
+
+def measure(func, trace_memory=True):
+    """
+    Retourne (résultat, secondes, pic mémoire Python en Mo).
+    tracemalloc ralentit nettement le code mesuré : trace_memory=False pour
+    un débit seul (le pic vaut alors None).
+    """
+    if not trace_memory:
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start, None
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+_WRITE_SQL = re.compile(r'^\s*(INSERT INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+@contextmanager
+def count_rows_written():
+    """Compte les lignes insérées / modifiées / supprimées, par (opération, table)."""
+    rows = Counter()
+
+    def wrapper(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        match = _WRITE_SQL.match(sql)
+        if match:
+            count = context["cursor"].rowcount
+            if match.group(1).upper().startswith("INSERT") and (count is None or count <= 0):
+                # INSERT ... RETURNING : rowcount indisponible selon le moteur
+                count = sql.count("), (") + 1
+            if count and count > 0:
+                rows[(match.group(1).split()[0].upper(), match.group(2))] += count
+        return result
+
+    with connection.execute_wrapper(wrapper):
+        yield rows
+
+
+@contextmanager
+def count_queries():
+    """Liste des requêtes SQL exécutées dans le bloc (hors DEBUG)."""
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+@scenario("export_xlsx")
+def bench_export_xlsx(stdout, sizes, questions=10):
+    """Export XLSX en flux : lignes/s et mémoire pour chaque taille d'enquête."""
+    from .exports import stream_survey_xlsx
+
+    stdout.write(f"{'répondants':>10} {'lignes':>10} {'octets':>12} {'s':>8} {'lignes/s':>10} "
+                 f"{'pic py Mo':>10} {'RSS Mo':>8}")
+    for n in sizes:
+        def run(owner):
+            survey = seed_survey(owner, n, questions=questions)
+            return measure(lambda: sum(len(chunk) for chunk in stream_survey_xlsx(survey)))
+
+        size, elapsed, peak = run_rolled_back(run)
+        rows = n * questions
+        rss = peak_rss_mb()
+        stdout.write(
+            f"{n:>10} {rows:>10} {size:>12} {elapsed:>8.2f} {rows / elapsed:>10.0f} "
+            f"{peak:>10.1f} {rss if rss is None else round(rss, 1)!s:>8}"
+        )
+
+
+@scenario("sync_resync")
+def bench_sync_resync(stdout, sizes):
+    """
+    Re-synchro d'interviews dont une seule réponse a changé :
+    lignes écrites en mode replace et en mode delta (tailles = nombre de questions).
+    """
+    from .sync import sync_interviews
+
+    for n in sizes:
+        def run(owner):
+            survey = seed_survey(owner, 0, questions=n)
+            questions = list(survey.questions.prefetch_related("choices"))
+            payload = {
+                "client_uuid": uuid.uuid4(),
+                "survey_id": survey.id,
+                "updated_at_local": timezone.now(),
+                "answers": [
+                    {
+                        "question_id": q.id,
+                        "answer_text": "texte" if q.question_type == "text" else "",
+                        "selected_choices": [c.id for c in q.choices.all()][:1],
+                    }
+                    for q in questions
+                ],
+            }
+            written = {}
+            for mode in ("replace", "delta"):
+                interview = {**payload, "client_uuid": uuid.uuid4(), "mode": mode}
+                sync_interviews([interview])
+                # une seule réponse modifiée
+                answers = [dict(a) for a in interview["answers"]]
+                answers[-1].update(answer_text="modifié", selected_choices=[])
+                with count_rows_written() as rows:
+                    sync_interviews([{**interview, "answers": answers, "updated_at_local": timezone.now()}])
+                written[mode] = rows
+            return written
+
+        written = run_rolled_back(run)
+        stdout.write(f"{n} questions :")
+        for mode, rows in written.items():
+            detail = ", ".join(f"{op} {table}={count}" for (op, table), count in sorted(rows.items()))
+            stdout.write(f"  {mode:<8} {sum(rows.values()):>6} lignes  ({detail})")
+
+
+@scenario("bulk_ingest")
+def bench_bulk_ingest(stdout, sizes, invalid_every=100):
+    """
+    Ingestion /api/responses/bulk/ : éléments/s par mode et taille de paquet
+    (tailles = nombre d'éléments, 1 élément invalide sur `invalid_every`).
+    """
+    from .ingest import ingest_responses, MODE_ATOMIC, MODE_PARTIAL
+
+    variants = [(MODE_ATOMIC, None, False), (MODE_PARTIAL, 500, True), (MODE_PARTIAL, 2000, True)]
+    stdout.write(f"{'éléments':>9} {'mode':<8} {'paquet':>7} {'invalides':>9} {'écrits':>7} {'s':>7} {'élém./s':>9}")
+    for n in sizes:
+        for mode, chunk_size, with_invalid in variants:
+            def run(owner):
+                survey = seed_survey(owner, n // 10, questions=10)
+                respondent_ids = list(survey.respondents.values_list("id", flat=True))
+                questions = list(survey.questions.prefetch_related("choices"))
+                items = []
+                for k in range(n):
+                    q = questions[k % len(questions)]
+                    choices = [c.id for c in q.choices.all()]
+                    items.append({
+                        "respondent_id": respondent_ids[k // len(questions)],
+                        "question": q.id if not (with_invalid and k % invalid_every == 0) else 0,
+                        "answer_text": "texte" if not choices else "",
+                        "selected_choices": choices[:1],
+                    })
+                return measure(lambda: ingest_responses(items, mode=mode, chunk_size=chunk_size), trace_memory=False)
+
+            (results, errors), elapsed, _ = run_rolled_back(run)
+            stdout.write(
+                f"{n:>9} {mode:<8} {chunk_size or '-'!s:>7} {len(errors):>9} {len(results):>7} "
+                f"{elapsed:>7.2f} {n / elapsed:>9.0f}"
+            )
+
+
+@scenario("responses_list")
+def bench_responses_list(stdout, sizes, repeat=5, surveys=5):
+    """
+    /api/responses/?survey= : filtre historique (question__survey__owner, question__survey)
+    contre le filtre direct sur Response.survey. Tailles = réponses par enquête ;
+    `surveys` enquêtes par taille pour que le filtre soit sélectif.
+    """
+    from rest_framework.test import APIClient
+
+    from .api_views import ResponseViewSet
+
+    stdout.write(f"{'réponses':>9} {'jointure s':>11} {'direct s':>9} {'API s':>7}")
+    for n in sizes:
+        def run(owner):
+            seeded = [seed_survey(owner, max(n // 10, 1), questions=10) for _ in range(surveys)]
+            survey = seeded[0]
+            base = ResponseViewSet.queryset
+
+            def best(queryset):
+                return min(measure(lambda: list(queryset.values_list("id", "answer_text")), trace_memory=False)[1]
+                           for _ in range(repeat))
+
+            joined = best(base.filter(question__survey__owner=owner, question__survey__id=survey.id))
+            direct = best(base.filter(survey__owner=owner, survey_id=survey.id))
+
+            client = APIClient()
+            client.force_authenticate(owner)
+            _, api, _ = measure(lambda: client.get(f"/api/responses/?survey={survey.id}"), trace_memory=False)
+            return joined, direct, api
+
+        joined, direct, api = run_rolled_back(run)
+        stdout.write(f"{n:>9} {joined:>11.4f} {direct:>9.4f} {api:>7.2f}")
+
+
+@scenario("survey_list")
+def bench_survey_list(stdout, sizes, questions=30):
+    """
+    GET /api/surveys/ : SurveySerializer (écriture, imbriqué, exists() par enquête)
+    contre SurveyReadSerializer. Tailles = nombre d'enquêtes de `questions` questions.
+    """
+    from rest_framework.request import Request
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    from .serializers import SurveySerializer
+
+    stdout.write(f"{'enquêtes':>9} {'ancien s':>9} {'requêtes':>9} {'lecture s':>10} {'requêtes':>9}")
+    for n in sizes:
+        def run(owner):
+            for _ in range(n):
+                seed_survey(owner, 0, questions=questions)
+
+            def old():
+                request = Request(APIRequestFactory().get("/api/surveys/"))
+                queryset = Survey.objects.filter(owner=owner).prefetch_related("questions__choices")
+                return len(SurveySerializer(queryset, many=True, context={"request": request}).data)
+
+            client = APIClient()
+            client.force_authenticate(owner)
+            timings = []
+            for func in (old, lambda: client.get("/api/surveys/")):
+                with count_queries() as queries:
+                    _, elapsed, _ = measure(func, trace_memory=False)
+                timings.append((elapsed, len(queries)))
+            return timings
+
+        (old_s, old_q), (new_s, new_q) = run_rolled_back(run)
+        stdout.write(f"{n:>9} {old_s:>9.2f} {old_q:>9} {new_s:>10.2f} {new_q:>9}")
+
+
+def _legacy_pdf(survey, fileobj):
+    """Ancien export_survey_pdf : requêtes par question, un paragraphe par réponse libre."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    responses = Response.objects.filter(survey=survey).select_related("respondent", "question")
+    styles = getSampleStyleSheet()
+    elements = [Paragraph(f"Rapport d'enquête : {survey.title}", styles["Title"]), Spacer(1, 12)]
+    elements.append(Paragraph(f"Nombre d'enquêteurs : {Respondent.objects.filter(survey=survey).count()}",
+                              styles["Normal"]))
+    for question in survey.questions.all():
+        elements.append(Paragraph(f"• {question.text}", styles["Heading4"]))
+        answers = responses.filter(question=question)
+        if question.question_type == "text":
+            for ans in answers:
+                if ans.answer_text:
+                    elements.append(Paragraph(f"- {ans.answer_text}", styles["Normal"]))
+        else:
+            elements.append(Paragraph(f"({answers.count()} réponses)", styles["Normal"]))
+        elements.append(Spacer(1, 10))
+    SimpleDocTemplate(fileobj, pagesize=A4).build(elements)
+
+
+@scenario("pdf_report")
+def bench_pdf_report(stdout, sizes, questions=10):
+    """
+    Rapport PDF : ancien export (requêtes par question, toutes les réponses libres)
+    contre exports.write_survey_pdf (agrégats, graphiques, échantillon). Tailles = répondants.
+    """
+    import io
+
+    from . import tallies
+    from .exports import write_survey_pdf
+
+    stdout.write(f"{'répondants':>10} {'ancien s':>9} {'requêtes':>9} {'Ko':>7} "
+                 f"{'nouveau s':>10} {'requêtes':>9} {'Ko':>7}")
+    for n in sizes:
+        def run(owner):
+            survey = seed_survey(owner, n, questions=questions)
+            tallies.rebuild(survey)
+            results = []
+            for build in (_legacy_pdf, write_survey_pdf):
+                out = io.BytesIO()
+                with count_queries() as queries:
+                    _, elapsed, _ = measure(lambda: build(survey, out), trace_memory=False)
+                results.append((elapsed, len(queries), len(out.getvalue()) / 1024))
+            return results
+
+        (old_s, old_q, old_kb), (new_s, new_q, new_kb) = run_rolled_back(run)
+        stdout.write(f"{n:>10} {old_s:>9.2f} {old_q:>9} {old_kb:>7.0f} {new_s:>10.2f} {new_q:>9} {new_kb:>7.0f}")
+
+
+@scenario("dashboard")
+def bench_dashboard(stdout, sizes, surveys=5, questions=10, repeat=20):
+    """
+    Tableau de bord d'un propriétaire : ancien calcul (Count sur toutes les
+    réponses), recalcul complet de l'instantané, lecture de l'instantané.
+    Tailles = répondants par enquête ; temps moyens sur `repeat` lectures.
+    """
+    from django.db.models import Count
+
+    from . import dashboard, tallies
+
+    stdout.write(f"{'répondants':>10} {'ancien ms':>10} {'recalcul ms':>12} {'lecture ms':>11} {'requêtes':>9}")
+    for n in sizes:
+        def run(owner):
+            for _ in range(surveys):
+                tallies.rebuild(seed_survey(owner, n, questions=questions))
+
+            def old():
+                qs = Survey.objects.filter(owner=owner)
+                qs.count()
+                Response.objects.filter(survey__owner=owner).count()
+                return list(qs.annotate(n=Count("questions__responses")).order_by("-n")[:10])
+
+            timings = []
+            for func in (old, lambda: dashboard.refresh(owner, full=True), lambda: dashboard.snapshot(owner)):
+                with count_queries() as queries:
+                    _, elapsed, _ = measure(lambda: [func() for _ in range(repeat)], trace_memory=False)
+                timings.append(elapsed * 1000 / repeat)
+            return timings, len(queries) // repeat
+
+        (old_ms, full_ms, read_ms), read_q = run_rolled_back(run)
+        stdout.write(f"{n * surveys:>10} {old_ms:>10.1f} {full_ms:>12.1f} {read_ms:>11.2f} {read_q:>9}")
+
+
+@scenario("timeseries")
+def bench_timeseries(stdout, sizes, questions=5, days=90, repeat=10):
+    """
+    Série horaire sur `days` jours par enquêteur : ancien calcul côté client
+    (tous les répondants lus puis regroupés) contre rollups.series sur les
+    cumuls horaires. Tailles = répondants, répartis sur toute la période.
+    """
+    from datetime import timedelta
+
+    from . import rollups
+
+    stdout.write(f"{'répondants':>10} {'ancien ms':>10} {'backfill s':>11} {'série ms':>9} {'points':>7} {'requêtes':>9}")
+    for n in sizes:
+        def run(owner):
+            survey = seed_survey(owner, n, questions=questions)
+            end = rollups.bucket_of(timezone.now()) + timedelta(hours=1)
+            hours = days * 24
+            ids = list(Respondent.objects.filter(survey=survey).values_list("id", flat=True))
+            for h in range(min(hours, len(ids))):
+                moment = end - timedelta(hours=h + 1)
+                Respondent.objects.filter(id__in=ids[h::hours]).update(created_at=moment)
+                Response.objects.filter(respondent_id__in=ids[h::hours]).update(created_at=moment)
+
+            def old():
+                counts = Counter()
+                for name, created_at in Respondent.objects.filter(survey=survey).values_list(
+                    "interviewer_name", "created_at"
+                ):
+                    counts[(name, rollups.bucket_of(created_at))] += 1
+                return counts
+
+            _, backfill, _ = measure(lambda: rollups.rebuild(survey), trace_memory=False)
+            start = end - timedelta(days=days)
+            _, old_s, _ = measure(lambda: [old() for _ in range(repeat)], trace_memory=False)
+            with count_queries() as queries:
+                points, new_s, _ = measure(
+                    lambda: [rollups.series(survey, start, end, "hour", True) for _ in range(repeat)],
+                    trace_memory=False,
+                )
+            return old_s * 1000 / repeat, backfill, new_s * 1000 / repeat, len(points[0]), len(queries) // repeat
+
+        old_ms, backfill, new_ms, points, n_queries = run_rolled_back(run)
+        stdout.write(f"{n:>10} {old_ms:>10.1f} {backfill:>11.2f} {new_ms:>9.1f} {points:>7} {n_queries:>9}")
+
+
+def _take_survey_payload(survey):
+    """Formulaire complet : premier choix (deux pour les choix multiples), texte libre sinon."""
+    payload = {"interviewer_name": "Charge"}
+    for question in survey.questions.prefetch_related("choices"):
+        choices = [c.id for c in question.choices.all()]
+        field = f"question_{question.id}"
+        if question.question_type == "single":
+            payload[field] = choices[:1]
+        elif question.question_type == "multiple":
+            payload[field] = choices[:2]
+        else:
+            payload[field] = f"réponse libre {question.id}"
+    return payload
+
+
+@scenario("take_survey_load")
+def bench_take_survey_load(stdout, sizes, questions=40, workers=8, spooled=False):
+    """
+    Test de charge de take_survey (POST public) : `workers` clients concurrents,
+    tailles = nombre total de soumissions. Les données sont validées (commit),
+    contrôlées (aucun répondant à moitié écrit) puis supprimées.
+    Avec `spooled`, les soumissions passent par la file d'écriture différée
+    (fichier temporaire) ; la file est ensuite vidée et ce vidage est chronométré.
+    """
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.db import connections
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from . import spool
+
+    stdout.write(f"{'soumissions':>11} {'clients':>7} {'s':>7} {'soum./s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+                 f"{'requêtes':>9} {'erreurs':>7} {'vidage s':>8} {'incomplets':>10}")
+    for n in sizes:
+        owner = User.objects.create_user(f"bench-{uuid.uuid4().hex[:8]}")
+        try:
+            with tempfile.TemporaryDirectory() as tmp, override_settings(
+                SUBMISSION_SPOOL_ENABLED=spooled, SUBMISSION_SPOOL_PATH=os.path.join(tmp, "spool.sqlite3")
+            ):
+                survey = seed_survey(owner, 0, questions=questions)
+                payload = _take_survey_payload(survey)
+                url = reverse("take_survey", args=[survey.id])
+
+                def worker(count):
+                    client, results = Client(), []
+                    try:
+                        for _ in range(count):
+                            with count_queries() as queries:
+                                start = time.perf_counter()
+                                try:
+                                    ok = client.post(url, payload).status_code == 200
+                                except Exception:
+                                    ok = False
+                                results.append((time.perf_counter() - start, ok, len(queries)))
+                    finally:
+                        connections.close_all()
+                        spool.close()
+                    return results
+
+                shares = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+                start = time.perf_counter()
+                with ThreadPoolExecutor(workers) as pool:
+                    results = [r for chunk in pool.map(worker, shares) for r in chunk]
+                elapsed = time.perf_counter() - start
+
+                start = time.perf_counter()
+                if spooled:
+                    spool.work(once=True)
+                    spool.close()
+                drained = time.perf_counter() - start
+
+            latencies = sorted(r[0] * 1000 for r in results)
+            errors = sum(1 for r in results if not r[1])
+            ok_queries = [r[2] for r in results if r[1]]
+            per_respondent = Counter(Response.objects.filter(survey=survey).values_list("respondent_id", flat=True))
+            respondents = Respondent.objects.filter(survey=survey).values_list("id", flat=True)
+            incomplete = sum(1 for rid in respondents if per_respondent.get(rid, 0) != questions)
+            incomplete += n - errors - len(respondents)  # soumissions acceptées mais jamais écrites
+            stdout.write(
+                f"{n:>11} {workers:>7} {elapsed:>7.2f} {n / elapsed:>8.1f} "
+                f"{latencies[len(latencies) // 2]:>7.0f} {latencies[int(len(latencies) * 0.95) - 1]:>7.0f} "
+                f"{(sum(ok_queries) / len(ok_queries)) if ok_queries else 0:>9.0f} {errors:>7} "
+                f"{drained:>8.2f} {incomplete:>10}"
+            )
+        finally:
+            Survey.objects.filter(owner=owner).delete()
+            owner.delete()
+
+
+@scenario("take_survey_spool")
+def bench_take_survey_spool(stdout, sizes):
+    """take_survey_load avec la file d'écriture différée (SUBMISSION_SPOOL_ENABLED)."""
+    bench_take_survey_load(stdout, sizes, spooled=True)
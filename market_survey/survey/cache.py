@@ -0,0 +1,142 @@
+# survey/cache.py
+"""
+Cache des définitions d'enquête et des résumés calculés.
+
+Les clés portent des numéros de génération propres à chaque enquête :
+  - `definition` : questions et choix ; c'est Survey.content_version, lu
+    sur la ligne Survey de l'appelant et incrémenté en base à chaque
+    modification de la définition (signaux Survey / Question / Choice). Le
+    contenu en cache correspond donc toujours à l'ETag de la définition,
+    dans tous les processus, même avec un cache propre à chaque processus ;
+  - `responses`  : change à chaque écriture de réponses (signal
+    `responses_changed`, émis par tallies.apply_responses).
+Invalider revient à incrémenter une génération : les anciennes entrées ne
+sont plus jamais lues et expirent d'elles-mêmes (SURVEY_CACHE_TIMEOUT).
+
+Le recalcul d'une entrée absente est protégé par un verrou (cache.add) :
+un seul processus calcule, les autres attendent le résultat au plus
+SURVEY_CACHE_LOCK_WAIT secondes avant de calculer eux-mêmes.
+
+Fonctionne avec tout backend Django (LocMemCache par défaut, Redis si
+REDIS_URL est défini) ; avec LocMemCache, chaque processus a son propre cache.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFINITION = "definition"
+RESPONSES = "responses"
+
+_MISSING = object()
+
+
+def _cache():
+    return caches[getattr(settings, "SURVEY_CACHE_ALIAS", "default")]
+
+
+def _generation_key(survey_id, scope):
+    return f"survey:{survey_id}:gen:{scope}"
+
+
+def generations(survey_ids, scope):
+    """{survey_id: génération courante de `scope`}, initialisée si absente."""
+    cache = _cache()
+    keys = {_generation_key(sid, scope): sid for sid in survey_ids}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # départ horodaté : une génération évincée du cache ne retombe pas
+        # sur une valeur déjà utilisée par des entrées encore présentes
+        start = time.time_ns()
+        for key in missing:
+            cache.add(key, start, None)
+        found.update(cache.get_many(missing))
+    return {sid: found.get(key, 0) for key, sid in keys.items()}
+
+
+def _generations(surveys, scope):
+    if scope == DEFINITION:
+        return {survey.id: survey.content_version for survey in surveys}
+    return generations([survey.id for survey in surveys], scope)
+
+
+def invalidate(survey_id, scope=RESPONSES):
+    """
+    Rend obsolètes les entrées de l'enquête qui dépendent de `scope` (la
+    définition, elle, s'invalide par conditional.bump_content_version).
+    """
+    cache = _cache()
+    key = _generation_key(survey_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:  # clé absente ou évincée
+        cache.set(key, time.time_ns(), None)
+
+
+def _key(survey_id, kind, scopes):
+    parts = [f"{scope}{generation}" for scope, generation in scopes]
+    return f"survey:{survey_id}:{kind}:" + ":".join(parts)
+
+
+def entry_key(survey, kind, depends_on=(DEFINITION,)):
+    scopes = [(scope, _generations([survey], scope)[survey.id]) for scope in depends_on]
+    return _key(survey.id, kind, scopes)
+
+
+def get_or_compute(survey, kind, compute, depends_on=(DEFINITION,)):
+    """
+    Valeur en cache de `kind` pour l'enquête (instance Survey), ou compute()
+    sous verrou. La clé est figée avant le calcul : une invalidation survenue
+    pendant le calcul laisse le résultat sous l'ancienne génération, jamais relue.
+    """
+    cache = _cache()
+    key = entry_key(survey, kind, depends_on)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    timeout = getattr(settings, "SURVEY_CACHE_TIMEOUT", 300)
+    lock = f"{key}:lock"
+    if cache.add(lock, 1, getattr(settings, "SURVEY_CACHE_LOCK_TIMEOUT", 30)):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+
+    # un autre processus calcule déjà cette entrée : on attend son résultat
+    deadline = time.monotonic() + getattr(settings, "SURVEY_CACHE_LOCK_WAIT", 2)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    return compute()
+
+
+def get_many_or_compute(surveys, kind, compute_missing, depends_on=(DEFINITION,)):
+    """
+    {survey_id: valeur} pour plusieurs enquêtes (listes) : un get_many, puis
+    compute_missing(ids absents) -> {survey_id: valeur} en un seul appel.
+    Pas de verrou ici : une liste ne se bloque pas sur une enquête en calcul.
+    """
+    cache = _cache()
+    per_scope = {scope: _generations(surveys, scope) for scope in depends_on}
+    keys = {
+        _key(survey.id, kind, [(scope, per_scope[scope][survey.id]) for scope in depends_on]): survey.id
+        for survey in surveys
+    }
+    found = cache.get_many(list(keys))
+    values = {keys[key]: value for key, value in found.items()}
+    missing = [sid for key, sid in keys.items() if key not in found]
+    if missing:
+        computed = compute_missing(missing)
+        reverse = {sid: key for key, sid in keys.items()}
+        cache.set_many(
+            {reverse[sid]: value for sid, value in computed.items()},
+            getattr(settings, "SURVEY_CACHE_TIMEOUT", 300),
+        )
+        values.update(computed)
+    return values
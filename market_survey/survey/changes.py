@@ -0,0 +1,142 @@
+# survey/changes.py
+"""
+Flux incrémental /api/mobile/changes/ pour les clients hors ligne.
+
+Le curseur est opaque pour le client : il encode la position de la dernière
+entrée ChangeLog transmise. Chaque appel renvoie l'état courant des enquêtes,
+questions et choix modifiés depuis ce curseur (une seule fois par objet, même
+s'il a changé plusieurs fois) et des tombstones (ids) pour les suppressions.
+
+Le flux doit suivre l'ordre de validation des transactions : une transaction
+qui insère une entrée puis valide tard obtient un id inférieur à un curseur
+déjà renvoyé, et serait manquée. Selon la base :
+  PostgreSQL : chaque entrée porte l'identifiant de sa transaction (txid) ;
+               le flux est trié par (txid, id) et s'arrête à
+               pg_snapshot_xmin(pg_current_snapshot()) : toutes les
+               transactions plus anciennes sont terminées (curseur "c2").
+  SQLite     : un seul écrivain à la fois, les ids suivent l'ordre de
+               validation (curseur "c1" = id).
+  autres     : curseur par id, entrées de moins de
+               MOBILE_CHANGES_SETTLE_SECONDS non servies. Ce délai réduit le
+               risque sans le supprimer : les clients doivent refaire
+               périodiquement une synchro complète (appel sans curseur).
+"""
+import base64
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Survey, Question, Choice, ChangeLog
+
+CURSOR_PREFIX = "c1:"  # id
+TXID_CURSOR_PREFIX = "c2:"  # txid:id (PostgreSQL)
+
+CURRENT_TXID = "pg_current_xact_id()::text::bigint"
+SNAPSHOT_XMIN = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+# champs renvoyés par entité (le strict nécessaire pour le client mobile)
+FIELDS = {
+    "survey": ("id", "title", "description", "updated_at"),
+    "question": ("id", "survey_id", "text", "question_type", "order", "updated_at"),
+    "choice": ("id", "question_id", "text", "updated_at"),
+}
+MODELS = {"survey": Survey, "question": Question, "choice": Choice}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def by_txid():
+    return connection.vendor == "postgresql"
+
+
+def current_txid():
+    """Valeur de ChangeLog.txid à l'insertion (None hors PostgreSQL)."""
+    return RawSQL(CURRENT_TXID, []) if by_txid() else None
+
+
+def encode_cursor(txid, last_id):
+    if txid is None:
+        raw = f"{CURSOR_PREFIX}{last_id}"
+    else:
+        raw = f"{TXID_CURSOR_PREFIX}{txid}:{last_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    (txid, id) de la dernière entrée déjà reçue ; (0, 0) sans curseur (synchro
+    complète). Un curseur "c1" vaut txid 0 : les entrées antérieures au suivi
+    des transactions ont txid = 0.
+    """
+    if not cursor:
+        return 0, 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        if raw.startswith(CURSOR_PREFIX):
+            txid, last_id = 0, int(raw[len(CURSOR_PREFIX):])
+        elif raw.startswith(TXID_CURSOR_PREFIX):
+            txid, last_id = (int(part) for part in raw[len(TXID_CURSOR_PREFIX):].split(":"))
+        else:
+            raise ValueError(raw)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    if txid < 0 or last_id < 0:
+        raise InvalidCursor(cursor)
+    return txid, last_id
+
+
+def changes_since(cursor, owner_id=None, limit=None):
+    """
+    Changements postérieurs à `cursor`, limités aux enquêtes de `owner_id` si fourni.
+    Lève InvalidCursor si le curseur n'a pas été émis par ce serveur.
+    """
+    txid, last_id = decode_cursor(cursor)
+    limit = limit or getattr(settings, "MOBILE_CHANGES_PAGE_SIZE", 500)
+
+    log = ChangeLog.objects.all()
+    if owner_id is not None:
+        log = log.filter(owner_id=owner_id)
+    if by_txid():
+        # horizon calculé dans la même requête, donc sur le même instantané
+        log = log.filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=last_id), txid__lt=RawSQL(SNAPSHOT_XMIN, []))
+        order = ("txid", "id")
+    else:
+        txid = None
+        log = log.filter(id__gt=last_id)
+        settle = getattr(settings, "MOBILE_CHANGES_SETTLE_SECONDS", 2)
+        if settle and connection.vendor != "sqlite":
+            log = log.filter(created_at__lte=timezone.now() - timedelta(seconds=settle))
+        order = ("id",)
+
+    entries = list(log.order_by(*order).values_list("txid", "id", "entity", "object_id", "op")[: limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # dernière opération par objet
+    latest = {}
+    for entry_txid, entry_id, entity, object_id, op in entries:
+        latest[(entity, object_id)] = op
+        last_id = entry_id
+        if txid is not None:
+            txid = entry_txid
+
+    payload = {}
+    for entity, model in MODELS.items():
+        upserts = [oid for (kind, oid), op in latest.items() if kind == entity and op == "upsert"]
+        rows = list(model.objects.filter(id__in=upserts).order_by("id").values(*FIELDS[entity])) if upserts else []
+        found = {row["id"] for row in rows}
+        # objet supprimé depuis : sa suppression arrivera plus loin dans le journal, on l'anticipe
+        deleted = sorted(
+            oid for (kind, oid), op in latest.items()
+            if kind == entity and (op == "delete" or oid not in found)
+        )
+        payload[f"{entity}s"] = rows
+        payload[f"deleted_{entity}s"] = deleted
+
+    return {"cursor": encode_cursor(txid, last_id), "has_more": has_more, **payload}
@@ -0,0 +1,66 @@
+# survey/conditional.py
+"""
+Requêtes conditionnelles (ETag / Last-Modified / 304) sur la définition d'une enquête.
+
+Survey.content_version est incrémenté à chaque modification de la définition
+(signaux post_save / post_delete de Survey, Question et Choice, dans la
+transaction de la modification). Il sert aussi de génération au cache des
+définitions (survey/cache.py) : le corps servi correspond toujours à l'ETag.
+Les validateurs sont lus en une seule requête sur la ligne Survey : le 304
+part avant tout chargement de questions ou de choix.
+
+Réservé à l'API JSON : la page HTML du formulaire public contient un jeton
+CSRF propre à la session et n'est jamais servie en 304. Seul l'ETag décide
+du 304 ; Last-Modified (à la seconde près) est informatif, If-Modified-Since
+est ignoré : deux modifications dans la même seconde donneraient un faux 304.
+"""
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Survey, Respondent
+
+
+def bump_content_version(survey_id):
+    """
+    Nouvelle version de la définition : les ETag déjà distribués et les
+    définitions en cache ne correspondent plus.
+    """
+    Survey.objects.filter(pk=survey_id).update(content_version=F("content_version") + 1, updated_at=timezone.now())
+
+
+def survey_validators(queryset, survey_id, variant):
+    """
+    (etag, last_modified) pour l'enquête `survey_id` de `queryset`, ou None si absente.
+    `variant` distingue les représentations (enquête, résumé).
+    has_responses fait partie de la représentation de l'API : il entre dans l'ETag.
+    """
+    row = (
+        queryset.filter(pk=survey_id)
+        .annotate(has_responses=Exists(Respondent.objects.filter(survey=OuterRef("pk"))))
+        .values_list("content_version", "updated_at", "has_responses")
+        .first()
+    )
+    if row is None:
+        return None
+    version, updated_at, has_responses = row
+    return f'"{variant}-{survey_id}-{version}-{int(has_responses)}"', updated_at
+
+
+def set_validators(response, validators):
+    etag, last_modified = validators
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(request, validators):
+    """Réponse 304 si la requête conditionnelle correspond, sinon None."""
+    if validators is None or request.method not in ("GET", "HEAD"):
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_validators(response, validators)
+    return response
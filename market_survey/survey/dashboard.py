@@ -0,0 +1,105 @@
+# survey/dashboard.py
+"""
+Instantané du tableau de bord par propriétaire (table DashboardSnapshot).
+
+GET /api/dashboard-summary/ lit une seule ligne. Les totaux sont tenus à jour
+par les chemins d'écriture, par incréments atomiques F() :
+  - réponses   : tallies.apply_responses -> record_responses
+  - répondants : tallies.apply_respondents -> record_respondents (création
+                 par save() via le signal post_save, bulk_create et
+                 suppressions par appel explicite)
+
+Le classement des enquêtes les plus répondues (lu dans QuestionStats) est
+recalculé quand l'instantané a plus de DASHBOARD_SNAPSHOT_MAX_AGE secondes
+(60 par défaut). `?fresh=1`, la première lecture et toute modification ou
+suppression d'enquête (refreshed_at remis à None) provoquent un recomptage
+complet, répondants compris.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DashboardSnapshot, QuestionStats, Respondent, Survey
+
+TOP_SURVEYS = 10
+
+
+def _bump(field, survey_deltas):
+    survey_deltas = {survey_id: delta for survey_id, delta in survey_deltas.items() if delta}
+    if not survey_deltas:
+        return
+    if len(survey_deltas) == 1:
+        # cas courant (une enquête) : une seule requête, propriétaire en sous-requête
+        [(survey_id, delta)] = survey_deltas.items()
+        DashboardSnapshot.objects.filter(owner__surveys__id=survey_id).update(**{field: F(field) + delta})
+        return
+
+    per_owner = Counter()
+    for survey_id, owner_id in Survey.objects.filter(id__in=survey_deltas).values_list("id", "owner_id"):
+        per_owner[owner_id] += survey_deltas[survey_id]
+    grouped = defaultdict(list)
+    for owner_id, delta in per_owner.items():
+        if delta:
+            grouped[delta].append(owner_id)
+    for delta, owner_ids in grouped.items():
+        DashboardSnapshot.objects.filter(owner_id__in=owner_ids).update(**{field: F(field) + delta})
+
+
+def record_responses(survey_deltas):
+    """Répercute {survey_id: variation du nombre de réponses} sur les instantanés."""
+    _bump("total_responses", survey_deltas)
+
+
+def record_respondents(survey_deltas):
+    """Répercute {survey_id: variation du nombre de répondants} sur les instantanés."""
+    _bump("total_respondents", survey_deltas)
+
+
+def invalidate(owner_id):
+    """Demande un recomptage complet à la prochaine lecture."""
+    DashboardSnapshot.objects.filter(owner_id=owner_id).update(refreshed_at=None)
+
+
+def refresh(owner, full=False):
+    """
+    Recalcule les enquêtes, les réponses (QuestionStats) et le classement.
+    Avec `full`, recompte aussi les répondants (le seul total qui parcourt
+    les lignes brutes) ; sinon le compteur incrémental est conservé.
+    """
+    surveys = Survey.objects.filter(owner=owner)
+    top = (
+        surveys.annotate(answer_count=Coalesce(Sum("question_stats__answer_count"), 0))
+        .order_by("-answer_count", "id")
+        .values_list("id", "title", "description", "answer_count")[:TOP_SURVEYS]
+    )
+    values = {
+        "total_surveys": surveys.count(),
+        "total_responses": QuestionStats.objects.filter(survey__owner=owner).aggregate(
+            n=Coalesce(Sum("answer_count"), 0)
+        )["n"],
+        "top_surveys": [
+            {"id": pk, "title": title, "description": description, "responses": n}
+            for pk, title, description, n in top
+        ],
+        "refreshed_at": timezone.now(),
+    }
+    if full:
+        values["total_respondents"] = Respondent.objects.filter(survey__owner=owner).count()
+        return DashboardSnapshot.objects.update_or_create(owner=owner, defaults=values)[0]
+    DashboardSnapshot.objects.filter(owner=owner).update(**values)
+    return DashboardSnapshot.objects.get(owner=owner)
+
+
+def snapshot(owner, fresh=False):
+    """Instantané du propriétaire : une lecture, recalculé s'il est trop ancien ou si `fresh`."""
+    current = DashboardSnapshot.objects.filter(owner=owner).first()
+    if fresh or current is None or current.refreshed_at is None:
+        return refresh(owner, full=True)
+    max_age = timedelta(seconds=getattr(settings, "DASHBOARD_SNAPSHOT_MAX_AGE", 60))
+    if current.refreshed_at < timezone.now() - max_age:
+        return refresh(owner)
+    return current
@@ -0,0 +1,227 @@
+# survey/export_jobs.py
+"""
+Exports en arrière-plan : file d'attente en base (table ExportJob), sans broker.
+
+  API       : enqueue() -> job « pending », l'utilisateur interroge le statut
+  worker    : claim_next() prend le plus ancien job libre (SELECT ... FOR UPDATE
+              SKIP LOCKED, puis mise à jour conditionnelle : deux workers ne
+              prennent jamais le même job), run() écrit le fichier dans
+              EXPORT_ROOT en publiant l'avancement
+  nettoyage : cleanup() marque les jobs expirés et supprime leurs fichiers
+
+La même file rend les nuages de mots du résumé (format « wordcloud », voir
+survey/wordclouds.py) : jobs internes, sans demandeur ni expiration, absents
+de l'API des exports.
+
+Un job « running » dont le battement de cœur (updated_at) est plus vieux que
+EXPORT_JOB_STALE_SECONDS est considéré abandonné (worker arrêté) et repris,
+dans la limite de EXPORT_JOB_MAX_ATTEMPTS tentatives ; au-delà il passe en
+« failed ». Chaque écriture du worker porte sur sa tentative (attempts) : un
+worker dont le job a été repris entre-temps n'écrase pas le nouveau.
+"""
+import logging
+import os
+import secrets
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from . import exports, wordclouds
+from .models import ExportJob, QuestionStats, Respondent
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED, EXPIRED = "pending", "running", "done", "failed", "expired"
+
+# message exposé par l'API (le détail de l'exception est journalisé)
+EXPORT_FAILED = "L'export a échoué."
+ABANDONED = "Le worker s'est arrêté pendant la dernière tentative."
+
+
+def _long_total(survey):
+    # une ligne par réponse : somme des compteurs QuestionStats, sans compter les réponses
+    return QuestionStats.objects.filter(survey=survey).aggregate(n=Sum("answer_count"))["n"] or 0
+
+
+def _wide_total(survey):
+    return Respondent.objects.filter(survey=survey).count()
+
+
+def _columnar(fmt):
+    return lambda survey, out, progress: exports.write_survey_wide_columnar(survey, fmt, out, progress=progress)
+
+
+def _streamed(stream, encode=False):
+    def write(survey, out, progress):
+        for chunk in stream(survey, progress=progress):
+            out.write(chunk.encode("utf-8") if encode else chunk)
+    return write
+
+
+# format -> (extension, type MIME, nombre total d'unités, écriture(survey, fichier, progress))
+FORMATS = {
+    "xlsx": ("xlsx", exports.XLSX_CONTENT_TYPE, _long_total, _streamed(exports.stream_survey_xlsx)),
+    "csv": ("csv", exports.WIDE_FORMATS["csv"][0], _wide_total, _streamed(exports.stream_survey_wide_csv, True)),
+    "parquet": ("parquet", exports.WIDE_FORMATS["parquet"][0], _wide_total, _columnar("parquet")),
+    "arrow": ("arrow", exports.WIDE_FORMATS["arrow"][0], _wide_total, _columnar("arrow")),
+    "pdf": ("pdf", exports.PDF_CONTENT_TYPE, lambda survey: survey.questions.count(), exports.write_survey_pdf),
+}
+COLUMNAR = ("parquet", "arrow")
+
+
+def root():
+    return Path(getattr(settings, "EXPORT_ROOT", Path(settings.BASE_DIR) / "media" / "exports"))
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt not in COLUMNAR or exports.pyarrow is not None]
+
+
+def enqueue(survey, user, fmt):
+    return ExportJob.objects.create(survey=survey, requested_by=user, format=fmt)
+
+
+def claim_next():
+    """Réserve le prochain job à traiter (ou None). Sûr avec plusieurs workers."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, "EXPORT_JOB_STALE_SECONDS", 600))
+    max_attempts = getattr(settings, "EXPORT_JOB_MAX_ATTEMPTS", 3)
+    # abandonné pendant sa dernière tentative : plus repris, donc en échec
+    ExportJob.objects.filter(status=RUNNING, updated_at__lt=stale, attempts__gte=max_attempts).update(
+        status=FAILED, error=ABANDONED, updated_at=now
+    )
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=PENDING) | Q(status=RUNNING, updated_at__lt=stale), attempts__lt=max_attempts)
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        # SQLite ignore FOR UPDATE : la mise à jour conditionnelle départage les workers
+        claimed = ExportJob.objects.filter(pk=job.pk, status=job.status, updated_at=job.updated_at).update(
+            status=RUNNING, attempts=job.attempts + 1, progress=0, started_at=now, updated_at=now
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+class _Progress:
+    """Publie l'avancement (en %) au plus une fois par seconde ; sert de battement de cœur."""
+
+    def __init__(self, job, total):
+        self.job, self.total, self.last = job, max(total, 1), 0.0
+
+    def __call__(self, done):
+        now = time.monotonic()
+        if now - self.last < 1:
+            return
+        self.last = now
+        percent = min(99, int(done * 100 / self.total))
+        ExportJob.objects.filter(pk=self.job.pk, status=RUNNING, attempts=self.job.attempts).update(
+            progress=percent, updated_at=timezone.now()
+        )
+
+
+def _current(job):
+    """Jobs encore tenus par cette tentative (vide si un autre worker l'a repris)."""
+    return ExportJob.objects.filter(pk=job.pk, status=RUNNING, attempts=job.attempts)
+
+
+def _write(job):
+    """Écrit le fichier d'un export dans EXPORT_ROOT (fichier temporaire puis rename) ; retourne son chemin."""
+    extension, _, total, write = FORMATS[job.format]
+    directory = root()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{job.id}-{secrets.token_hex(8)}.{extension}"
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    try:
+        with open(tmp, "wb") as out:
+            write(job.survey, out, _Progress(job, total(job.survey)))
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return path
+
+
+def run(job):
+    """Produit le fichier du job ; statut final done ou failed (ou pending pour une nouvelle tentative)."""
+    wordcloud = job.format == wordclouds.WORDCLOUD
+    try:
+        path = wordclouds.run(job) if wordcloud else _write(job)
+    except Exception:
+        logger.exception("export %s : échec", job.id)
+        retry = job.attempts < getattr(settings, "EXPORT_JOB_MAX_ATTEMPTS", 3)
+        _current(job).update(status=PENDING if retry else FAILED, error=EXPORT_FAILED, updated_at=timezone.now())
+        return False
+
+    now = timezone.now()
+    ttl = timedelta(hours=getattr(settings, "EXPORT_TTL_HOURS", 24))
+    finished = _current(job).update(
+        status=DONE, progress=100, file_path=str(path or ""), size=path.stat().st_size if path else None, error="",
+        finished_at=now, expires_at=None if wordcloud else now + ttl, updated_at=now,
+    )
+    if not finished:
+        logger.warning("export %s : repris par un autre worker, tentative %s abandonnée", job.id, job.attempts)
+        if not wordcloud:  # l'image d'un nuage est partagée, l'autre tentative l'attend
+            path.unlink()
+        return False
+    return True
+
+
+def cleanup(now=None):
+    """
+    Expire les exports dont la date est passée et supprime leurs fichiers,
+    ainsi que les fichiers orphelins (job supprimé avec son enquête) plus
+    vieux que EXPORT_TTL_HOURS. Supprime les jobs de nuage de mots terminés
+    depuis EXPORT_TTL_HOURS et les images de nuage remplacées
+    (wordclouds.prune). Retourne le nombre de fichiers supprimés.
+    """
+    now = now or timezone.now()
+    ttl = timedelta(hours=getattr(settings, "EXPORT_TTL_HOURS", 24))
+    ExportJob.objects.filter(format=wordclouds.WORDCLOUD, status__in=(DONE, FAILED), updated_at__lte=now - ttl).delete()
+    removed = wordclouds.prune()
+    expired = ExportJob.objects.filter(status=DONE, expires_at__lte=now)
+    for job_id, file_path in expired.values_list("id", "file_path"):
+        if file_path and os.path.exists(file_path):
+            os.unlink(file_path)
+            removed += 1
+    expired.update(status=EXPIRED, file_path="", updated_at=now)
+
+    directory = root()
+    if directory.is_dir():
+        cutoff = (now - ttl).timestamp()
+        live = set(ExportJob.objects.filter(status__in=(RUNNING, DONE)).values_list("file_path", flat=True))
+        for path in directory.iterdir():
+            if path.is_file() and str(path) not in live and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def work(once=False, poll=2.0, cleanup_every=300.0, stdout=None):
+    """Boucle du worker : traite les jobs un par un, nettoie périodiquement."""
+    last_cleanup = 0.0
+    while True:
+        if time.monotonic() - last_cleanup >= cleanup_every:
+            cleanup()
+            last_cleanup = time.monotonic()
+        job = claim_next()
+        if job is not None:
+            ok = run(job)
+            if stdout is not None:
+                stdout.write(f"export {job.id} ({job.format}) : {'terminé' if ok else 'échec'}")
+            continue
+        if once:
+            return
+        time.sleep(poll)
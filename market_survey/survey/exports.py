@@ -0,0 +1,608 @@
+# survey/exports.py
+"""
+Exports des réponses d'une enquête.
+
+Le classeur XLSX est produit par morceaux (générateur d'octets) : les lignes
+sont lues via un seul queryset parcouru avec iterator(chunk_size=...) et
+écrites directement dans l'archive zip, sans jamais construire le classeur
+complet en mémoire.
+
+L'export « large » (une ligne par répondant, une colonne par question) est
+construit en un seul passage sur une requête à plat, puis écrit en CSV (flux)
+ou en Parquet / Arrow (si pyarrow est installé).
+
+Les fonctions d'export acceptent un rappel `progress(n)` (n lignes écrites),
+utilisé par les exports en arrière-plan (survey/export_jobs.py).
+"""
+import csv
+import io
+import re
+import tempfile
+import zipfile
+from collections import defaultdict
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from reportlab.graphics.charts.barcharts import HorizontalBarChart
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+from .analytics import CHOICE_TYPES
+from .models import ChoiceTally, QuestionStats, Respondent, Response, TermFrequency
+
+# dépendance optionnelle : exports Parquet / Arrow
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PDF_CONTENT_TYPE = "application/pdf"
+
+WIDE_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+EXPORT_HEADERS = ["Nom du Participant", "Enquêteur", "Date", "Question", "Réponse"]
+
+# caractères interdits dans un document XML 1.0
+_ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def counted(rows, progress, every=1000):
+    """Relaie `rows` en appelant progress(n) toutes les `every` lignes, puis à la fin."""
+    if progress is None:
+        yield from rows
+        return
+    n = 0
+    for n, row in enumerate(rows, start=1):
+        yield row
+        if n % every == 0:
+            progress(n)
+    progress(n)
+
+
+def selected_choice_texts(response_ids):
+    """{response_id: [texte du choix, ...]} pour un lot de réponses (une requête)."""
+    through = Response.selected_choices.through
+    texts = defaultdict(list)
+    rows = (
+        through.objects.filter(response_id__in=response_ids)
+        .order_by("response_id", "choice_id")
+        .values_list("response_id", "choice__text")
+    )
+    for response_id, text in rows:
+        texts[response_id].append(text)
+    return texts
+
+
+def survey_long_rows(survey, chunk_size=2000):
+    """
+    Une ligne par (répondant, question), dans l'ordre de l'export historique :
+    répondants du plus récent au plus ancien.
+    Un seul queryset parcouru par lots ; les choix sélectionnés sont chargés
+    lot par lot (une requête par tranche de `chunk_size` réponses).
+    """
+    responses = (
+        Response.objects.filter(survey=survey)
+        .order_by("-respondent__created_at", "respondent_id", "id")
+        .values_list(
+            "id",
+            "answer_text",
+            "respondent__participant_name",
+            "respondent__interviewer_name",
+            "respondent__created_at",
+            "question__text",
+            "question__question_type",
+        )
+    )
+    for chunk in _chunked(responses.iterator(chunk_size=chunk_size), chunk_size):
+        choice_texts = selected_choice_texts(
+            [row[0] for row in chunk if row[6] in CHOICE_TYPES]
+        )
+        for response_id, answer_text, participant, interviewer, created_at, question_text, qtype in chunk:
+            if qtype in CHOICE_TYPES:
+                answer = ", ".join(choice_texts.get(response_id, [])) or "(Aucune sélection)"
+            else:
+                answer = answer_text or "(Vide)"
+
+            yield [
+                participant or "Anonyme",
+                interviewer,
+                created_at.strftime("%d/%m/%Y %H:%M"),
+                question_text,
+                answer,
+            ]
+
+
+# -------------------------------------------------
+# Écriture XLSX en flux
+# -------------------------------------------------
+class _ChunkSink(io.RawIOBase):
+    """Tampon non « seekable » : zipfile y écrit, on vide au fil de l'eau."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "</Types>"
+)
+
+_ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+_WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    "</Relationships>"
+)
+
+_STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+
+def _workbook_xml(sheet_title):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f"<sheets><sheet name={quoteattr(sheet_title[:31])} sheetId=\"1\" r:id=\"rId1\"/></sheets>"
+        "</workbook>"
+    )
+
+
+def _sheet_header_xml(freeze_header):
+    pane = (
+        '<sheetViews><sheetView workbookViewId="0">'
+        '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+        "</sheetView></sheetViews>"
+        if freeze_header
+        else ""
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f"{pane}<sheetData>"
+    )
+
+
+def _cell_xml(value):
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row_xml(index, values):
+    cells = "".join(_cell_xml(v) for v in values)
+    return f'<row r="{index}">{cells}</row>'
+
+
+def stream_xlsx(rows, sheet_title="Feuille 1", headers=None, freeze_header=True, flush_every=500):
+    """
+    Génère les octets d'un fichier XLSX (une seule feuille) à partir d'un itérable de lignes.
+    La mémoire utilisée ne dépend pas du nombre de lignes.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES_XML)
+        zf.writestr("_rels/.rels", _ROOT_RELS_XML)
+        zf.writestr("xl/workbook.xml", _workbook_xml(sheet_title))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS_XML)
+        zf.writestr("xl/styles.xml", _STYLES_XML)
+        yield sink.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write(_sheet_header_xml(freeze_header and headers).encode("utf-8"))
+            index = 0
+            if headers:
+                index += 1
+                sheet.write(_row_xml(index, headers).encode("utf-8"))
+
+            buffer = []
+            for values in rows:
+                index += 1
+                buffer.append(_row_xml(index, values))
+                if len(buffer) >= flush_every:
+                    sheet.write("".join(buffer).encode("utf-8"))
+                    buffer.clear()
+                    data = sink.drain()
+                    if data:
+                        yield data
+            if buffer:
+                sheet.write("".join(buffer).encode("utf-8"))
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def stream_survey_xlsx(survey, chunk_size=2000, progress=None):
+    """Export long (une ligne par réponse) d'une enquête, en flux."""
+    return stream_xlsx(
+        counted(survey_long_rows(survey, chunk_size=chunk_size), progress),
+        sheet_title="Données d'enquête",
+        headers=EXPORT_HEADERS,
+    )
+
+
+# -------------------------------------------------
+# Export large : une ligne par répondant
+# -------------------------------------------------
+WIDE_FIXED_HEADERS = ["ID répondant", "Nom du Participant", "Enquêteur", "Date"]
+
+
+class WideLayout:
+    """
+    Colonnes de l'export large :
+      - texte / numérique / choix unique : une colonne par question,
+      - choix multiple : une colonne 0/1 par choix (one-hot).
+    """
+
+    def __init__(self, survey):
+        self.headers = list(WIDE_FIXED_HEADERS)
+        self.kinds = ["int", "str", "str", "datetime"]
+        self.question_col = {}   # question_id -> colonne (texte, numérique, choix unique)
+        self.choice_col = {}     # choice_id -> colonne one-hot (choix multiple)
+        self.choice_text = {}    # choice_id -> texte (choix unique)
+        self.onehot_cols = {}    # question_id -> colonnes one-hot de la question
+
+        seen = set()
+        for position, question in enumerate(survey.questions.prefetch_related("choices"), start=1):
+            label = f"Q{position}. {question.text}"
+            if question.question_type == "multiple":
+                cols = []
+                for choice in question.choices.all():
+                    self.choice_col[choice.id] = self._add(f"{label} [{choice.text}]", "onehot", seen)
+                    cols.append(self.choice_col[choice.id])
+                self.onehot_cols[question.id] = cols
+            else:
+                kind = "float" if question.question_type == "number" else "str"
+                self.question_col[question.id] = self._add(label, kind, seen)
+                for choice in question.choices.all():
+                    self.choice_text[choice.id] = choice.text
+
+    def _add(self, header, kind, seen):
+        name, n = header, 1
+        while name in seen:
+            n += 1
+            name = f"{header} ({n})"
+        seen.add(name)
+        self.headers.append(name)
+        self.kinds.append(kind)
+        return len(self.headers) - 1
+
+
+def _to_float(value):
+    try:
+        return float(str(value).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def survey_wide_rows(survey, layout=None, chunk_size=5000):
+    """
+    Pivot en un seul passage : les répondants (triés) pilotent l'itération et
+    la requête à plat des réponses (réponse × choix sélectionné), triée de la
+    même façon, est fusionnée au fil de l'eau ; chaque ligne remplit
+    directement sa colonne. Génère une liste de valeurs par répondant (dans
+    l'ordre de layout.headers), y compris pour les soumissions sans réponse.
+    """
+    layout = layout or WideLayout(survey)
+    width = len(layout.headers)
+    respondents = (
+        Respondent.objects.filter(survey=survey)
+        .order_by("-created_at", "id")
+        .values_list("id", "participant_name", "interviewer_name", "created_at")
+        .iterator(chunk_size=chunk_size)
+    )
+    flat = (
+        Response.objects.filter(survey=survey, respondent__survey=survey)
+        .order_by("-respondent__created_at", "respondent_id", "id")
+        .values_list("respondent_id", "respondent__created_at", "question_id", "answer_text", "selected_choices")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    pending = next(flat, None)
+    for respondent_id, participant, interviewer, created_at in respondents:
+        # réponses d'un répondant apparu entre les deux requêtes : ignorées
+        while pending is not None and (
+            pending[1] > created_at or (pending[1] == created_at and pending[0] < respondent_id)
+        ):
+            pending = next(flat, None)
+
+        row = [None] * width
+        row[0:4] = [respondent_id, participant or "Anonyme", interviewer, created_at]
+        while pending is not None and pending[0] == respondent_id:
+            _, _, qid, text, choice_id = pending
+            pending = next(flat, None)
+
+            onehot = layout.onehot_cols.get(qid)
+            if onehot is not None:
+                # question répondue : toutes ses colonnes passent à 0, le choix à 1
+                for col in onehot:
+                    if row[col] is None:
+                        row[col] = 0
+                if choice_id in layout.choice_col:
+                    row[layout.choice_col[choice_id]] = 1
+                continue
+
+            col = layout.question_col.get(qid)
+            if col is None:
+                continue
+            if choice_id is not None:
+                value = layout.choice_text.get(choice_id)
+                row[col] = value if row[col] is None else f"{row[col]}, {value}"
+            elif text:
+                row[col] = _to_float(text) if layout.kinds[col] == "float" else text
+        yield row
+
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : write() renvoie la ligne au lieu de la stocker."""
+
+    def write(self, value):
+        return value
+
+
+def stream_survey_wide_csv(survey, progress=None):
+    """Export large en CSV (flux ; BOM UTF-8 pour l'ouverture dans Excel)."""
+    layout = WideLayout(survey)
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(layout.headers)
+    for row in counted(survey_wide_rows(survey, layout), progress):
+        if row[3] is not None:
+            row[3] = row[3].isoformat()
+        yield writer.writerow(row)
+
+
+def _arrow_schema(layout):
+    types = {
+        "int": pyarrow.int64(),
+        "str": pyarrow.string(),
+        "float": pyarrow.float64(),
+        "onehot": pyarrow.int8(),
+        "datetime": pyarrow.timestamp("us", tz="UTC"),
+    }
+    return pyarrow.schema(
+        [pyarrow.field(name, types[kind]) for name, kind in zip(layout.headers, layout.kinds)]
+    )
+
+
+def write_survey_wide_columnar(survey, fmt, fileobj, batch_rows=10000, progress=None):
+    """
+    Écrit l'export large en Parquet ou Arrow (format fichier IPC) dans `fileobj`,
+    par lots de `batch_rows` répondants.
+    """
+    if pyarrow is None:
+        raise RuntimeError("pyarrow n'est pas installé.")
+
+    layout = WideLayout(survey)
+    schema = _arrow_schema(layout)
+    if fmt == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(fileobj, schema, compression="zstd")
+        write = writer.write_table
+    else:
+        writer = pyarrow.ipc.new_file(fileobj, schema)
+        write = writer.write
+
+    def flush(rows):
+        columns = [list(col) for col in zip(*rows)]
+        write(pyarrow.Table.from_arrays(columns, schema=schema))
+
+    try:
+        for rows in _chunked(counted(survey_wide_rows(survey, layout), progress), batch_rows):
+            flush(rows)
+    finally:
+        writer.close()
+
+
+def survey_wide_columnar_file(survey, fmt):
+    """Fichier temporaire (supprimé à la fermeture) contenant l'export Parquet / Arrow."""
+    tmp = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    write_survey_wide_columnar(survey, fmt, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+# -------------------------------------------------
+# Rapport PDF
+# -------------------------------------------------
+PDF_BAR_COLOR = colors.HexColor("#0d6efd")
+
+
+def _ranked(queryset, partition, order, limit):
+    """Les `limit` premières lignes de chaque partition, en une requête (fonction fenêtre)."""
+    return queryset.annotate(
+        rank=Window(RowNumber(), partition_by=F(partition), order_by=order)
+    ).filter(rank__lte=limit)
+
+
+def survey_report_data(survey, sample_size=None, top_terms=None):
+    """
+    Données du rapport PDF en un nombre constant de requêtes, quel que soit le
+    nombre de questions ou de réponses : définition (values), compteurs
+    ChoiceTally / QuestionStats, termes fréquents (TermFrequency) et un
+    échantillon borné de réponses libres par question.
+    """
+    from .serializers import survey_questions
+
+    sample_size = sample_size or getattr(settings, "PDF_SAMPLE_ANSWERS", 20)
+    top_terms = top_terms or getattr(settings, "PDF_TOP_TERMS", 10)
+
+    questions = survey_questions([survey.id])[survey.id]
+    counts = dict(ChoiceTally.objects.filter(question__survey=survey).values_list("choice_id", "count"))
+    answered = dict(QuestionStats.objects.filter(survey=survey).values_list("question_id", "answer_count"))
+
+    samples = defaultdict(list)
+    rows = _ranked(
+        Response.objects.filter(survey=survey).exclude(question__question_type__in=CHOICE_TYPES).exclude(answer_text=""),
+        "question_id", F("id").desc(), sample_size,
+    ).values_list("question_id", "answer_text")
+    for question_id, text in rows:
+        samples[question_id].append(text)
+
+    terms = defaultdict(list)
+    rows = _ranked(
+        TermFrequency.objects.filter(survey=survey, count__gt=0),
+        "question_id", [F("count").desc(), F("term").asc()], top_terms,
+    ).values_list("question_id", "term", "count")
+    for question_id, term, n in rows:
+        terms[question_id].append((term, n))
+
+    return {
+        "respondents": Respondent.objects.filter(survey=survey).count(),
+        "questions": [
+            {
+                **question,
+                "answered": answered.get(question["id"], 0),
+                "counts": [counts.get(choice["id"], 0) for choice in question["choices"]],
+                "sample": samples.get(question["id"], []),
+                "terms": terms.get(question["id"], []),
+            }
+            for question in questions
+        ],
+    }
+
+
+def _bar_chart(labels, values, base):
+    """Barres horizontales : une par choix, étiquetées « n (p %) » (p rapporté à `base`)."""
+    row = 18
+    drawing = Drawing(460, row * len(labels) + 20)
+    chart = HorizontalBarChart()
+    chart.x, chart.y = 170, 10
+    chart.width, chart.height = 220, row * len(labels)
+    chart.data = [values]
+    chart.bars[0].fillColor = PDF_BAR_COLOR
+    chart.barWidth = row * 0.6
+    chart.categoryAxis.categoryNames = [label if len(label) <= 35 else label[:34] + "…" for label in labels]
+    chart.categoryAxis.reverseDirection = 1  # premier choix en haut
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = max(max(values, default=0), 1)
+    chart.valueAxis.visible = 0
+    chart.barLabels.fontSize = 8
+    chart.barLabels.boxAnchor = "w"
+    chart.barLabels.dx = 3
+    chart.barLabelFormat = lambda n: f"{n} ({n * 100 / base:.0f} %)" if base else str(n)
+    drawing.add(chart)
+    return drawing
+
+
+def write_survey_pdf(survey, fileobj, progress=None):
+    """
+    Écrit le rapport PDF de l'enquête dans `fileobj` (progress(n) : n questions traitées).
+    Questions à choix : graphique en barres (comptes et pourcentages des
+    répondants à la question) ; questions libres : termes fréquents et
+    échantillon des réponses les plus récentes.
+    """
+    data = survey_report_data(survey)
+    styles = getSampleStyleSheet()
+    elements = [
+        Paragraph(f"📊 Rapport d’enquête : {escape(survey.title)}", styles["Title"]),
+        Spacer(1, 12),
+        Paragraph(f"Description : {escape(survey.description or '')}", styles["Normal"]),
+        Spacer(1, 12),
+        Paragraph(f"Nombre d’enquêteurs : {data['respondents']}", styles["Normal"]),
+        Spacer(1, 12),
+    ]
+
+    for question in counted(data["questions"], progress, every=10):
+        elements.append(Paragraph(f"• {escape(question['text'])}", styles["Heading4"]))
+        elements.append(Paragraph(f"({question['answered']} réponses)", styles["Normal"]))
+        if question["question_type"] in CHOICE_TYPES:
+            if question["choices"]:
+                labels = [choice["text"] for choice in question["choices"]]
+                elements.append(_bar_chart(labels, question["counts"], question["answered"]))
+        else:
+            if question["terms"]:
+                words = ", ".join(f"{term} ({n})" for term, n in question["terms"])
+                elements.append(Paragraph(f"Termes fréquents : {escape(words)}", styles["Normal"]))
+            for text in question["sample"]:
+                elements.append(Paragraph(f"- {escape(text)}", styles["Normal"]))
+            if question["answered"] > len(question["sample"]):
+                elements.append(Paragraph(
+                    f"<i>{len(question['sample'])} réponses les plus récentes sur {question['answered']}.</i>",
+                    styles["Normal"],
+                ))
+        elements.append(Spacer(1, 10))
+
+    SimpleDocTemplate(fileobj, pagesize=A4).build(elements)
+
+
+def survey_pdf_bytes(survey):
+    """
+    Rapport PDF en mémoire. ReportLab ne sérialise le document qu'à la fin
+    de build() ; avec des réponses libres échantillonnées, il reste compact.
+    """
+    buffer = io.BytesIO()
+    write_survey_pdf(survey, buffer)
+    return buffer.getvalue()
@@ -0,0 +1,191 @@
+# survey/idempotency.py
+"""
+Clés d'idempotence des requêtes d'écriture (en-tête Idempotency-Key).
+
+Un client qui renvoie une requête après une coupure réseau renvoie la même
+clé : IdempotencyMiddleware réserve la clé de façon atomique (contrainte
+unique scope + clé), exécute la vue une seule fois et enregistre sa réponse ;
+les répétitions reçoivent la réponse enregistrée sans aucune écriture.
+
+  même clé, même requête, terminée      -> réponse enregistrée
+                                           (en-tête Idempotent-Replayed: true)
+  même clé, même requête, en cours      -> 409 + Retry-After
+  même clé, autre requête (empreinte)   -> 422
+  réponse 5xx, streaming ou trop grosse -> non enregistrée, la clé est libérée
+
+Les clés sont propres à un compte ; sans compte, à la session, sinon à
+l'adresse IP du client.
+
+Les clés expirent après IDEMPOTENCY_TTL_HOURS (24 par défaut) ; purge() les
+supprime (commande purge_idempotency_keys). Une réservation plus vieille que
+IDEMPOTENCY_PROCESSING_TIMEOUT secondes (processus arrêté) est reprise : la
+valeur doit dépasser la durée maximale d'une requête (timeout du serveur
+d'application, 900 s par défaut), sinon une requête lente encore en cours
+serait exécutée une seconde fois. Chaque écriture de la réservation porte sur
+son claimed_at : une requête dont la clé a été reprise n'écrase ni ne libère
+la réservation suivante.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+try:
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    JWTAuthentication = None
+
+HEADER = "Idempotency-Key"
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+PROCESSING, DONE = "processing", "done"
+PROCESSING_TIMEOUT = 900  # secondes ; au moins le timeout des workers (gunicorn --timeout)
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_TTL_HOURS", 24))
+
+
+def _scope(request):
+    """
+    Compte de la requête : session, sinon jeton JWT (authentifié plus tard
+    par DRF). Sans compte : la session, sinon l'adresse IP du client, pour
+    que deux anonymes ne partagent pas leurs clés.
+    """
+    user = getattr(request, "user", None)
+    if (user is None or not user.is_authenticated) and JWTAuthentication is not None:
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except Exception:  # jeton invalide ou expiré : la vue répondra 401
+            result = None
+        user = result[0] if result else None
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    session = getattr(request, "session", None)
+    if session is not None and session.session_key:
+        return f"session:{session.session_key}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def fingerprint(request):
+    """
+    sha256 de la méthode, du chemin et du contenu. Les formulaires sont pris
+    champ par champ : la limite multipart change à chaque renvoi.
+    """
+    digest = hashlib.sha256(f"{request.method}\0{request.get_full_path()}\0".encode("utf-8"))
+    if request.content_type in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        fields = sorted(request.POST.lists())
+        files = sorted((name, f.name, f.size) for name, f in request.FILES.items())
+        digest.update(json.dumps([fields, files], ensure_ascii=False).encode("utf-8"))
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim(scope, key, fingerprint):
+    """
+    (enregistrement, réservé). réservé=True : cette requête exécute la vue.
+    Une clé déjà connue n'est lue qu'une fois (aucune écriture) ; une clé expirée
+    ou une réservation figée est reprise par mise à jour conditionnelle.
+    """
+    for _ in range(3):
+        now = timezone.now()
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        scope=scope, key=key, fingerprint=fingerprint, claimed_at=now, expires_at=now + _ttl()
+                    ), True
+            except IntegrityError:
+                continue  # requête concurrente avec la même clé : on relit
+
+        stale = now - timedelta(seconds=getattr(settings, "IDEMPOTENCY_PROCESSING_TIMEOUT", PROCESSING_TIMEOUT))
+        expired = record.expires_at <= now
+        abandoned = record.status == PROCESSING and record.claimed_at <= stale and record.fingerprint == fingerprint
+        if not (expired or abandoned):
+            return record, False
+        taken = IdempotencyKey.objects.filter(pk=record.pk, status=record.status, claimed_at=record.claimed_at).update(
+            fingerprint=fingerprint, status=PROCESSING, claimed_at=now, expires_at=now + _ttl(),
+            response_status=None, response_headers={}, response_body=b"",
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+    raise IntegrityError(f"clé d'idempotence {key!r} : réservation impossible")
+
+
+def replay(record, fingerprint):
+    """Réponse à une répétition : réponse enregistrée, 409 (en cours) ou 422 (autre requête)."""
+    if record.fingerprint != fingerprint:
+        return JsonResponse({"detail": "Idempotency-Key already used for a different request."}, status=422)
+    if record.status == PROCESSING:
+        response = JsonResponse({"detail": "A request with this Idempotency-Key is in progress."}, status=409)
+        response["Retry-After"] = "1"
+        return response
+    response = HttpResponse(bytes(record.response_body), status=record.response_status)
+    for name, value in record.response_headers.items():
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _held(record):
+    """La réservation de cette requête (vide si la clé a été reprise depuis)."""
+    return IdempotencyKey.objects.filter(pk=record.pk, status=PROCESSING, claimed_at=record.claimed_at)
+
+
+def release(record):
+    """Libère la clé réservée par cette requête."""
+    _held(record).delete()
+
+
+def store(record, response):
+    """Enregistre la réponse de la vue, ou libère la clé si elle ne doit pas être rejouée."""
+    max_body = getattr(settings, "IDEMPOTENCY_MAX_BODY", 1024 * 1024)
+    if response.streaming or response.status_code >= 500 or len(response.content) > max_body:
+        release(record)
+        return
+    _held(record).update(
+        status=DONE,
+        response_status=response.status_code,
+        response_headers=dict(response.items()),
+        response_body=response.content,
+    )
+
+
+def purge(now=None):
+    """Supprime les clés expirées ; retourne leur nombre."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+class IdempotencyMiddleware:
+    """À placer après AuthenticationMiddleware. Sans en-tête Idempotency-Key, rien ne change."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get(HEADER)
+        if not key or request.method not in WRITE_METHODS:
+            return self.get_response(request)
+        if len(key) > 255:
+            return JsonResponse({"detail": "Idempotency-Key must be at most 255 characters."}, status=400)
+
+        digest = fingerprint(request)
+        record, claimed = claim(_scope(request), key, digest)
+        if not claimed:
+            return replay(record, digest)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release(record)
+            raise
+        store(record, response)
+        return response
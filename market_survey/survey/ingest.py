@@ -0,0 +1,299 @@
+# survey/ingest.py
+"""
+Ingestion groupée de réponses pour POST /api/responses/bulk/.
+
+Chaque élément est validé par ResponseSerializer (mêmes règles et mêmes
+erreurs que POST /api/responses/), les objets référencés (questions,
+répondants, choix, enquêtes) étant chargés une seule fois pour tout le lot ;
+le lot est ensuite écrit par bulk_create : le nombre de requêtes ne dépend
+pas de la taille du lot.
+
+write_submissions écrit de la même façon des soumissions complètes du
+formulaire public (take_survey, directement ou via survey/spool.py).
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Survey, Question, Choice, Respondent, Response
+from .serializers import ResponseSerializer
+from . import tallies
+
+logger = logging.getLogger(__name__)
+
+MODE_ATOMIC = "atomic"
+MODE_PARTIAL = "partial"
+MODES = (MODE_ATOMIC, MODE_PARTIAL)
+
+# renvoyé au client à la place du message de la base (journalisé)
+WRITE_FAILED = "Write failed; resend this item."
+
+
+def _pk(value):
+    """Clé primaire telle que la lit PreloadedPrimaryKeyRelatedField, ou None."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _collect_ids(items):
+    question_ids, respondent_ids, choice_ids, survey_ids = set(), set(), set(), set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        question_ids.add(_pk(item.get("question")))
+        respondent_ids.add(_pk(item.get("respondent_id")))
+        if isinstance(item.get("respondent_data"), dict):
+            survey_ids.add(_pk(item["respondent_data"].get("survey")))
+        if isinstance(item.get("selected_choices"), list):
+            choice_ids.update(_pk(c) for c in item["selected_choices"])
+    return (ids - {None} for ids in (question_ids, respondent_ids, choice_ids, survey_ids))
+
+
+class ReferenceIndex:
+    """Objets référencés par le lot, chargés en quatre requêtes : {modèle: {pk: instance}}."""
+
+    def __init__(self, items):
+        question_ids, respondent_ids, choice_ids, survey_ids = _collect_ids(items)
+        questions = Question.objects.filter(id__in=question_ids).select_related("survey").only("survey__owner_id")
+        self.preloaded = {
+            Question: {q.pk: q for q in questions},
+            Respondent: {r.pk: r for r in Respondent.objects.filter(id__in=respondent_ids).only("id")},
+            Choice: {c.pk: c for c in Choice.objects.filter(id__in=choice_ids).only("question_id")},
+            Survey: {s.pk: s for s in Survey.objects.filter(id__in=survey_ids).only("id")},
+        }
+
+    def serializer(self):
+        return ResponseSerializer(context={"preloaded": self.preloaded})
+
+
+def validate_item(item, serializer):
+    """
+    Retourne (données nettoyées, None) ou (None, erreurs par champ).
+    Données : question_id, survey_id, owner_id, respondent_id | respondent (dict), answer_text, choice_ids.
+    """
+    try:
+        data = serializer.run_validation(item)
+    except ValidationError as exc:
+        return None, exc.detail
+    if data.get("respondent") is None:
+        return None, {"respondent_id": [serializer.fields["respondent_id"].error_messages["required"]]}
+
+    question = data["question"]
+    clean = {
+        "question_id": question.pk,
+        "survey_id": question.survey_id,
+        "owner_id": question.survey.owner_id,
+        "answer_text": data.get("answer_text") or "",
+        "choice_ids": list(dict.fromkeys(choice.pk for choice in data.get("selected_choices", []))),
+    }
+    respondent = data["respondent"]
+    if isinstance(respondent, dict):
+        clean["respondent"] = {
+            "survey_id": respondent["survey"].pk,
+            "interviewer_name": respondent["interviewer_name"],
+            "participant_name": respondent.get("participant_name", ""),
+        }
+    else:
+        clean["respondent_id"] = respondent.pk
+    return clean, None
+
+
+def write_responses(cleaned):
+    """
+    Écrit des éléments validés (bulk_create) et met à jour les compteurs.
+    Retourne les ids des réponses créées, dans l'ordre reçu.
+    """
+    new_respondents = [
+        Respondent(**data["respondent"]) for data in cleaned if "respondent" in data
+    ]
+    Respondent.objects.bulk_create(new_respondents, batch_size=1000)
+    tallies.apply_respondents(new_respondents)
+    created_respondents = iter(new_respondents)
+
+    responses = []
+    for data in cleaned:
+        respondent_id = data.get("respondent_id")
+        if respondent_id is None:
+            respondent_id = next(created_respondents).id
+        responses.append(
+            Response(
+                respondent_id=respondent_id,
+                question_id=data["question_id"],
+                survey_id=data["survey_id"],
+                answer_text=data["answer_text"],
+                created_by_id=data["owner_id"],
+            )
+        )
+    Response.objects.bulk_create(responses, batch_size=1000)
+
+    through = Response.selected_choices.through
+    through.objects.bulk_create(
+        [
+            through(response_id=response.id, choice_id=cid)
+            for response, data in zip(responses, cleaned)
+            for cid in data["choice_ids"]
+        ],
+        batch_size=1000,
+    )
+    ids = [response.id for response in responses]
+    if ids:
+        tallies.apply_responses(Response.objects.filter(id__in=ids))
+    return ids
+
+
+def write_submissions(submissions):
+    """
+    Écrit des soumissions complètes de take_survey, déjà validées : un
+    répondant et ses réponses par soumission. Format d'une soumission :
+    {"uuid", "survey_id", "owner_id", "interviewer_name",
+     "answers": [[question_id, answer_text, [choice_ids]], ...]}.
+
+    Exactement une fois par uuid (Respondent.client_uuid) : une soumission déjà
+    en base pour la même enquête est ignorée, y compris quand elle est écrite
+    par un envoi concurrent entre la lecture et l'insertion. Retourne
+    {uuid: respondent_id}, nouvelles et existantes ; un uuid déjà utilisé pour
+    une autre enquête n'est pas écrit et reste absent du résultat.
+    """
+    pending = {}
+    for submission in submissions:
+        pending.setdefault(str(uuid.UUID(submission["uuid"])), submission)
+    existing = _existing(pending)
+    candidates = [(key, submission) for key, submission in pending.items() if key not in existing]
+    new, respondents = _create_respondents(candidates)
+    if len(new) < len(candidates):
+        # écrites entre-temps par un envoi concurrent
+        created = {key for key, _ in new}
+        existing.update(_existing(key for key, _ in candidates if key not in created))
+    tallies.apply_respondents(respondents)
+
+    responses, choice_ids = [], []
+    for respondent, (_, submission) in zip(respondents, new):
+        for question_id, answer_text, ids in submission["answers"]:
+            responses.append(
+                Response(
+                    respondent_id=respondent.id,
+                    question_id=question_id,
+                    survey_id=submission["survey_id"],
+                    answer_text=answer_text,
+                )
+            )
+            choice_ids.append(ids)
+    Response.objects.bulk_create(responses, batch_size=1000)
+
+    through = Response.selected_choices.through
+    through.objects.bulk_create(
+        [
+            through(response_id=response.id, choice_id=cid)
+            for response, ids in zip(responses, choice_ids)
+            for cid in ids
+        ],
+        batch_size=1000,
+    )
+    if responses:
+        tallies.apply_responses(Response.objects.filter(respondent_id__in=[r.id for r in respondents]))
+
+    written = {key: pk for key, (pk, survey_id) in existing.items() if survey_id == pending[key]["survey_id"]}
+    written.update((key, respondent.id) for (key, _), respondent in zip(new, respondents))
+    return written
+
+
+def _existing(keys):
+    """Répondants déjà en base pour ces uuids : {uuid: (respondent_id, survey_id)}."""
+    rows = Respondent.objects.filter(client_uuid__in=list(keys)).values_list("client_uuid", "id", "survey_id")
+    return {str(client_uuid): (pk, survey_id) for client_uuid, pk, survey_id in rows}
+
+
+def _create_respondents(new):
+    """
+    Insère les répondants de `new` [(uuid, soumission)]. Si un uuid a été écrit
+    par un envoi concurrent depuis la lecture, l'insertion est reprise un par
+    un et ces uuids sont écartés. Retourne (soumissions écrites, répondants).
+    """
+    def build(items):
+        return [
+            Respondent(
+                survey_id=submission["survey_id"],
+                interviewer_name=submission["interviewer_name"],
+                created_by_id=submission["owner_id"],
+                client_uuid=key,
+            )
+            for key, submission in items
+        ]
+
+    try:
+        with transaction.atomic():
+            return new, Respondent.objects.bulk_create(build(new), batch_size=1000)
+    except IntegrityError:
+        pass
+    written, respondents = [], []
+    for item, respondent in zip(new, build(new)):
+        try:
+            with transaction.atomic():
+                Respondent.objects.bulk_create([respondent])
+        except IntegrityError:
+            continue
+        written.append(item)
+        respondents.append(respondent)
+    return written, respondents
+
+
+def ingest_responses(items, mode=MODE_ATOMIC, chunk_size=None):
+    """
+    Valide et écrit un lot. Retourne (results, errors), listes de
+    {"index", "id"} et {"index", "errors"}.
+
+    mode="atomic"  : rien n'est écrit si un élément est invalide ou si une
+                     écriture échoue (comportement historique).
+    mode="partial" : les éléments valides sont validés (commit) par paquets de
+                     `chunk_size`, chacun sous son propre savepoint ; un paquet
+                     en échec est signalé élément par élément sans perdre les
+                     autres. Le client renvoie uniquement les index en erreur.
+    """
+    chunk_size = chunk_size or getattr(settings, "RESPONSES_BULK_CHUNK_SIZE", 1000)
+    serializer = ReferenceIndex(items).serializer()
+    positions, cleaned, errors = [], [], []
+    for i, item in enumerate(items):
+        data, item_errors = validate_item(item, serializer)
+        if item_errors:
+            errors.append({"index": i, "errors": item_errors})
+        else:
+            positions.append(i)
+            cleaned.append(data)
+
+    if errors and mode == MODE_ATOMIC:
+        return [], errors
+
+    chunks = [
+        (positions[start:start + chunk_size], cleaned[start:start + chunk_size])
+        for start in range(0, len(cleaned), chunk_size)
+    ]
+    results = []
+    if mode == MODE_ATOMIC:
+        try:
+            with transaction.atomic():
+                for chunk_positions, chunk in chunks:
+                    ids = write_responses(chunk)
+                    results.extend({"index": i, "id": pk} for i, pk in zip(chunk_positions, ids))
+        except DatabaseError:
+            logger.exception("responses bulk: lot annulé")
+            return [], [{"index": i, "exception": WRITE_FAILED} for i in positions]
+        return results, errors
+
+    for chunk_positions, chunk in chunks:
+        try:
+            with transaction.atomic():
+                ids = write_responses(chunk)
+        except DatabaseError:
+            logger.exception("responses bulk: paquet %s-%s annulé", chunk_positions[0], chunk_positions[-1])
+            errors.extend({"index": i, "exception": WRITE_FAILED} for i in chunk_positions)
+            continue
+        results.extend({"index": i, "id": pk} for i, pk in zip(chunk_positions, ids))
+    errors.sort(key=lambda e: e["index"])
+    return results, errors
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from survey.models import Survey
+from survey import rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les cumuls horaires (CollectionRollup) à partir des répondants et réponses bruts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--survey", type=int, help="ID d'une enquête (par défaut : toutes).")
+
+    def handle(self, *args, **options):
+        survey = None
+        if options.get("survey"):
+            try:
+                survey = Survey.objects.get(id=options["survey"])
+            except Survey.DoesNotExist:
+                raise CommandError(f"Enquête {options['survey']} introuvable.")
+
+        buckets = rollups.rebuild(survey)
+        scope = f"l'enquête {survey.id}" if survey else "toutes les enquêtes"
+        self.stdout.write(self.style.SUCCESS(f"{buckets} cumul(s) horaire(s) reconstruit(s) pour {scope}."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from survey.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Lance un scénario de mesure de performance (données créées puis annulées)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+            help="Tailles à mesurer (nombre de répondants ou d'éléments selon le scénario).",
+        )
+
+    def handle(self, *args, **options):
+        SCENARIOS[options["scenario"]](self.stdout, options["sizes"])
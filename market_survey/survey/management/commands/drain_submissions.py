@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from survey import spool
+
+
+class Command(BaseCommand):
+    help = "Vide la file des soumissions publiques (SUBMISSION_SPOOL_ENABLED) vers la base, par lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Vide la file puis s'arrête.")
+        parser.add_argument("--poll", type=float, default=1.0, help="Attente (s) quand la file est vide.")
+        parser.add_argument("--batch", type=int, default=None, help="Soumissions par lot (SUBMISSION_SPOOL_BATCH).")
+        parser.add_argument("--stats", action="store_true", help="Affiche les métriques de la file (JSON) et s'arrête.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(spool.stats()))
+            return
+        spool.work(once=options["once"], poll=options["poll"], batch=options["batch"], stdout=self.stdout)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from survey import export_jobs
+
+
+class Command(BaseCommand):
+    help = "Traite la file d'attente des exports (ExportJob) et supprime les fichiers expirés."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Traite les jobs en attente puis s'arrête.")
+        parser.add_argument("--poll", type=float, default=2.0, help="Attente (s) quand la file est vide.")
+        parser.add_argument("--cleanup-only", action="store_true", help="Nettoie les exports expirés et s'arrête.")
+
+    def handle(self, *args, **options):
+        if options["cleanup_only"]:
+            removed = export_jobs.cleanup()
+            self.stdout.write(self.style.SUCCESS(f"{removed} fichier(s) d'export supprimé(s)."))
+            return
+        export_jobs.work(once=options["once"], poll=options["poll"], stdout=self.stdout)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from survey import idempotency
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence expirées (IDEMPOTENCY_TTL_HOURS)."
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} clé(s) d'idempotence supprimée(s)."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from survey.models import Survey
+from survey import tallies
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs QuestionStats / ChoiceTally et l'index TermFrequency à partir des réponses brutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--survey", type=int, help="ID d'une enquête (par défaut : toutes).")
+
+    def handle(self, *args, **options):
+        survey = None
+        if options.get("survey"):
+            try:
+                survey = Survey.objects.get(id=options["survey"])
+            except Survey.DoesNotExist:
+                raise CommandError(f"Enquête {options['survey']} introuvable.")
+
+        tallies.rebuild(survey)
+        scope = f"l'enquête {survey.id}" if survey else "toutes les enquêtes"
+        self.stdout.write(self.style.SUCCESS(f"Compteurs reconstruits pour {scope}."))
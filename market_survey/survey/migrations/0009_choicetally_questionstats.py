@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_tallies(apps, schema_editor):
+    Question = apps.get_model('survey', 'Question')
+    Choice = apps.get_model('survey', 'Choice')
+    Response = apps.get_model('survey', 'Response')
+    QuestionStats = apps.get_model('survey', 'QuestionStats')
+    ChoiceTally = apps.get_model('survey', 'ChoiceTally')
+
+    answer_counts = dict(
+        Response.objects.values('question_id').annotate(n=Count('id')).order_by().values_list('question_id', 'n')
+    )
+    through = Response.selected_choices.through
+    counts = dict(
+        through.objects.values('choice_id').annotate(n=Count('id')).order_by().values_list('choice_id', 'n')
+    )
+    QuestionStats.objects.bulk_create(
+        [
+            QuestionStats(question_id=qid, survey_id=sid, answer_count=answer_counts.get(qid, 0))
+            for qid, sid in Question.objects.values_list('id', 'survey_id')
+        ],
+        batch_size=1000,
+    )
+    ChoiceTally.objects.bulk_create(
+        [
+            ChoiceTally(question_id=qid, choice_id=cid, count=counts.get(cid, 0))
+            for cid, qid in Choice.objects.values_list('id', 'question_id')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0008_remove_question_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='survey.question')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='survey.survey')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChoiceTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='survey.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='survey.question')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('question', 'choice'), name='unique_choice_tally')],
+            },
+        ),
+        migrations.RunPython(build_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_choicetally_questionstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respondent',
+            name='device_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='respondent',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='respondent',
+            name='updated_at_local',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
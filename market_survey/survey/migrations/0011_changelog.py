@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+def seed_changelog(apps, schema_editor):
+    """Une entrée upsert par objet existant : un premier appel sans curseur reçoit tout."""
+    Survey = apps.get_model('survey', 'Survey')
+    Question = apps.get_model('survey', 'Question')
+    Choice = apps.get_model('survey', 'Choice')
+    ChangeLog = apps.get_model('survey', 'ChangeLog')
+
+    rows = [('survey', sid, sid, oid) for sid, oid in Survey.objects.values_list('id', 'owner_id')]
+    rows += [
+        ('question', qid, sid, oid)
+        for qid, sid, oid in Question.objects.values_list('id', 'survey_id', 'survey__owner_id')
+    ]
+    rows += [
+        ('choice', cid, sid, oid)
+        for cid, sid, oid in Choice.objects.values_list('id', 'question__survey_id', 'question__survey__owner_id')
+    ]
+    ChangeLog.objects.bulk_create(
+        [
+            ChangeLog(entity=entity, object_id=pk, op='upsert', survey_id=sid, owner_id=oid)
+            for entity, pk, sid, oid in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0010_respondent_sync_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='survey',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('survey', 'Enquête'), ('question', 'Question'), ('choice', 'Choix')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Création / modification'), ('delete', 'Suppression')], max_length=10)),
+                ('survey_id', models.PositiveBigIntegerField()),
+                ('owner_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner_id', 'id'], name='changelog_owner_cursor')],
+            },
+        ),
+        migrations.RunPython(seed_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+# Index propres à PostgreSQL (INCLUDE, WHERE), non exprimables de façon portable
+POSTGRES_INDEXES = [
+    # recherche sans verrou des renvois de synchro mobile (survey.sync) : index-only scan
+    (
+        'respondent_sync_cover',
+        'CREATE INDEX IF NOT EXISTS respondent_sync_cover ON survey_respondent '
+        '(client_uuid) INCLUDE (survey_id, updated_at_local, revision)',
+    ),
+    # réponses libres non vides (résumé, nuage de mots) : les réponses à choix ont answer_text = ''
+    (
+        'response_text_answers',
+        "CREATE INDEX IF NOT EXISTS response_text_answers ON survey_response "
+        "(question_id, id) WHERE answer_text <> ''",
+    ),
+]
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0011_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['survey', '-created_at'], name='respondent_survey_created'),
+        ),
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['survey', 'status'], name='respondent_survey_status'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['question', 'respondent'], name='response_question_respondent'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['owner', '-created_at'], name='survey_owner_created'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_response_survey(apps, schema_editor):
+    """Copie question.survey_id par tranches d'ids : chaque tranche est une courte transaction."""
+    Question = apps.get_model('survey', 'Question')
+    Response = apps.get_model('survey', 'Response')
+
+    bounds = Response.objects.aggregate(lo=models.Min('id'), hi=models.Max('id'))
+    if bounds['lo'] is None:
+        return
+    survey_of_question = Subquery(Question.objects.filter(pk=OuterRef('question_id')).values('survey_id')[:1])
+    for start in range(bounds['lo'], bounds['hi'] + 1, BATCH_SIZE):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            Response.objects.filter(
+                id__gte=start, id__lt=start + BATCH_SIZE, survey__isnull=True
+            ).update(survey_id=survey_of_question)
+
+
+class Migration(migrations.Migration):
+    # le remplissage se fait par lots validés séparément, pas dans une seule transaction
+    atomic = False
+
+    dependencies = [
+        ('survey', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='survey',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='survey.survey'),
+        ),
+        migrations.RunPython(backfill_response_survey, migrations.RunPython.noop),
+    ]
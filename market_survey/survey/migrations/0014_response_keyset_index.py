@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0013_response_survey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['survey', 'created_at', 'id'], name='response_survey_keyset'),
+        ),
+    ]
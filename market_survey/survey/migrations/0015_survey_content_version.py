@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0014_response_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:57
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copie figée de survey.terms.tokenize au moment de cette migration : une
+# évolution ultérieure du découpage ou des mots vides ne doit pas changer
+# ce que produit cette migration (terms.rebuild reconstruit l'index actuel).
+MIN_LENGTH = 3
+MAX_LENGTH = 64
+
+WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+ELISION = re.compile(r"^(?:c|d|j|l|m|n|s|t|qu|jusqu|lorsqu|puisqu|quoiqu)'")
+
+STOPWORDS = frozenset("""
+    alors au aucun aucune aussi autre autres aux avec avoir bon car ce ceci cela celle celles celui
+    ces cet cette ceux chaque ci comme comment dans de des du donc dont elle elles en encore est et
+    été être eu fait faire fois font hors ici il ils je juste la le les leur leurs lui ma mais me
+    même mêmes mes moi moins mon ne ni nos notre nous on ont ou où par parce pas peu peut plupart
+    pour pourquoi qu quand que quel quelle quelles quels qui sa sans se sera ses seul seulement si
+    sien son sont sous soit sur ta tandis te tel telle tellement tels tes toi ton tous tout toute
+    toutes très tu un une vos votre vous vu ça étaient était étant étions êtes sommes suis avons
+    avez avaient avait aurait auraient serait seraient ai as aie aient ait y oui non rien plus bien
+    beaucoup trop assez déjà jamais toujours souvent aussi puis ainsi après avant chez entre vers
+    depuis pendant selon via cas chose choses etc the and for with that this
+""".split())
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFC", str(text)).lower().replace("’", "'")
+    terms = []
+    for word in WORD.findall(text):
+        word = ELISION.sub("", word)
+        if MIN_LENGTH <= len(word) <= MAX_LENGTH and word not in STOPWORDS:
+            terms.append(word)
+    return terms
+
+
+def build_index(apps, schema_editor):
+    """Index initial à partir des réponses texte existantes."""
+    Response = apps.get_model('survey', 'Response')
+    TermFrequency = apps.get_model('survey', 'TermFrequency')
+
+    counts = {}
+    rows = (
+        Response.objects.filter(question__question_type='text')
+        .exclude(answer_text='')
+        .values_list('question_id', 'question__survey_id', 'answer_text')
+        .iterator(chunk_size=2000)
+    )
+    for question_id, survey_id, text in rows:
+        for term in tokenize(text):
+            key = (question_id, survey_id, term)
+            counts[key] = counts.get(key, 0) + 1
+    TermFrequency.objects.bulk_create(
+        [
+            TermFrequency(question_id=qid, survey_id=sid, term=term, count=n)
+            for (qid, sid, term), n in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0015_survey_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermFrequency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_frequencies', to='survey.question')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_frequencies', to='survey.survey')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', '-count'], name='term_question_top'), models.Index(fields=['survey', 'term'], name='term_survey_term')],
+                'constraints': [models.UniqueConstraint(fields=('question', 'term'), name='unique_question_term')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
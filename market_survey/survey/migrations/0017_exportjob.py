@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0016_termfrequency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('xlsx', 'Excel (une ligne par réponse)'), ('csv', 'CSV large'), ('parquet', 'Parquet large'), ('arrow', 'Arrow large'), ('pdf', 'Rapport PDF')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec'), ('expired', 'Expiré')], default='pending', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('file_path', models.CharField(blank=True, max_length=255)),
+                ('size', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='survey.survey')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='exportjob_queue'), models.Index(fields=['requested_by', '-created_at'], name='exportjob_user')],
+            },
+        ),
+    ]
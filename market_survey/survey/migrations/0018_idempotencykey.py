@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0017_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64)),
+                ('key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('processing', 'En cours'), ('done', 'Terminée')], default='processing', max_length=10)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_headers', models.JSONField(blank=True, default=dict)),
+                ('response_body', models.BinaryField(blank=True, default=b'')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_expires')],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key'), name='idempotency_scope_key')],
+            },
+        ),
+    ]
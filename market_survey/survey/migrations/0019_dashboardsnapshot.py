@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0018_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_surveys', models.PositiveIntegerField(default=0)),
+                ('total_respondents', models.IntegerField(default=0)),
+                ('total_responses', models.IntegerField(default=0)),
+                ('top_surveys', models.JSONField(blank=True, default=list)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
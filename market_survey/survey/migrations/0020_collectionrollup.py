@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0019_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interviewer_name', models.CharField(max_length=150)),
+                ('bucket', models.DateTimeField()),
+                ('respondents', models.IntegerField(default=0)),
+                ('responses', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='survey.survey')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['survey', 'bucket'], name='rollup_survey_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('survey', 'interviewer_name', 'bucket'), name='rollup_survey_interviewer_hour')],
+            },
+        ),
+    ]
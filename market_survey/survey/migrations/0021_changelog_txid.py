@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+def mark_existing_entries(apps, schema_editor):
+    """PostgreSQL : les entrées existantes (toutes validées) passent avant les nouvelles."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ChangeLog = apps.get_model('survey', 'ChangeLog')
+    ChangeLog.objects.filter(txid__isnull=True).update(txid=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0020_collectionrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='txid',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['txid', 'id'], name='changelog_txid_cursor'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['owner_id', 'txid', 'id'], name='changelog_owner_txid_cursor'),
+        ),
+        migrations.RunPython(mark_existing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_remaining(apps, schema_editor):
+    """Réponses encore sans enquête (écrites pendant ou après 0013 par un ancien code) : même copie qu'en 0013."""
+    Question = apps.get_model('survey', 'Question')
+    Response = apps.get_model('survey', 'Response')
+
+    survey_of_question = Subquery(Question.objects.filter(pk=OuterRef('question_id')).values('survey_id')[:1])
+    while True:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            ids = list(Response.objects.filter(survey__isnull=True).values_list('id', flat=True)[:BATCH_SIZE])
+            if not ids:
+                return
+            Response.objects.filter(id__in=ids).update(survey_id=survey_of_question)
+
+
+class Migration(migrations.Migration):
+    # remplissage par lots validés séparément, puis NOT NULL hors de ces transactions
+    atomic = False
+
+    dependencies = [
+        ('survey', '0021_changelog_txid'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_remaining, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='response',
+            name='survey',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='survey.survey'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0022_response_survey_not_null'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='format',
+            field=models.CharField(choices=[('xlsx', 'Excel (une ligne par réponse)'), ('csv', 'CSV large'), ('parquet', 'Parquet large'), ('arrow', 'Arrow large'), ('pdf', 'Rapport PDF'), ('wordcloud', 'Nuage de mots (interne)')], max_length=10),
+        ),
+    ]
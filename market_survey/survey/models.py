@@ -23,7 +23,16 @@ class Survey(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # incrémenté à chaque modification de la définition (ETag, voir survey.conditional)
+    content_version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # liste des enquêtes d'un utilisateur, plus récentes d'abord
+            models.Index(fields=['owner', '-created_at'], name='survey_owner_created'),
+        ]
 
     def __str__(self):
         return self.title
@@ -42,6 +51,7 @@ class Question(models.Model):
 
     question_type = models.CharField(max_length=10, choices=QUESTION_TYPES, default='text')
     order = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['order']
@@ -53,6 +63,7 @@ class Question(models.Model):
 class Choice(models.Model):
     question = models.ForeignKey(Question, related_name='choices', on_delete=models.CASCADE)
     text = models.CharField(max_length=200)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.text
@@ -81,8 +92,21 @@ class Respondent(models.Model):
     client_uuid = models.UUIDField(default=uuid.uuid4, unique=True)
     status = models.CharField(max_length=20, choices=SYNC_STATUS, default='draft')
 
+    # Versionnement de la synchro mobile : horodatage de l'appareil et révision serveur
+    updated_at_local = models.DateTimeField(null=True, blank=True)
+    device_id = models.CharField(max_length=100, blank=True)
+    revision = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # répondants d'une enquête triés par date (résumé, exports, API)
+            models.Index(fields=['survey', '-created_at'], name='respondent_survey_created'),
+            models.Index(fields=['survey', 'status'], name='respondent_survey_status'),
+        ]
+        # Index PostgreSQL uniquement (couvrant, partiel) : migration 0012
+
     def __str__(self):
         return self.interviewer_name
 
@@ -100,6 +124,13 @@ class Response(models.Model):
         on_delete=models.CASCADE
     )
 
+    # Copie de question.survey : filtrage par enquête sans jointure sur Question
+    survey = models.ForeignKey(
+        Survey,
+        related_name='responses',
+        on_delete=models.CASCADE
+    )
+
     # 🔴 CLÉ CRITIQUE POUR ISOLER LES DONNÉES PAR USER
     created_by = models.ForeignKey(
         User,
@@ -118,5 +149,265 @@ class Response(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # réponses d'une question, regroupées par répondant (analyses, filtres API)
+            models.Index(fields=['question', 'respondent'], name='response_question_respondent'),
+            # pagination par clé de /api/responses/?survey= (survey, created_at, id)
+            models.Index(fields=['survey', 'created_at', 'id'], name='response_survey_keyset'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # les écritures groupées (bulk_create) renseignent survey_id elles-mêmes
+        if self.question_id is not None and (self.survey_id is None or Response.question.is_cached(self)):
+            self.survey_id = self.question.survey_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Réponse à {self.question.text}"
+
+
+# -------------------------------------------------
+# Compteurs dénormalisés (maintenus par survey.tallies)
+# -------------------------------------------------
+class QuestionStats(models.Model):
+    survey = models.ForeignKey(Survey, related_name='question_stats', on_delete=models.CASCADE)
+    question = models.OneToOneField(Question, related_name='stats', on_delete=models.CASCADE)
+
+    # nombre de Response enregistrées pour cette question
+    answer_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.question.text} : {self.answer_count} réponses"
+
+
+class ChoiceTally(models.Model):
+    question = models.ForeignKey(Question, related_name='tallies', on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, related_name='tallies', on_delete=models.CASCADE)
+
+    # nombre de Response ayant sélectionné ce choix
+    count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'choice'], name='unique_choice_tally'),
+        ]
+
+    def __str__(self):
+        return f"{self.choice.text} : {self.count}"
+
+
+class TermFrequency(models.Model):
+    """
+    Fréquence d'un terme dans les réponses texte d'une question (survey/terms.py),
+    tenue à jour par tallies.apply_responses comme ChoiceTally.
+    """
+    survey = models.ForeignKey(Survey, related_name='term_frequencies', on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, related_name='term_frequencies', on_delete=models.CASCADE)
+    term = models.CharField(max_length=64)
+
+    # nombre d'occurrences du terme
+    count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'term'], name='unique_question_term'),
+        ]
+        indexes = [
+            models.Index(fields=['question', '-count'], name='term_question_top'),
+            models.Index(fields=['survey', 'term'], name='term_survey_term'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} : {self.count}"
+
+
+class ChangeLog(models.Model):
+    """
+    Journal des créations / modifications / suppressions d'enquêtes, questions et choix,
+    alimenté par les signaux (survey/signals.py) et lu par /api/mobile/changes/.
+    survey_id et owner_id sont de simples entiers : l'entrée survit à la suppression.
+    """
+    ENTITY_TYPES = (
+        ('survey', 'Enquête'),
+        ('question', 'Question'),
+        ('choice', 'Choix'),
+    )
+    OPERATIONS = (
+        ('upsert', 'Création / modification'),
+        ('delete', 'Suppression'),
+    )
+
+    entity = models.CharField(max_length=10, choices=ENTITY_TYPES)
+    object_id = models.PositiveBigIntegerField()
+    op = models.CharField(max_length=10, choices=OPERATIONS)
+
+    survey_id = models.PositiveBigIntegerField()
+    owner_id = models.PositiveBigIntegerField(null=True, blank=True)
+
+    # transaction d'écriture (PostgreSQL uniquement, 0 pour les entrées antérieures)
+    txid = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_id', 'id'], name='changelog_owner_cursor'),
+            models.Index(fields=['txid', 'id'], name='changelog_txid_cursor'),
+            models.Index(fields=['owner_id', 'txid', 'id'], name='changelog_owner_txid_cursor'),
+        ]
+
+    def __str__(self):
+        return f"{self.op} {self.entity} #{self.object_id}"
+
+
+class ExportJob(models.Model):
+    """
+    Export demandé via l'API et produit hors requête par `manage.py export_worker`
+    (file d'attente en base, voir survey/export_jobs.py). Le fichier produit
+    expire après EXPORT_TTL_HOURS.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+        ('expired', 'Expiré'),
+    )
+    FORMAT_CHOICES = (
+        ('xlsx', 'Excel (une ligne par réponse)'),
+        ('csv', 'CSV large'),
+        ('parquet', 'Parquet large'),
+        ('arrow', 'Arrow large'),
+        ('pdf', 'Rapport PDF'),
+        ('wordcloud', 'Nuage de mots (interne)'),
+    )
+
+    survey = models.ForeignKey(Survey, related_name='export_jobs', on_delete=models.CASCADE)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='export_jobs'
+    )
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+
+    # avancement en pourcentage, mis à jour par le worker
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    file_path = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # sert aussi de battement de cœur au worker : un job « running » figé est repris
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_queue'),
+            models.Index(fields=['requested_by', '-created_at'], name='exportjob_user'),
+        ]
+
+    def __str__(self):
+        return f"Export {self.format} #{self.id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Requête d'écriture rejouable (en-tête Idempotency-Key), voir survey/idempotency.py.
+    La ligne est réservée avant la vue (« processing ») puis complétée avec la
+    réponse, renvoyée telle quelle aux répétitions jusqu'à expires_at.
+    """
+    STATUS_CHOICES = (
+        ('processing', 'En cours'),
+        ('done', 'Terminée'),
+    )
+
+    # "user:<id>", sinon "session:<clé>" ou "ip:<adresse>" : une même clé n'entre en collision qu'au sein d'un compte
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    # sha256 de la méthode, du chemin et du corps : une clé réutilisée pour une autre requête est refusée
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='processing')
+
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    response_body = models.BinaryField(blank=True, default=b'')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # date de réservation : une réservation figée (processus arrêté) est reprise
+    claimed_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status})"
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Tableau de bord d'un propriétaire, lu en une seule ligne (survey/dashboard.py).
+    Les totaux sont incrémentés par les chemins d'écriture ; le classement est
+    recalculé quand l'instantané dépasse DASHBOARD_SNAPSHOT_MAX_AGE.
+    """
+    owner = models.OneToOneField(User, related_name='dashboard_snapshot', on_delete=models.CASCADE)
+
+    total_surveys = models.PositiveIntegerField(default=0)
+    total_respondents = models.IntegerField(default=0)
+    total_responses = models.IntegerField(default=0)
+    # [{"id", "title", "description", "responses"}], 10 enquêtes les plus répondues
+    top_surveys = models.JSONField(default=list, blank=True)
+
+    # None : recomptage complet à la prochaine lecture (enquête créée ou supprimée)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Tableau de bord de {self.owner}"
+
+
+class CollectionRollup(models.Model):
+    """
+    Cumul horaire de la collecte : répondants et réponses par enquête,
+    enquêteur et heure (UTC). Voir survey/rollups.py.
+    """
+    survey = models.ForeignKey(Survey, related_name='rollups', on_delete=models.CASCADE)
+    interviewer_name = models.CharField(max_length=150)
+    # début de l'heure, en UTC
+    bucket = models.DateTimeField()
+
+    respondents = models.IntegerField(default=0)
+    responses = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['survey', 'interviewer_name', 'bucket'], name='rollup_survey_interviewer_hour'),
+        ]
+        indexes = [
+            # séries temporelles : parcours d'intervalle par enquête
+            models.Index(fields=['survey', 'bucket'], name='rollup_survey_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.survey_id} {self.interviewer_name} {self.bucket:%Y-%m-%d %H:00}"
@@ -0,0 +1,88 @@
+# survey/pagination.py
+"""
+Pagination par clé (keyset) sur (created_at, id) pour les listes de l'API.
+
+Activée seulement si la requête fournit `cursor` ou `page_size` : sans ces
+paramètres, les listes restent renvoyées en entier (clients existants).
+Chaque page est une requête `WHERE (created_at, id) > curseur ORDER BY
+created_at, id LIMIT n`, au coût constant quelle que soit la profondeur.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("created_at", "id")
+    invalid_cursor_message = "Curseur invalide."
+
+    def get_page_size(self, request):
+        default = getattr(settings, "API_PAGE_SIZE", 100)
+        maximum = getattr(settings, "API_MAX_PAGE_SIZE", 1000)
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            size = default
+        return max(1, min(size, maximum))
+
+    def encode_cursor(self, obj):
+        position = [getattr(obj, self.ordering[0]).isoformat(), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+    def decode_cursor(self, raw):
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field, tiebreak = self.ordering
+        queryset = queryset.order_by(*self.ordering)
+
+        raw = params.get(self.cursor_query_param)
+        if raw:
+            created_at, pk = self.decode_cursor(raw)
+            queryset = queryset.filter(Q(**{f"{field}__gt": created_at}) | Q(**{field: created_at, f"{tiebreak}__gt": pk}))
+
+        page = list(queryset[: self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[: self.page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "cursor": self.next_cursor, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "cursor": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
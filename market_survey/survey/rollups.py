@@ -0,0 +1,208 @@
+# survey/rollups.py
+"""
+Cumuls horaires de la collecte (table CollectionRollup) : répondants et
+réponses par (enquête, enquêteur, heure UTC).
+
+Tenus à jour par tallies.apply_responses et tallies.apply_respondents
+(incréments F(), comme les autres compteurs) ; `manage.py backfill_rollups`
+les reconstruit à partir des lignes brutes. Les lignes sont indexées par le
+nom d'enquêteur courant : tout chemin qui renomme un répondant appelle
+rename_respondents (retrait sous l'ancien nom, ajout sous le nouveau).
+
+series() lit une plage de l'index (survey, bucket), somme par heure en SQL
+puis regroupe les heures par heure, jour ou semaine dans le fuseau demandé
+(au plus quelques milliers de lignes ; Trunc est une fonction Python appelée
+ligne à ligne sous SQLite).
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, QuerySet, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import CollectionRollup, Respondent, Response
+
+INTERVALS = ("hour", "day", "week")
+
+
+def bucket_of(moment):
+    """Heure (UTC) contenant `moment`."""
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _apply(field, counts):
+    """Ajoute counts {(survey_id, enquêteur, heure): n} (n signé) au champ `field`."""
+    counts = {key: n for key, n in counts.items() if n}
+    if not counts:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        CollectionRollup.objects.bulk_create(
+            [
+                CollectionRollup(survey_id=survey_id, interviewer_name=name, bucket=bucket)
+                for survey_id, name, bucket in counts
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        grouped = defaultdict(list)
+        for (survey_id, name, bucket), n in counts.items():
+            grouped[(survey_id, name, n)].append(bucket)
+        for (survey_id, name, n), buckets in grouped.items():
+            CollectionRollup.objects.filter(survey_id=survey_id, interviewer_name=name, bucket__in=buckets).update(
+                **{field: F(field) + n}, updated_at=now
+            )
+
+
+def _response_counts(responses):
+    return {
+        (survey_id, name, hour): n
+        for survey_id, name, hour, n in responses.annotate(hour=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .values("survey_id", "respondent__interviewer_name", "hour")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("survey_id", "respondent__interviewer_name", "hour", "n")
+    }
+
+
+def _respondent_counts(respondents):
+    return {
+        (survey_id, name, hour): n
+        for survey_id, name, hour, n in respondents.annotate(hour=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .values("survey_id", "interviewer_name", "hour")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("survey_id", "interviewer_name", "hour", "n")
+    }
+
+
+def apply_responses(responses, sign=1):
+    """Répercute un queryset Response (ajout : sign=+1, retrait : sign=-1)."""
+    _apply("responses", {key: sign * n for key, n in _response_counts(responses).items()})
+
+
+def apply_respondents(respondents, sign=1):
+    """
+    Répercute des répondants (objets ou queryset). Retourne
+    {survey_id: variation} pour les autres compteurs par enquête.
+    """
+    if isinstance(respondents, QuerySet):
+        counts = _respondent_counts(respondents)
+    else:
+        counts = Counter(
+            (r.survey_id, r.interviewer_name, bucket_of(r.created_at or timezone.now())) for r in respondents
+        )
+    per_survey = Counter()
+    for (survey_id, _, _), n in counts.items():
+        per_survey[survey_id] += sign * n
+    _apply("respondents", {key: sign * n for key, n in counts.items()})
+    return per_survey
+
+
+def rename_respondents(renamed, exclude=()):
+    """
+    Reporte les cumuls de répondants renommés, et de leurs réponses, sur leur
+    nouveau nom : renamed = [(répondant portant le nouveau nom, ancien nom)].
+    `exclude` : ids de réponses déjà reportées par l'appelant.
+    """
+    names = {r.id: (r, old) for r, old in renamed if r.interviewer_name != old}
+    if not names:
+        return
+    respondents, responses = Counter(), Counter()
+    for respondent, old in names.values():
+        bucket = bucket_of(respondent.created_at)
+        respondents[(respondent.survey_id, old, bucket)] -= 1
+        respondents[(respondent.survey_id, respondent.interviewer_name, bucket)] += 1
+    rows = (
+        Response.objects.filter(respondent_id__in=names)
+        .exclude(id__in=exclude)
+        .annotate(hour=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .values("respondent_id", "survey_id", "hour")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("respondent_id", "survey_id", "hour", "n")
+    )
+    for respondent_id, survey_id, hour, n in rows:
+        respondent, old = names[respondent_id]
+        responses[(survey_id, old, hour)] -= n
+        responses[(survey_id, respondent.interviewer_name, hour)] += n
+    with transaction.atomic():
+        _apply("respondents", respondents)
+        _apply("responses", responses)
+
+
+def rebuild(survey=None):
+    """Reconstruit les cumuls à partir des lignes brutes (toutes les enquêtes sans `survey`)."""
+    respondents = Respondent.objects.all()
+    responses = Response.objects.all()
+    rollups = CollectionRollup.objects.all()
+    if survey is not None:
+        respondents = respondents.filter(survey=survey)
+        responses = responses.filter(survey=survey)
+        rollups = rollups.filter(survey=survey)
+
+    totals = defaultdict(lambda: [0, 0])
+    for key, n in _respondent_counts(respondents).items():
+        totals[key][0] = n
+    for key, n in _response_counts(responses).items():
+        totals[key][1] = n
+
+    with transaction.atomic():
+        rollups.delete()
+        CollectionRollup.objects.bulk_create(
+            [
+                CollectionRollup(
+                    survey_id=survey_id, interviewer_name=name, bucket=bucket,
+                    respondents=n_respondents, responses=n_responses,
+                )
+                for (survey_id, name, bucket), (n_respondents, n_responses) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def _period(bucket, interval, tzinfo):
+    """Début de la période locale (heure, jour ou semaine ISO) contenant `bucket`."""
+    local = bucket.astimezone(tzinfo).replace(minute=0, second=0, microsecond=0)
+    if interval == "hour":
+        return local
+    day = local.replace(hour=0)
+    if interval == "week":
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def series(survey, start, end, interval="hour", by_interviewer=False, tzinfo=None):
+    """
+    [{"bucket", ["interviewer_name"], "respondents", "responses"}] sur [start, end),
+    par ordre chronologique. Les périodes sans activité sont omises.
+    """
+    tzinfo = tzinfo or timezone.get_current_timezone()
+    fields = ["bucket", "interviewer_name"] if by_interviewer else ["bucket"]
+    rows = (
+        CollectionRollup.objects.filter(survey=survey, bucket__gte=start, bucket__lt=end)
+        .values(*fields)
+        .annotate(n_respondents=Sum("respondents"), n_responses=Sum("responses"))
+        .order_by(*fields)
+        .values_list(*fields, "n_respondents", "n_responses")
+    )
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        *key, n_respondents, n_responses = row
+        point = totals[(_period(key[0], interval, tzinfo), *key[1:])]
+        point[0] += n_respondents
+        point[1] += n_responses
+    points = []
+    for key, (n_respondents, n_responses) in sorted(totals.items()):
+        if not (n_respondents or n_responses):
+            continue
+        point = {"bucket": key[0]}
+        if by_interviewer:
+            point["interviewer_name"] = key[1]
+        point["respondents"] = n_respondents
+        point["responses"] = n_responses
+        points.append(point)
+    return points
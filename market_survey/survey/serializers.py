@@ -1,7 +1,10 @@
 # survey/serializers.py
 from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Survey, Question, Choice, Response, Respondent
+from .models import Survey, Question, Choice, Response, Respondent, ExportJob
+from . import cache as survey_cache
 from cloudinary.models import CloudinaryField
 
 # -------------------------
@@ -45,6 +48,9 @@ class SurveySerializer(serializers.ModelSerializer):
             "questions",
         ]
     def get_has_responses(self, obj):
+        annotated = getattr(obj, "has_responses", None)
+        if annotated is not None:
+            return annotated
         return obj.respondents.exists()
 
     def validate_questions(self, value):
@@ -173,12 +179,122 @@ class SurveySerializer(serializers.ModelSerializer):
         return instance
 
 
+def survey_questions(survey_ids):
+    """
+    {survey_id: [question (dict) avec ses choix]} en deux requêtes values(),
+    sans instancier de modèles (bien plus léger qu'un prefetch_related).
+    """
+    questions, by_survey = {}, {sid: [] for sid in survey_ids}
+    for qid, sid, text, qtype, order in (
+        Question.objects.filter(survey_id__in=survey_ids)
+        .order_by("order", "id")
+        .values_list("id", "survey_id", "text", "question_type", "order")
+    ):
+        questions[qid] = {"id": qid, "text": text, "question_type": qtype, "order": order, "choices": []}
+        by_survey[sid].append(questions[qid])
+    for cid, qid, text in (
+        Choice.objects.filter(question_id__in=questions).order_by("id").values_list("id", "question_id", "text")
+    ):
+        questions[qid]["choices"].append({"id": cid, "text": text})
+    return by_survey
+
+
+def cached_survey_questions(surveys):
+    """survey_questions() à travers le cache, versionné par la définition (content_version) de chaque enquête."""
+    return survey_cache.get_many_or_compute(surveys, "questions", survey_questions)
+
+
+def cached_questions(survey):
+    """Questions d'une seule enquête (take_survey, retrieve) : recalcul sous verrou."""
+    return survey_cache.get_or_compute(survey, "questions", lambda: survey_questions([survey.id])[survey.id])
+
+
+class SurveyReadListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        surveys = list(data.all() if hasattr(data, "all") else data)
+        self.child.questions_by_survey = cached_survey_questions(surveys)
+        return [self.child.to_representation(survey) for survey in surveys]
+
+
+class SurveyReadSerializer(serializers.BaseSerializer):
+    """
+    Lecture seule (list / retrieve) : même représentation que SurveySerializer,
+    construite directement en dict, sans instancier de champs imbriqués.
+    Attend un queryset préparé par `survey_read_queryset` (owner joint,
+    has_responses annoté) ; questions et choix sont chargés en values()
+    pour toute la liste d'un coup.
+    """
+    _datetime = serializers.DateTimeField()
+    questions_by_survey = None
+
+    class Meta:
+        list_serializer_class = SurveyReadListSerializer
+
+    def _image(self, image):
+        # même règle que serializers.ImageField (URL absolue si la requête est connue)
+        if not image:
+            return None
+        try:
+            url = image.url
+        except AttributeError:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def to_representation(self, survey):
+        datetime = self._datetime.to_representation
+        questions = self.questions_by_survey
+        if questions is None or survey.id not in questions:
+            questions = {survey.id: cached_questions(survey)}
+        return {
+            "id": survey.id,
+            "title": survey.title,
+            "description": survey.description,
+            "image": self._image(survey.image),
+            "owner": survey.owner.username,
+            "created_at": datetime(survey.created_at),
+            "updated_at": datetime(survey.updated_at),
+            "has_responses": survey.has_responses,
+            "questions": questions[survey.id],
+        }
+
+
+def survey_read_queryset(queryset):
+    """Prépare un queryset Survey pour SurveyReadSerializer (requêtes constantes)."""
+    return queryset.select_related("owner").annotate(
+        has_responses=Exists(Respondent.objects.filter(survey=OuterRef("pk")))
+    ).prefetch_related(None)
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField qui résout les clés dans context["preloaded"]
+    ({modèle: {pk: instance}}) quand il est fourni, au lieu d'une requête par
+    valeur : validation des lots de survey/ingest.py. Mêmes erreurs sinon.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get("preloaded")
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return preloaded[self.queryset.model][pk]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+
+
 # -------------------------
 # Respondent serializer
 # -------------------------
 class RespondentSerializer(serializers.ModelSerializer):
     # require survey when creating respondent to satisfy DB NOT NULL constraint
-    survey = serializers.PrimaryKeyRelatedField(
+    survey = PreloadedPrimaryKeyRelatedField(
         queryset=Survey.objects.all(), required=True
     )
 
@@ -188,12 +304,27 @@ class RespondentSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
 
 
+def requested_fields(request):
+    """Champs demandés par ?fields=a,b (None = tous)."""
+    raw = request.query_params.get("fields") if request is not None else None
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(",") if name.strip()}
+
+
+def flat_requested(request):
+    return request is not None and request.query_params.get("flat") in ("1", "true", "yes")
+
+
 # -------------------------
 # Response serializer (amélioré)
 # -------------------------
 class ResponseSerializer(serializers.ModelSerializer):
+    # question (champ généré) comprise : voir PreloadedPrimaryKeyRelatedField
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+
     # expose l'id de l'enquête directement (lecture seule)
-    survey_id = serializers.IntegerField(source="question.survey.id", read_only=True)
+    survey_id = serializers.IntegerField(read_only=True)
 
     # read: nested respondent object (pour afficher interviewer_name côté frontend)
     respondent = RespondentSerializer(read_only=True)
@@ -204,7 +335,7 @@ class ResponseSerializer(serializers.ModelSerializer):
     )
 
     # keep respondent_id PK write option for backward compatibility
-    respondent_id = serializers.PrimaryKeyRelatedField(
+    respondent_id = PreloadedPrimaryKeyRelatedField(
         source="respondent",
         queryset=Respondent.objects.all(),
         write_only=True,
@@ -213,7 +344,7 @@ class ResponseSerializer(serializers.ModelSerializer):
     )
 
     # selected_choices : accept primary keys for write + read as list of pks
-    selected_choices = serializers.PrimaryKeyRelatedField(
+    selected_choices = PreloadedPrimaryKeyRelatedField(
         many=True, queryset=Choice.objects.all(), required=False
     )
 
@@ -235,6 +366,38 @@ class ResponseSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "created_at", "respondent", "survey_id"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method not in ("GET", "HEAD", "OPTIONS"):
+            return
+        # ?flat=1 : respondent_id à la place de l'objet respondent imbriqué
+        if flat_requested(request):
+            self.fields.pop("respondent")
+            self.fields["respondent_id"] = serializers.IntegerField(read_only=True)
+        # ?fields=a,b : champs clairsemés
+        wanted = requested_fields(request)
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+    def validate(self, attrs):
+        # règles communes à POST /api/responses/ et à l'ingestion groupée ; le
+        # répondant reste facultatif ici (POST /api/responses/ accepte encore
+        # l'ancien format « respondent » imbriqué, traité par la vue)
+        question = attrs.get("question", getattr(self.instance, "question", None))
+        foreign = [
+            choice.pk for choice in attrs.get("selected_choices", [])
+            if question is not None and choice.question_id != question.pk
+        ]
+        if foreign:
+            raise serializers.ValidationError({
+                "selected_choices": [
+                    f'Choice "{pk}" does not belong to question "{question.pk}".' for pk in foreign
+                ]
+            })
+        return attrs
+
     def _ensure_answer_text_not_null(self, validated_data):
         if "answer_text" not in validated_data or validated_data.get("answer_text") is None:
             validated_data["answer_text"] = ""
@@ -340,8 +503,51 @@ class RespondentSyncSerializer(serializers.Serializer):
 
     answers = AnswerSyncSerializer(many=True)
 
+    # replace : réécriture complète ; delta : seules les réponses modifiées sont écrites
+    mode = serializers.ChoiceField(choices=["replace", "delta"], default="replace")
+
     def validate(self, attrs):
         survey_id = attrs.get("survey_id")
-        if not Survey.objects.filter(id=survey_id).exists():
+        # en synchro par lot, les ids d'enquêtes existantes sont préchargés dans le contexte
+        known_ids = self.context.get("survey_ids")
+        if known_ids is not None:
+            exists = survey_id in known_ids
+        else:
+            exists = Survey.objects.filter(id=survey_id).exists()
+        if not exists:
             raise serializers.ValidationError({"survey_id": "Survey introuvable."})
         return attrs
+
+
+class BatchSyncSerializer(serializers.Serializer):
+    """
+    Lot d'interviews pour /api/mobile/sync/batch/.
+    Chaque élément est validé individuellement (RespondentSyncSerializer) par la vue,
+    pour qu'un élément invalide n'empêche pas la synchro des autres.
+    """
+
+    interviews = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    # mode par défaut des interviews qui n'en précisent pas
+    mode = serializers.ChoiceField(choices=["replace", "delta"], required=False)
+
+
+# -------------------------
+# Export jobs
+# -------------------------
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            "id", "survey", "format", "status", "progress", "error", "size",
+            "created_at", "started_at", "finished_at", "expires_at", "download_url",
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != "done":
+            return None
+        url = reverse("api-exports-download", args=[obj.id])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
@@ -0,0 +1,100 @@
+# survey/signals.py
+"""
+Alimentation du journal ChangeLog lu par /api/mobile/changes/ et
+invalidation du cache des enquêtes (survey.cache).
+
+Seuls save() et delete() déclenchent ces signaux : un chemin d'écriture qui
+passe par bulk_create ou QuerySet.update doit appeler `record` lui-même.
+
+Les répondants créés par save() sont comptés (tableau de bord, cumuls
+horaires) ; les autres chemins appellent tallies.apply_respondents.
+
+Les réponses passent par `responses_changed`, émis par
+tallies.apply_responses : c'est le point commun à toutes les écritures de
+réponses, y compris bulk_create. Un post_delete sur Response forcerait de
+plus Django à charger chaque ligne avant un QuerySet.delete().
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from . import cache, changes, dashboard
+from .conditional import bump_content_version
+from .models import Survey, Question, Choice, Respondent, Response, ChangeLog
+
+# envoyé avec survey_ids (ensemble d'ids d'enquêtes touchées)
+responses_changed = Signal()
+
+
+def record(entity, object_id, survey_id, owner_id, op="upsert"):
+    ChangeLog.objects.create(
+        entity=entity, object_id=object_id, survey_id=survey_id, owner_id=owner_id, op=op,
+        txid=changes.current_txid(),
+    )
+
+
+def _question_scope(question):
+    if Question.survey.is_cached(question):
+        return question.survey_id, question.survey.owner_id
+    owner_id = Survey.objects.filter(pk=question.survey_id).values_list("owner_id", flat=True).first()
+    return question.survey_id, owner_id
+
+
+def _choice_scope(choice):
+    if Choice.question.is_cached(choice):
+        return _question_scope(choice.question)
+    # None si la question a déjà été supprimée : sa propre entrée couvre le choix
+    return Question.objects.filter(pk=choice.question_id).values_list("survey_id", "survey__owner_id").first()
+
+
+@receiver(post_save, sender=Survey)
+@receiver(post_delete, sender=Survey)
+def log_survey_change(sender, instance, **kwargs):
+    op = "upsert" if "created" in kwargs else "delete"
+    record("survey", instance.id, instance.id, instance.owner_id, op)
+    if op == "upsert":
+        bump_content_version(instance.id)
+    dashboard.invalidate(instance.owner_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def log_question_change(sender, instance, **kwargs):
+    op = "upsert" if "created" in kwargs else "delete"
+    survey_id, owner_id = _question_scope(instance)
+    record("question", instance.id, survey_id, owner_id, op)
+    bump_content_version(survey_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def log_choice_change(sender, instance, **kwargs):
+    op = "upsert" if "created" in kwargs else "delete"
+    scope = _choice_scope(instance)
+    if scope is not None:
+        record("choice", instance.id, *scope, op)
+        bump_content_version(scope[0])
+
+
+def _invalidate_on_commit(survey_ids, scope):
+    # tout de suite (la transaction en cours relit son propre état), puis après le
+    # commit : un lecteur concurrent a pu remettre en cache l'état précédent entre-temps
+    def invalidate():
+        for survey_id in survey_ids:
+            cache.invalidate(survey_id, scope)
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Respondent)
+def count_new_respondent(sender, instance, created, **kwargs):
+    # les bulk_create et les suppressions appellent tallies.apply_respondents eux-mêmes
+    if created:
+        from . import tallies  # import différé : tallies importe ce module
+
+        tallies.apply_respondents([instance])
+
+
+@receiver(responses_changed, sender=Response)
+def invalidate_survey_responses(sender, survey_ids, **kwargs):
+    _invalidate_on_commit(survey_ids, cache.RESPONSES)
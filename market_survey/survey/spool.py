@@ -0,0 +1,260 @@
+# survey/spool.py
+"""
+File d'écriture différée des soumissions publiques (take_survey).
+
+Activée par SUBMISSION_SPOOL_ENABLED : la vue valide la soumission contre la
+définition en cache, l'ajoute à une base SQLite locale (mode WAL,
+SUBMISSION_SPOOL_PATH) et répond aussitôt ; la commande drain_submissions
+vide la file vers la base principale par lots (ingest.write_submissions).
+
+  contre-pression : au-delà de SUBMISSION_SPOOL_MAX_DEPTH soumissions en
+                    attente, append() lève SpoolFull (la vue répond 503)
+  exactement une fois : clé = uuid de la soumission, unique dans la file et
+                    dans Respondent.client_uuid ; un lot rejoué après un arrêt
+                    du drainer (écrit en base mais pas encore retiré de la
+                    file) est ignoré
+  lettres mortes  : un lot refusé par la base (hors indisponibilité) est
+                    repris soumission par soumission ; celles qui échouent
+                    encore, ou dont l'uuid appartient à une autre enquête,
+                    passent dans la table `dead` au lieu de bloquer la file
+  métriques       : stats() (profondeur, âge du plus ancien, compteurs)
+
+La file est locale à la machine qui reçoit les soumissions : un drainer par
+fichier de file.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError, transaction
+
+from . import ingest
+from .models import Choice, Question, Survey
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submission (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dead (
+    seq INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counter (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+COUNTERS = ("accepted", "duplicates", "rejected", "drained", "skipped", "dead")
+
+# base injoignable (arrêt, verrou, interblocage) : le lot est rejoué tel quel
+UNAVAILABLE = (OperationalError, InterfaceError)
+UUID_CONFLICT = "uuid déjà utilisé pour une autre enquête"
+
+_local = threading.local()  # connexions sqlite3 par thread (et par fichier)
+
+
+class SpoolFull(Exception):
+    """La file a atteint SUBMISSION_SPOOL_MAX_DEPTH."""
+
+
+def enabled():
+    return getattr(settings, "SUBMISSION_SPOOL_ENABLED", False)
+
+
+def path():
+    return Path(getattr(settings, "SUBMISSION_SPOOL_PATH", Path(settings.BASE_DIR) / "spool" / "submissions.sqlite3"))
+
+
+def max_depth():
+    return getattr(settings, "SUBMISSION_SPOOL_MAX_DEPTH", 50000)
+
+
+def _connect():
+    target = str(path())
+    connections = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(target)
+    if conn is None:
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(target, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # accusé de réception = soumission sur disque
+        conn.executescript(SCHEMA)
+        connections[target] = conn
+    return conn
+
+
+def close():
+    """Ferme les connexions à la file du thread courant."""
+    for conn in _local.__dict__.pop("connections", {}).values():
+        conn.close()
+
+
+@contextmanager
+def _immediate(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _bump(conn, name, n=1):
+    conn.execute(
+        "INSERT INTO counter (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, n),
+    )
+
+
+def append(submission):
+    """
+    Ajoute une soumission validée (format de ingest.write_submissions).
+    Retourne False si son uuid est déjà en file ; lève SpoolFull si la file est pleine.
+    """
+    conn = _connect()
+    with _immediate(conn):
+        full = conn.execute("SELECT COUNT(*) FROM submission").fetchone()[0] >= max_depth()
+        if full:
+            _bump(conn, "rejected")
+        else:
+            added = conn.execute(
+                "INSERT OR IGNORE INTO submission (uuid, payload, queued_at) VALUES (?, ?, ?)",
+                (submission["uuid"], json.dumps(submission), time.time()),
+            ).rowcount == 1
+            _bump(conn, "accepted" if added else "duplicates")
+    if full:
+        raise SpoolFull
+    return added
+
+
+def _still_valid(submissions):
+    """
+    Soumissions dont l'enquête existe encore, sans les réponses aux questions
+    (ni les choix) supprimées depuis la mise en file.
+    """
+    survey_ids = {s["survey_id"] for s in submissions}
+    question_ids = {a[0] for s in submissions for a in s["answers"]}
+    choice_ids = {c for s in submissions for a in s["answers"] for c in a[2]}
+    owners = dict(Survey.objects.filter(id__in=survey_ids).values_list("id", "owner_id"))
+    questions = set(Question.objects.filter(id__in=question_ids).values_list("id", flat=True))
+    choices = set(Choice.objects.filter(id__in=choice_ids).values_list("id", flat=True))
+
+    valid = []
+    for submission in submissions:
+        if submission["survey_id"] not in owners:
+            continue
+        submission["owner_id"] = owners[submission["survey_id"]]
+        submission["answers"] = [
+            [question_id, answer_text, [c for c in ids if c in choices]]
+            for question_id, answer_text, ids in submission["answers"]
+            if question_id in questions
+        ]
+        valid.append(submission)
+    return valid
+
+
+def _write_one_by_one(submissions):
+    """
+    Écrit les soumissions une à une. Retourne ({uuid: respondent_id}, {uuid: erreur})
+    pour celles que la base refuse ; une indisponibilité de la base est relevée.
+    """
+    written, failed = {}, {}
+    for submission in submissions:
+        try:
+            with transaction.atomic():
+                written.update(ingest.write_submissions([submission]))
+        except UNAVAILABLE:
+            raise
+        except (DatabaseError, ValueError) as exc:
+            logger.exception("file des soumissions : soumission %s refusée", submission["uuid"])
+            failed[submission["uuid"]] = f"{type(exc).__name__}: {exc}"[:2000]
+    return written, failed
+
+
+def drain(batch=None):
+    """
+    Écrit le plus ancien lot dans la base principale puis le retire de la file.
+    Si la base refuse le lot, il est repris soumission par soumission et
+    celles qui échouent passent en lettres mortes (table dead).
+    Retourne le nombre de soumissions traitées (0 : file vide).
+    """
+    batch = batch or getattr(settings, "SUBMISSION_SPOOL_BATCH", 500)
+    conn = _connect()
+    rows = conn.execute("SELECT seq, payload FROM submission ORDER BY seq LIMIT ?", (batch,)).fetchall()
+    if not rows:
+        return 0
+    submissions = _still_valid([json.loads(payload) for _, payload in rows])
+    try:
+        with transaction.atomic():
+            written, failed = ingest.write_submissions(submissions), {}
+    except UNAVAILABLE:
+        raise
+    except (DatabaseError, ValueError):
+        logger.warning("file des soumissions : lot refusé, reprise soumission par soumission", exc_info=True)
+        written, failed = _write_one_by_one(submissions)
+    for submission in submissions:
+        if submission["uuid"] not in written and submission["uuid"] not in failed:
+            failed[submission["uuid"]] = UUID_CONFLICT
+    # un arrêt ici rejoue le lot : write_submissions ignore les uuids déjà écrits
+    now = time.time()
+    with _immediate(conn):
+        conn.executemany(
+            "INSERT INTO dead (seq, uuid, payload, queued_at, error, failed_at) "
+            "SELECT seq, uuid, payload, queued_at, ?, ? FROM submission WHERE uuid = ?",
+            [(error, now, key) for key, error in failed.items()],
+        )
+        conn.execute("DELETE FROM submission WHERE seq <= ?", (rows[-1][0],))
+        _bump(conn, "drained", len(submissions) - len(failed))
+        _bump(conn, "skipped", len(rows) - len(submissions))
+        _bump(conn, "dead", len(failed))
+    return len(rows)
+
+
+def stats():
+    """Profondeur de la file, âge (s) de la plus ancienne soumission et compteurs cumulés."""
+    conn = _connect()
+    depth, oldest = conn.execute("SELECT COUNT(*), MIN(queued_at) FROM submission").fetchone()
+    counters = dict(conn.execute("SELECT name, value FROM counter").fetchall())
+    return {
+        "depth": depth,
+        "max_depth": max_depth(),
+        "oldest_age": round(time.time() - oldest, 1) if oldest else 0.0,
+        **{name: counters.get(name, 0) for name in COUNTERS},
+    }
+
+
+def work(once=False, poll=1.0, batch=None, stats_every=60.0, stdout=None):
+    """Boucle du drainer : vide la file par lots, journalise les métriques périodiquement."""
+    last_stats = time.monotonic()
+    while True:
+        try:
+            n = drain(batch)
+        except DatabaseError:
+            logger.exception("file des soumissions : lot non écrit, nouvel essai dans %ss", poll)
+            n = 0
+        if stdout is not None and n:
+            stdout.write(f"{n} soumission(s) écrite(s)")
+        if time.monotonic() - last_stats >= stats_every:
+            logger.info("file des soumissions : %s", stats())
+            last_stats = time.monotonic()
+        if n:
+            continue
+        if once:
+            return
+        time.sleep(poll)
@@ -0,0 +1,367 @@
+# survey/sync.py
+"""
+Synchronisation des interviews collectées hors ligne (web mobile / offline).
+
+`sync_interviews` traite un lot d'interviews déjà validées
+(RespondentSyncSerializer) en un nombre constant de requêtes :
+questions et choix préchargés une fois, réponses et liens de choix écrits
+par bulk_create. Règle de conflit : le dernier écrivain gagne, par client_uuid,
+d'après `updated_at_local` (horodatage de l'appareil) stocké sur Respondent.
+Chaque écriture incrémente `Respondent.revision`. Les renvois (doublons,
+versions périmées) sont écartés par une simple lecture sur l'index client_uuid,
+avant toute prise de verrou et sans toucher aux réponses.
+
+Deux modes pour une interview déjà présente sur le serveur :
+  - "replace" : les anciennes réponses sont supprimées puis réécrites ;
+  - "delta"   : comparaison par question_id, seules les réponses modifiées,
+                ajoutées ou retirées sont écrites (résultat détaillé par réponse).
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Survey, Question, Choice, Respondent, Response
+from . import rollups, tallies
+
+logger = logging.getLogger(__name__)
+
+STATUS_CREATED = "created"
+STATUS_UPDATED = "updated"
+STATUS_STALE = "stale"
+STATUS_ERROR = "error"
+
+MODE_REPLACE = "replace"
+MODE_DELTA = "delta"
+
+ANSWER_CREATED = "created"
+ANSWER_UPDATED = "updated"
+ANSWER_UNCHANGED = "unchanged"
+ANSWER_DELETED = "deleted"
+
+
+class SurveyIndex:
+    """Questions et choix valides d'une enquête, chargés une seule fois pour tout le lot."""
+
+    def __init__(self, survey):
+        self.survey = survey
+        self.interviewer_name = survey.owner.username if survey.owner else "Anonyme"
+        self.question_ids = set()
+        self.choice_ids = defaultdict(set)  # question_id -> {choice_id}
+
+
+def load_survey_indexes(survey_ids):
+    """{survey_id: SurveyIndex} en trois requêtes, quel que soit le nombre d'enquêtes."""
+    indexes = {
+        sid: SurveyIndex(survey)
+        for sid, survey in Survey.objects.select_related("owner").in_bulk(set(survey_ids)).items()
+    }
+    for qid, sid in Question.objects.filter(survey_id__in=indexes).values_list("id", "survey_id"):
+        indexes[sid].question_ids.add(qid)
+    for cid, qid, sid in Choice.objects.filter(question__survey_id__in=indexes).values_list(
+        "id", "question_id", "question__survey_id"
+    ):
+        indexes[sid].choice_ids[qid].add(cid)
+    return indexes
+
+
+def incoming_answers(index, answers_payload):
+    """
+    {question_id: (answer_text, [choice_id, ...])} pour une interview,
+    limité aux questions et choix valides de l'enquête (dernière occurrence gagnante).
+    """
+    answers = {}
+    for ans in answers_payload:
+        qid = ans.get("question_id")
+        if qid not in index.question_ids:
+            logger.warning("mobile_sync: question %s non trouvée pour l'enquête %s", qid, index.survey.id)
+            continue
+        valid = index.choice_ids.get(qid, set())
+        chosen = [cid for cid in (ans.get("selected_choices") or []) if cid in valid]
+        answers[qid] = (ans.get("answer_text", "") or "", list(dict.fromkeys(chosen)))
+    return answers
+
+
+def _new_response(index, respondent_id, question_id, answer_text):
+    return Response(
+        respondent_id=respondent_id,
+        question_id=question_id,
+        survey=index.survey,
+        answer_text=answer_text,
+        created_by=index.survey.owner,
+    )
+
+
+def _result(status, client_uuid=None, respondent_id=None, revision=None, detail=None,
+            interviewer=None, answers=None):
+    result = {"status": status, "client_uuid": str(client_uuid) if client_uuid else None}
+    if respondent_id is not None:
+        result["respondent_id"] = respondent_id
+    if revision is not None:
+        result["revision"] = revision
+    if interviewer is not None:
+        result["interviewer_assigned"] = interviewer
+    if detail:
+        result["detail"] = detail
+    if answers is not None:
+        result["answers"] = answers
+    return result
+
+
+def _is_stale(current, updated_at_local):
+    """Vrai si la version serveur (`current`) est au moins aussi récente que celle reçue."""
+    return bool(current and current >= updated_at_local)
+
+
+def _stale_result(client_uuid, respondent_id, revision, current, updated_at_local):
+    if current == updated_at_local:
+        detail = "Version déjà synchronisée."
+    else:
+        detail = "Version plus récente déjà présente sur le serveur."
+    return _result(STATUS_STALE, client_uuid, respondent_id, revision, detail=detail)
+
+
+def _diff_answers(respondents, incoming_by_respondent):
+    """
+    Mode delta : compare les réponses existantes des `respondents` avec celles reçues.
+    Retourne (plan, outcomes) où `plan` regroupe les écritures à effectuer et
+    outcomes = {respondent_id: [{"question_id", "outcome"}, ...]}.
+    """
+    through = Response.selected_choices.through
+    existing = defaultdict(dict)  # respondent_id -> {question_id: (response_id, answer_text)}
+    duplicates = []
+    for rid, respondent_id, qid, text in (
+        Response.objects.filter(respondent__in=respondents)
+        .order_by("id")
+        .values_list("id", "respondent_id", "question_id", "answer_text")
+    ):
+        if qid in existing[respondent_id]:
+            duplicates.append(rid)  # données anciennes : une seule réponse par question est conservée
+        else:
+            existing[respondent_id][qid] = (rid, text)
+
+    links = defaultdict(dict)  # response_id -> {choice_id: through_id}
+    for link_id, rid, cid in through.objects.filter(response__respondent__in=respondents).values_list(
+        "id", "response_id", "choice_id"
+    ):
+        links[rid][cid] = link_id
+
+    plan = {
+        "create": [],        # (respondent_id, question_id, answer_text, [choice_id])
+        "update_text": [],   # (response_id, answer_text)
+        "link_add": [],      # (response_id, choice_id)
+        "link_remove": [],   # through_id
+        "delete": duplicates,
+        "changed": [],       # response_id modifiées en place
+    }
+    outcomes = {}
+    for respondent in respondents:
+        current = existing.get(respondent.id, {})
+        incoming = incoming_by_respondent[respondent.id]
+        report = []
+        for qid, (text, choice_ids) in incoming.items():
+            if qid not in current:
+                plan["create"].append((respondent.id, qid, text, choice_ids))
+                report.append({"question_id": qid, "outcome": ANSWER_CREATED})
+                continue
+
+            rid, old_text = current[qid]
+            old_links = links.get(rid, {})
+            changed = False
+            if old_text != text:
+                plan["update_text"].append((rid, text))
+                changed = True
+            if set(old_links) != set(choice_ids):
+                plan["link_remove"].extend(lid for cid, lid in old_links.items() if cid not in choice_ids)
+                plan["link_add"].extend((rid, cid) for cid in choice_ids if cid not in old_links)
+                changed = True
+            if changed:
+                plan["changed"].append(rid)
+            report.append({"question_id": qid, "outcome": ANSWER_UPDATED if changed else ANSWER_UNCHANGED})
+
+        for qid, (rid, _) in current.items():
+            if qid not in incoming:
+                plan["delete"].append(rid)
+                report.append({"question_id": qid, "outcome": ANSWER_DELETED})
+        outcomes[respondent.id] = report
+    return plan, outcomes
+
+
+def _apply_delta(indexes_by_respondent, plan):
+    """Écrit le plan du mode delta en requêtes groupées et ajuste les compteurs."""
+    through = Response.selected_choices.through
+
+    removed = plan["changed"] + plan["delete"]
+    if removed:
+        tallies.apply_responses(Response.objects.filter(id__in=removed), sign=-1)
+
+    if plan["update_text"]:
+        Response.objects.bulk_update(
+            [Response(id=rid, answer_text=text) for rid, text in plan["update_text"]],
+            ["answer_text"],
+        )
+    if plan["link_remove"]:
+        through.objects.filter(id__in=plan["link_remove"]).delete()
+    if plan["delete"]:
+        Response.objects.filter(id__in=plan["delete"]).delete()
+
+    created = [
+        _new_response(indexes_by_respondent[respondent_id], respondent_id, qid, text)
+        for respondent_id, qid, text, _ in plan["create"]
+    ]
+    Response.objects.bulk_create(created, batch_size=1000)
+    links = list(plan["link_add"])
+    for response, (_, _, _, choice_ids) in zip(created, plan["create"]):
+        links.extend((response.id, cid) for cid in choice_ids)
+    through.objects.bulk_create(
+        [through(response_id=rid, choice_id=cid) for rid, cid in links], batch_size=1000
+    )
+
+    added = plan["changed"] + [r.id for r in created]
+    if added:
+        tallies.apply_responses(Response.objects.filter(id__in=added))
+
+
+def sync_interviews(interviews):
+    """
+    Synchronise une liste d'interviews (validated_data de RespondentSyncSerializer).
+    Retourne une liste de résultats, dans l'ordre des interviews reçues.
+    """
+    results = [None] * len(interviews)
+    if not interviews:
+        return results
+
+    # Doublons dans le lot : seule la version la plus récente de chaque client_uuid est appliquée
+    latest = {}
+    for i, data in enumerate(interviews):
+        key = data["client_uuid"]
+        if key not in latest or interviews[latest[key]]["updated_at_local"] <= data["updated_at_local"]:
+            latest[key] = i
+    for i, data in enumerate(interviews):
+        if latest[data["client_uuid"]] != i:
+            results[i] = _result(STATUS_STALE, data["client_uuid"],
+                                 detail="Version plus récente présente dans le même lot.")
+
+    # Renvois déjà appliqués : réponse directe depuis l'index client_uuid, sans verrou
+    for row in Respondent.objects.filter(client_uuid__in=list(latest)).values(
+        "id", "client_uuid", "survey_id", "updated_at_local", "revision"
+    ):
+        i = latest[row["client_uuid"]]
+        data = interviews[i]
+        if row["survey_id"] == data["survey_id"] and _is_stale(row["updated_at_local"], data["updated_at_local"]):
+            results[i] = _stale_result(data["client_uuid"], row["id"], row["revision"],
+                                       row["updated_at_local"], data["updated_at_local"])
+            del latest[row["client_uuid"]]
+    if not latest:
+        return results
+
+    indexes = load_survey_indexes(interviews[i]["survey_id"] for i in latest.values())
+
+    with transaction.atomic():
+        existing = {
+            r.client_uuid: r
+            for r in Respondent.objects.select_for_update().filter(client_uuid__in=list(latest))
+        }
+
+        to_create, to_update, renamed, pending = [], [], [], []
+        for i in latest.values():
+            data = interviews[i]
+            index = indexes.get(data["survey_id"])
+            if index is None:
+                results[i] = _result(STATUS_ERROR, data["client_uuid"], detail="Survey introuvable.")
+                continue
+
+            respondent = existing.get(data["client_uuid"])
+            if respondent is not None and respondent.survey_id != index.survey.id:
+                results[i] = _result(STATUS_ERROR, data["client_uuid"],
+                                     detail="client_uuid déjà utilisé pour une autre enquête.")
+                continue
+
+            # Une écriture concurrente a pu passer entre la lecture sans verrou et le verrou
+            if respondent is not None and _is_stale(respondent.updated_at_local, data["updated_at_local"]):
+                results[i] = _stale_result(data["client_uuid"], respondent.id, respondent.revision,
+                                           respondent.updated_at_local, data["updated_at_local"])
+                continue
+
+            if respondent is None:
+                respondent = Respondent(
+                    survey=index.survey,
+                    client_uuid=data["client_uuid"],
+                    created_by=index.survey.owner,  # On lie techniquement la réponse au compte du proprio
+                )
+                to_create.append(respondent)
+                status = STATUS_CREATED
+            else:
+                to_update.append(respondent)
+                renamed.append((respondent, respondent.interviewer_name))
+                status = STATUS_UPDATED
+
+            # Le nom de l'interviewer est forcé avec le nom du propriétaire de l'enquête
+            respondent.interviewer_name = index.interviewer_name
+            respondent.participant_name = data.get("participant_name", "")
+            respondent.status = "synced"
+            respondent.updated_at_local = data["updated_at_local"]
+            respondent.device_id = data.get("device_id", "")
+            respondent.revision += 1  # ligne verrouillée : incrément sans course
+            pending.append((i, status, respondent, index))
+
+        Respondent.objects.bulk_create(to_create)
+        tallies.apply_respondents(to_create)
+        if to_update:
+            Respondent.objects.bulk_update(
+                to_update,
+                ["interviewer_name", "participant_name", "status", "updated_at_local", "device_id", "revision"],
+            )
+            # avant le retrait des anciennes réponses (mode replace), compté sous le nouveau nom
+            rollups.rename_respondents(renamed)
+
+        incoming = {
+            respondent.id: incoming_answers(index, interviews[i]["answers"])
+            for i, _, respondent, index in pending
+        }
+        modes = {respondent.id: interviews[i].get("mode", MODE_REPLACE) for i, _, respondent, _ in pending}
+        updated = [(respondent, index) for _, status, respondent, index in pending if status == STATUS_UPDATED]
+
+        # Mode replace : nettoyage des anciennes réponses pour ré-écriture
+        replaced = [respondent for respondent, _ in updated if modes[respondent.id] == MODE_REPLACE]
+        if replaced:
+            old_answers = Response.objects.filter(respondent__in=replaced)
+            tallies.apply_responses(old_answers, sign=-1)
+            old_answers.delete()
+
+        # Mode delta : seules les différences sont écrites
+        diffed = {respondent.id: index for respondent, index in updated if modes[respondent.id] == MODE_DELTA}
+        outcomes = {}
+        if diffed:
+            plan, outcomes = _diff_answers(
+                [respondent for respondent, _ in updated if respondent.id in diffed], incoming
+            )
+            _apply_delta(diffed, plan)
+
+        # Écriture complète : nouveaux répondants et mode replace
+        responses, selected = [], []
+        for i, status, respondent, index in pending:
+            report = outcomes.get(respondent.id)
+            if respondent.id not in diffed:
+                for qid, (text, choice_ids) in incoming[respondent.id].items():
+                    responses.append(_new_response(index, respondent.id, qid, text))
+                    selected.append(choice_ids)
+                if modes[respondent.id] == MODE_DELTA:
+                    report = [{"question_id": qid, "outcome": ANSWER_CREATED} for qid in incoming[respondent.id]]
+            results[i] = _result(status, respondent.client_uuid, respondent.id, respondent.revision,
+                                 interviewer=index.interviewer_name, answers=report)
+
+        Response.objects.bulk_create(responses, batch_size=1000)
+        through = Response.selected_choices.through
+        through.objects.bulk_create(
+            [
+                through(response_id=response.id, choice_id=cid)
+                for response, choice_ids in zip(responses, selected)
+                for cid in choice_ids
+            ],
+            batch_size=1000,
+        )
+        if responses:
+            tallies.apply_responses(Response.objects.filter(id__in=[r.id for r in responses]))
+
+    return results
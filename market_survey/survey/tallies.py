@@ -0,0 +1,186 @@
+# survey/tallies.py
+"""
+Maintenance des compteurs dénormalisés QuestionStats / ChoiceTally
+(et de l'index de termes TermFrequency, voir survey/terms.py).
+
+Chaque chemin d'écriture appelle `apply_responses` :
+  - avec sign=+1 après avoir créé des réponses,
+  - avec sign=-1 avant de les supprimer.
+Les compteurs sont modifiés par incréments atomiques F(), ce qui reste
+correct quand plusieurs collectes écrivent en même temps ; les lignes de
+même incrément partagent une seule requête UPDATE.
+Le signal `responses_changed` est émis ensuite (invalidation du cache).
+Les répondants passent de même par `apply_respondents`. Les suppressions
+passent par `delete_respondents`, qui retire et supprime les mêmes lignes
+dans une seule transaction.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Survey, Question, Choice, Respondent, Response, QuestionStats, ChoiceTally
+from .signals import responses_changed
+from . import dashboard, rollups, terms
+
+
+def _by_delta(rows, key, sign, batch=500):
+    """(incrément, ids) : une requête UPDATE par valeur d'incrément (et par lot d'ids)."""
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[sign * row["n"]].append(row[key])
+    for delta, ids in grouped.items():
+        for start in range(0, len(ids), batch):
+            yield delta, ids[start:start + batch]
+
+
+def apply_responses(responses, sign=1):
+    """
+    Répercute un ensemble de réponses (queryset Response) sur les compteurs.
+    sign=+1 pour un ajout, sign=-1 pour un retrait.
+    """
+    per_question = list(
+        responses.values("question_id", "survey_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    if not per_question:
+        return
+
+    through = Response.selected_choices.through
+    per_choice = list(
+        through.objects.filter(response__in=responses.values("id"))
+        .values("choice_id", "choice__question_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+    now = timezone.now()
+    with transaction.atomic():
+        QuestionStats.objects.bulk_create(
+            [
+                QuestionStats(question_id=row["question_id"], survey_id=row["survey_id"])
+                for row in per_question
+            ],
+            ignore_conflicts=True,
+        )
+        for delta, ids in _by_delta(per_question, "question_id", sign):
+            QuestionStats.objects.filter(question_id__in=ids).update(
+                answer_count=F("answer_count") + delta, updated_at=now
+            )
+
+        ChoiceTally.objects.bulk_create(
+            [
+                ChoiceTally(question_id=row["choice__question_id"], choice_id=row["choice_id"])
+                for row in per_choice
+            ],
+            ignore_conflicts=True,
+        )
+        for delta, ids in _by_delta(per_choice, "choice_id", sign):
+            ChoiceTally.objects.filter(choice_id__in=ids).update(
+                count=F("count") + delta, updated_at=now
+            )
+
+        terms.apply_responses(responses, sign)
+        rollups.apply_responses(responses, sign)
+
+        per_survey = Counter()
+        for row in per_question:
+            per_survey[row["survey_id"]] += sign * row["n"]
+        dashboard.record_responses(per_survey)
+
+    responses_changed.send(sender=Response, survey_ids={row["survey_id"] for row in per_question})
+
+
+def apply_respondents(respondents, sign=1):
+    """
+    Répercute des répondants (objets ou queryset) sur les cumuls horaires et le
+    tableau de bord : sign=+1 après leur création, sign=-1 avant leur suppression.
+    """
+    with transaction.atomic():
+        dashboard.record_respondents(rollups.apply_respondents(respondents, sign))
+
+
+def _chunks(items, size=5000):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def delete_respondents(respondents, responses=None):
+    """
+    Supprime des répondants (queryset) et leurs réponses, ou `responses`
+    (queryset) si fourni, en les retirant des compteurs. Les répondants sont
+    verrouillés et les ids figés avant le retrait : une réponse écrite entre-temps
+    n'est ni décomptée ni supprimée, et un échec annule tout. Retourne le
+    nombre de répondants supprimés.
+    """
+    with transaction.atomic():
+        locked = list(
+            respondents.select_for_update().only("id", "survey_id", "interviewer_name", "created_at").order_by("pk")
+        )
+        if responses is None:
+            responses = Response.objects.filter(respondent_id__in=[r.pk for r in locked])
+        for ids in _chunks(list(responses.values_list("id", flat=True))):
+            batch = Response.objects.filter(id__in=ids)
+            apply_responses(batch, sign=-1)
+            batch.delete()
+        for chunk in _chunks(locked):
+            apply_respondents(chunk, sign=-1)
+            Respondent.objects.filter(id__in=[r.pk for r in chunk]).delete()
+    return len(locked)
+
+
+def choice_counts(survey):
+    """{choice_id: count} lu depuis ChoiceTally (une ligne par choix, pas par réponse)."""
+    return dict(
+        ChoiceTally.objects.filter(question__survey=survey).values_list("choice_id", "count")
+    )
+
+
+def rebuild(survey=None):
+    """
+    Recalcule entièrement les compteurs à partir des réponses brutes.
+    Sans `survey`, reconstruit toutes les enquêtes.
+    """
+    questions = Question.objects.all()
+    choices = Choice.objects.all()
+    responses = Response.objects.all()
+    if survey is not None:
+        questions = questions.filter(survey=survey)
+        choices = choices.filter(question__survey=survey)
+        responses = responses.filter(survey=survey)
+
+    answer_counts = dict(
+        responses.values("question_id").annotate(n=Count("id")).order_by().values_list("question_id", "n")
+    )
+    through = Response.selected_choices.through
+    counts = dict(
+        through.objects.filter(response__in=responses.values("id"))
+        .values("choice_id")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("choice_id", "n")
+    )
+
+    with transaction.atomic():
+        QuestionStats.objects.filter(question__in=questions).delete()
+        ChoiceTally.objects.filter(choice__in=choices).delete()
+        QuestionStats.objects.bulk_create(
+            [
+                QuestionStats(question_id=qid, survey_id=sid, answer_count=answer_counts.get(qid, 0))
+                for qid, sid in questions.values_list("id", "survey_id")
+            ],
+            batch_size=1000,
+        )
+        ChoiceTally.objects.bulk_create(
+            [
+                ChoiceTally(question_id=qid, choice_id=cid, count=counts.get(cid, 0))
+                for cid, qid in choices.values_list("id", "question_id")
+            ],
+            batch_size=1000,
+        )
+        terms.rebuild(survey)
+
+    survey_ids = {survey.id} if survey is not None else set(Survey.objects.values_list("id", flat=True))
+    responses_changed.send(sender=Response, survey_ids=survey_ids)
@@ -0,0 +1,141 @@
+# survey/terms.py
+"""
+Index de fréquence des termes des réponses texte (table TermFrequency).
+
+Découpage adapté au français : minuscules, apostrophe typographique
+normalisée, élisions retirées (l', d', qu'…), nombres et mots vides ignorés.
+Les compteurs sont mis à jour par tallies.apply_responses (création,
+modification, suppression de réponses) ; le résumé et le nuage de mots lisent
+les termes les plus fréquents par requête indexée, sans relire les réponses.
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Question, Response, TermFrequency
+
+TEXT_TYPES = ("text",)
+MIN_LENGTH = 3
+MAX_LENGTH = 64  # TermFrequency.term
+
+WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+ELISION = re.compile(r"^(?:c|d|j|l|m|n|s|t|qu|jusqu|lorsqu|puisqu|quoiqu)'")
+
+STOPWORDS = frozenset("""
+    alors au aucun aucune aussi autre autres aux avec avoir bon car ce ceci cela celle celles celui
+    ces cet cette ceux chaque ci comme comment dans de des du donc dont elle elles en encore est et
+    été être eu fait faire fois font hors ici il ils je juste la le les leur leurs lui ma mais me
+    même mêmes mes moi moins mon ne ni nos notre nous on ont ou où par parce pas peu peut plupart
+    pour pourquoi qu quand que quel quelle quelles quels qui sa sans se sera ses seul seulement si
+    sien son sont sous soit sur ta tandis te tel telle tellement tels tes toi ton tous tout toute
+    toutes très tu un une vos votre vous vu ça étaient était étant étions êtes sommes suis avons
+    avez avaient avait aurait auraient serait seraient ai as aie aient ait y oui non rien plus bien
+    beaucoup trop assez déjà jamais toujours souvent aussi puis ainsi après avant chez entre vers
+    depuis pendant selon via cas chose choses etc the and for with that this
+""".split())
+
+
+def tokenize(text):
+    """Termes significatifs d'une réponse, dans l'ordre du texte."""
+    text = unicodedata.normalize("NFC", str(text)).lower().replace("’", "'")
+    terms = []
+    for word in WORD.findall(text):
+        word = ELISION.sub("", word)
+        if MIN_LENGTH <= len(word) <= MAX_LENGTH and word not in STOPWORDS:
+            terms.append(word)
+    return terms
+
+
+def _text_responses(responses):
+    return (
+        responses.filter(question__question_type__in=TEXT_TYPES)
+        .exclude(answer_text="")
+        .values_list("question_id", "survey_id", "answer_text")
+    )
+
+
+def _count(rows):
+    """{(question_id, survey_id, terme): occurrences} pour des lignes (question, enquête, texte)."""
+    counts = Counter()
+    for question_id, survey_id, text in rows:
+        for term in tokenize(text):
+            counts[(question_id, survey_id, term)] += 1
+    return counts
+
+
+def apply_responses(responses, sign=1):
+    """
+    Répercute un ensemble de réponses (queryset Response) sur TermFrequency.
+    Les incréments de même valeur sont regroupés : une requête UPDATE par
+    (question, incrément) et non par terme.
+    """
+    counts = _count(_text_responses(responses))
+    if not counts:
+        return
+
+    grouped = defaultdict(list)
+    for (question_id, _, term), n in counts.items():
+        grouped[(question_id, sign * n)].append(term)
+
+    now = timezone.now()
+    with transaction.atomic():
+        TermFrequency.objects.bulk_create(
+            [
+                TermFrequency(question_id=question_id, survey_id=survey_id, term=term)
+                for question_id, survey_id, term in counts
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        for (question_id, delta), terms in grouped.items():
+            for start in range(0, len(terms), 500):
+                TermFrequency.objects.filter(question_id=question_id, term__in=terms[start:start + 500]).update(
+                    count=F("count") + delta, updated_at=now
+                )
+
+
+def rebuild(survey=None):
+    """Recalcule l'index à partir des réponses brutes (toutes les enquêtes sans `survey`)."""
+    questions = Question.objects.all()
+    responses = Response.objects.all()
+    if survey is not None:
+        questions = questions.filter(survey=survey)
+        responses = responses.filter(survey=survey)
+
+    counts = _count(_text_responses(responses).iterator(chunk_size=2000))
+    with transaction.atomic():
+        TermFrequency.objects.filter(question__in=questions).delete()
+        TermFrequency.objects.bulk_create(
+            [
+                TermFrequency(question_id=question_id, survey_id=survey_id, term=term, count=n)
+                for (question_id, survey_id, term), n in counts.items()
+            ],
+            batch_size=1000,
+        )
+
+
+def top_terms(question, n=10):
+    """[(terme, occurrences)] les plus fréquents d'une question (index question, -count)."""
+    return list(
+        TermFrequency.objects.filter(question=question, count__gt=0)
+        .order_by("-count", "term")
+        .values_list("term", "count")[:n]
+    )
+
+
+def survey_terms(survey, n=None):
+    """[(terme, occurrences)] les plus fréquents sur toutes les questions texte de l'enquête."""
+    n = n or getattr(settings, "WORDCLOUD_MAX_WORDS", 200)
+    return list(
+        TermFrequency.objects.filter(survey=survey)
+        .values("term")
+        .annotate(total=Sum("count"))
+        .filter(total__gt=0)
+        .order_by("-total", "term")
+        .values_list("term", "total")[:n]
+    )
@@ -1,3 +1,1379 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import re
+import tempfile
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DataError, DatabaseError, IntegrityError, OperationalError, connection, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from openpyxl import load_workbook
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import (
+    cache as survey_cache, changes, dashboard, export_jobs, exports, idempotency, ingest, rollups, spool, tallies,
+    terms, wordclouds,
+)
+from .analytics import build_chart_data, choice_counts
+from .conditional import bump_content_version
+from .models import (
+    Survey, Question, Choice, Respondent, Response, ChoiceTally, QuestionStats, TermFrequency, ExportJob,
+    IdempotencyKey, DashboardSnapshot, CollectionRollup,
+)
+
+User = get_user_model()
+
+
+def make_survey(owner, n_choice_questions=2, n_choices=3, n_text_questions=1):
+    survey = Survey.objects.create(title="Enquête", owner=owner)
+    order = 0
+    for i in range(n_choice_questions):
+        q = Question.objects.create(survey=survey, text=f"Choix {i}", question_type="single", order=order)
+        order += 1
+        for j in range(n_choices):
+            Choice.objects.create(question=q, text=f"Option {i}.{j}")
+    for i in range(n_text_questions):
+        Question.objects.create(survey=survey, text=f"Texte {i}", question_type="text", order=order)
+        order += 1
+    return survey
+
+
+def nonzero(counts):
+    return {key: n for key, n in counts.items() if n}
+
+
+def answer(respondent, question, text="", choices=()):
+    response = Response.objects.create(respondent=respondent, question=question, answer_text=text)
+    if choices:
+        response.selected_choices.set(choices)
+    return response
+
+
+class SurveyAnalyticsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, self.q2, self.q_text = self.survey.questions.all()
+        self.c1 = list(self.q1.choices.all())
+        for i in range(4):
+            respondent = Respondent.objects.create(survey=self.survey, interviewer_name=f"R{i}")
+            answer(respondent, self.q1, choices=[self.c1[i % 2]])
+            answer(respondent, self.q_text, text=f"réponse {i}")
+        tallies.rebuild(self.survey)
+
+    def test_counts(self):
+        data = build_chart_data(self.survey)
+        self.assertEqual(data[0]["data"], [2, 2, 0])
+        self.assertEqual(data[1]["data"], [0, 0, 0])
+        self.assertEqual(len(data[2]["answers"]), 4)
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(4):
+            build_chart_data(self.survey)
+
+        bigger = make_survey(self.owner, n_choice_questions=30, n_choices=5, n_text_questions=10)
+        with self.assertNumQueries(4):
+            build_chart_data(bigger)
+
+    def test_api_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        res = client.get(f"/api/surveys/{self.survey.id}/analytics/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["questions"][0]["data"], [2, 2, 0])
+
+    def test_api_endpoint_is_owner_only(self):
+        url = f"/api/surveys/{self.survey.id}/analytics/"
+        client = APIClient()
+        self.assertEqual(client.get(url).status_code, 401)
+        client.force_authenticate(User.objects.create_user("other", password="pwd"))
+        self.assertEqual(client.get(url).status_code, 404)
+        client.force_authenticate(User.objects.create_user("admin", password="pwd", is_staff=True))
+        self.assertEqual(client.get(url).status_code, 200)
+
+
+class TallyTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, self.q2, self.q_text = self.survey.questions.all()
+        self.c1 = list(self.q1.choices.all())
+
+    def submit(self, choice):
+        self.client.post(
+            f"/{self.survey.id}/take/",
+            {f"question_{self.q1.id}": [choice.id], f"question_{self.q_text.id}": "bonjour"},
+        )
+
+    def test_take_survey_and_delete_update_tallies(self):
+        self.submit(self.c1[0])
+        self.submit(self.c1[0])
+        self.submit(self.c1[1])
+        self.assertEqual(nonzero(tallies.choice_counts(self.survey)), choice_counts(self.survey))
+        self.assertEqual(QuestionStats.objects.get(question=self.q_text).answer_count, 3)
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 6)
+
+        respondent = Respondent.objects.filter(survey=self.survey).first()
+        self.client.force_login(self.owner)
+        self.client.post(f"/respondent/{respondent.id}/delete/")
+        self.assertEqual(nonzero(tallies.choice_counts(self.survey)), choice_counts(self.survey))
+        self.assertEqual(QuestionStats.objects.get(question=self.q_text).answer_count, 2)
+
+    def counters(self):
+        return (
+            nonzero(tallies.choice_counts(self.survey)),
+            dict(QuestionStats.objects.filter(survey=self.survey, answer_count__gt=0)
+                 .values_list("question_id", "answer_count")),
+            sorted(TermFrequency.objects.filter(question__survey=self.survey, count__gt=0).values_list("term", "count")),
+            sorted(CollectionRollup.objects.filter(survey=self.survey).exclude(respondents=0, responses=0)
+                   .values_list("interviewer_name", "bucket", "respondents", "responses")),
+            DashboardSnapshot.objects.filter(owner=self.owner).values_list("total_respondents", "total_responses").get(),
+        )
+
+    def assert_counters_match_rebuild(self):
+        incremental = self.counters()
+        tallies.rebuild(self.survey)
+        rollups.rebuild(self.survey)
+        dashboard.refresh(self.owner, full=True)
+        self.assertEqual(incremental, self.counters())
+
+    def test_deletions_keep_counters_in_sync(self):
+        dashboard.snapshot(self.owner)
+        for choice in (self.c1[0], self.c1[0], self.c1[1], self.c1[2]):
+            self.submit(choice)
+        first, second = Respondent.objects.filter(survey=self.survey)[:2]
+        self.client.force_login(self.owner)
+        self.client.post(f"/respondent/{first.id}/delete/")
+        api = APIClient()
+        api.force_authenticate(self.owner)
+        self.assertEqual(api.delete(f"/api/respondents/{second.id}/").status_code, 204)
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 2)
+        self.assert_counters_match_rebuild()
+
+        # un échec en cours de suppression annule tout, compteurs compris
+        before = self.counters()
+        with mock.patch.object(tallies, "apply_respondents", side_effect=DatabaseError("boom")):
+            with self.assertRaises(DatabaseError):
+                self.client.post(f"/survey/{self.survey.id}/delete_responses/")
+        self.assertEqual(self.counters(), before)
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 4)
+
+        self.client.post(f"/survey/{self.survey.id}/delete_responses/")
+        self.assertFalse(Response.objects.filter(survey=self.survey).exists())
+        self.assertFalse(Respondent.objects.filter(survey=self.survey).exists())
+        self.assertEqual(self.counters()[4], (0, 0))
+        self.assert_counters_match_rebuild()
+
+    def test_take_survey_ignores_foreign_choices_and_is_atomic(self):
+        other = list(self.q2.choices.all())[0]
+        self.client.post(
+            f"/{self.survey.id}/take/",
+            {f"question_{self.q1.id}": [self.c1[0].id, self.c1[0].id, other.id, "x"]},
+        )
+        response = Response.objects.get(survey=self.survey, question=self.q1)
+        self.assertEqual(list(response.selected_choices.all()), [self.c1[0]])
+
+        with mock.patch("survey.tallies.apply_responses", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.submit(self.c1[1])
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 1)
+
+    def test_take_survey_queries_do_not_grow_with_questions(self):
+        def submission_queries():
+            payload = {}
+            for question in self.survey.questions.prefetch_related("choices"):
+                choices = [c.id for c in question.choices.all()]
+                payload[f"question_{question.id}"] = choices[:1] if choices else "bonjour"
+            self.client.post(f"/{self.survey.id}/take/", payload)  # définition mise en cache
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(f"/{self.survey.id}/take/", payload)
+            return len(ctx)
+
+        before = submission_queries()
+        for i in range(5):
+            question = Question.objects.create(survey=self.survey, text=f"Q{i}", question_type="single")
+            Choice.objects.create(question=question, text="a")
+        self.assertEqual(submission_queries(), before)
+
+    def test_response_without_survey_is_rejected(self):
+        respondent = Respondent.objects.create(survey=self.survey, interviewer_name="R")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Response.objects.bulk_create([Response(respondent=respondent, question=self.q_text)])
+
+    def test_rebuild_matches_raw_counts(self):
+        self.submit(self.c1[2])
+        ChoiceTally.objects.all().update(count=42)
+        tallies.rebuild(self.survey)
+        self.assertEqual(
+            nonzero(tallies.choice_counts(self.survey)),
+            choice_counts(self.survey),
+        )
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, self.q2, self.q_text = self.survey.questions.all()
+        self.q2.question_type = "multiple"
+        self.q2.save()
+        choices = list(self.q1.choices.all())
+        multi = list(self.q2.choices.all())
+        for i in range(3):
+            respondent = Respondent.objects.create(survey=self.survey, interviewer_name=f"R{i}")
+            answer(respondent, self.q1, choices=choices[i:i + 1])
+            answer(respondent, self.q2, choices=multi[:i + 1])
+            answer(respondent, self.q_text, text=f"réponse <{i}> & co")
+        self.client.force_login(self.owner)
+
+    def test_streaming_xlsx_is_readable(self):
+        res = self.client.get(f"/{self.survey.id}/export/excel/")
+        self.assertTrue(res.streaming)
+        wb = load_workbook(BytesIO(b"".join(res.streaming_content)))
+        rows = list(wb.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][3:], ("Question", "Réponse"))
+        self.assertEqual(len(rows), 1 + 9)
+        self.assertIn("réponse <2> & co", [r[4] for r in rows])
+        self.assertEqual(wb.active.freeze_panes, "A2")
+
+    def test_wide_csv_one_row_per_respondent(self):
+        res = self.client.get(f"/{self.survey.id}/export/wide/csv/")
+        content = b"".join(res.streaming_content).decode("utf-8-sig")
+        header, *rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(len(header), 4 + 1 + 3 + 1)
+        self.assertEqual(len(rows), 3)
+        by_name = {row[2]: row for row in rows}
+        self.assertEqual(by_name["R1"][4:9], ["Option 0.1", "1", "1", "0", "réponse <1> & co"])
+
+    def test_wide_export_keeps_respondents_without_answers(self):
+        Respondent.objects.create(survey=self.survey, interviewer_name="Vide")
+        res = self.client.get(f"/{self.survey.id}/export/wide/csv/")
+        content = b"".join(res.streaming_content).decode("utf-8-sig")
+        header, *rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        empty = {row[2]: row for row in rows}["Vide"]
+        self.assertEqual(empty[4:], [""] * (len(header) - 4))
+        self.assertEqual(len(rows), export_jobs._wide_total(self.survey))
+
+    @override_settings(PDF_SAMPLE_ANSWERS=2)
+    def test_pdf_report_data_and_constant_queries(self):
+        tallies.rebuild(self.survey)
+        data = exports.survey_report_data(self.survey)
+        by_text = {q["text"]: q for q in data["questions"]}
+        self.assertEqual(by_text["Choix 0"]["counts"], [1, 1, 1])
+        self.assertEqual(by_text["Texte 0"]["sample"], ["réponse <2> & co", "réponse <1> & co"])
+        self.assertEqual(by_text["Texte 0"]["terms"][0], ("réponse", 3))
+
+        with self.assertNumQueries(7):
+            exports.write_survey_pdf(self.survey, BytesIO())
+        bigger = make_survey(self.owner, n_choice_questions=20, n_text_questions=5)
+        with self.assertNumQueries(7):
+            exports.write_survey_pdf(bigger, BytesIO())
+
+    @skipIf(exports.pyarrow is None, "pyarrow non installé")
+    def test_wide_parquet(self):
+        res = self.client.get(f"/{self.survey.id}/export/wide/parquet/")
+        table = exports.pyarrow.parquet.read_table(BytesIO(b"".join(res.streaming_content)))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.num_columns, 9)
+
+    def test_wide_columnar_without_pyarrow(self):
+        with mock.patch.object(exports, "pyarrow", None):
+            res = self.client.get(f"/{self.survey.id}/export/wide/parquet/")
+            self.assertEqual(res.status_code, 501)
+            self.assertNotIn("arrow", export_jobs.available_formats())
+            res = self.client.get(f"/{self.survey.id}/export/wide/csv/")
+            self.assertEqual(res.status_code, 200)
+
+
+class MobileSyncTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, self.q2, self.q_text = self.survey.questions.all()
+        self.c1 = list(self.q1.choices.all())
+        self.client = APIClient()
+
+    def interview(self, client_uuid=None, updated="2026-01-01T10:00:00Z", choice=None, text="ok"):
+        return {
+            "client_uuid": str(client_uuid or uuid.uuid4()),
+            "survey_id": self.survey.id,
+            "interviewer_name": "terrain",
+            "updated_at_local": updated,
+            "answers": [
+                {"question_id": self.q1.id, "selected_choices": [(choice or self.c1[0]).id]},
+                {"question_id": self.q_text.id, "answer_text": text},
+            ],
+        }
+
+    def sync_batch(self, interviews):
+        return self.client.post("/api/mobile/sync/batch/", {"interviews": interviews}, format="json")
+
+    def test_batch_statuses(self):
+        dup = uuid.uuid4()
+        res = self.sync_batch([
+            self.interview(),
+            {"survey_id": self.survey.id},
+            self.interview(dup, updated="2026-01-01T10:00:00Z", text="ancien"),
+            self.interview(dup, updated="2026-01-01T11:00:00Z", text="récent"),
+        ])
+        statuses = [r["status"] for r in res.json()["results"]]
+        self.assertEqual(statuses, ["created", "invalid", "stale", "created"])
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 2)
+        self.assertEqual(Response.objects.get(respondent__client_uuid=dup, question=self.q_text).answer_text, "récent")
+        self.assertEqual(tallies.choice_counts(self.survey)[self.c1[0].id], 2)
+        self.assertFalse(Response.objects.exclude(survey=self.survey).exists())
+
+    def test_batch_accepts_string_survey_id(self):
+        item = self.interview()
+        item["survey_id"] = str(self.survey.id)
+        res = self.sync_batch([item])
+        self.assertEqual(res.json()["results"][0]["status"], "created")
+
+    def test_resync_replaces_answers(self):
+        payload = self.interview()
+        self.client.post("/api/mobile/sync/", payload, format="json")
+        payload["answers"][0]["selected_choices"] = [self.c1[1].id]
+        payload["updated_at_local"] = "2026-01-01T11:00:00Z"
+        res = self.client.post("/api/mobile/sync/", payload, format="json")
+        self.assertEqual(res.json()["detail"], "Synchro réussie")
+        self.assertEqual(Response.objects.filter(respondent__client_uuid=payload["client_uuid"]).count(), 2)
+        self.assertEqual(nonzero(tallies.choice_counts(self.survey)), choice_counts(self.survey))
+
+    def test_delta_resync_writes_only_changes(self):
+        payload = self.interview()
+        self.client.post("/api/mobile/sync/", payload, format="json")
+        text_response = Response.objects.get(respondent__client_uuid=payload["client_uuid"], question=self.q_text)
+
+        payload["mode"] = "delta"
+        payload["answers"][0]["selected_choices"] = [self.c1[2].id]
+        payload["updated_at_local"] = "2026-01-01T11:00:00Z"
+        res = self.client.post("/api/mobile/sync/", payload, format="json")
+        outcomes = {a["question_id"]: a["outcome"] for a in res.json()["answers"]}
+        self.assertEqual(outcomes, {self.q1.id: "updated", self.q_text.id: "unchanged"})
+        # la réponse inchangée est conservée telle quelle
+        self.assertTrue(Response.objects.filter(pk=text_response.pk).exists())
+
+        payload["answers"] = payload["answers"][:1]
+        payload["updated_at_local"] = "2026-01-01T12:00:00Z"
+        res = self.client.post("/api/mobile/sync/", payload, format="json")
+        self.assertIn({"question_id": self.q_text.id, "outcome": "deleted"}, res.json()["answers"])
+        self.assertEqual(nonzero(tallies.choice_counts(self.survey)), choice_counts(self.survey))
+        self.assertEqual(QuestionStats.objects.get(question=self.q_text).answer_count, 0)
+
+    def test_versioned_resync(self):
+        payload = self.interview(updated="2026-01-01T10:00:00Z")
+        payload["device_id"] = "tablette-1"
+        self.assertEqual(self.client.post("/api/mobile/sync/", payload, format="json").json()["revision"], 1)
+
+        # renvoi identique : réponse depuis l'index, sans toucher aux réponses
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post("/api/mobile/sync/", payload, format="json")
+        self.assertEqual(res.json()["detail"], "Version déjà synchronisée.")
+        self.assertEqual(res.json()["revision"], 1)
+        self.assertLessEqual(len(queries), 2)  # enquête (validation) + index client_uuid
+        self.assertFalse(any("survey_response" in q["sql"] for q in queries))
+
+        older = self.interview(payload["client_uuid"], updated="2026-01-01T09:00:00Z", text="ancien")
+        res = self.client.post("/api/mobile/sync/", older, format="json")
+        self.assertEqual(res.json()["detail"], "Version plus récente déjà présente sur le serveur.")
+
+        newer = self.interview(payload["client_uuid"], updated="2026-01-01T11:00:00Z", text="récent")
+        self.assertEqual(self.client.post("/api/mobile/sync/", newer, format="json").json()["revision"], 2)
+        respondent = Respondent.objects.get(client_uuid=payload["client_uuid"])
+        self.assertEqual((respondent.revision, respondent.device_id), (2, ""))
+        self.assertEqual(respondent.answers.get(question=self.q_text).answer_text, "récent")
+
+    def test_batch_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            self.sync_batch([self.interview() for _ in range(2)])
+        with CaptureQueriesContext(connection) as large:
+            self.sync_batch([self.interview() for _ in range(40)])
+        self.assertEqual(len(small), len(large))
+
+
+# TransactionTestCase : sous PostgreSQL, le flux ne sert que les transactions validées
+@override_settings(MOBILE_CHANGES_SETTLE_SECONDS=0)
+class ChangesFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.other = User.objects.create_user("other", password="pwd")
+        self.survey = make_survey(self.owner)
+        make_survey(self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def changes(self, cursor=None):
+        params = {"since": cursor} if cursor else {}
+        res = self.client.get("/api/mobile/changes/", params)
+        self.assertEqual(res.status_code, 200)
+        return res.json()
+
+    def test_full_then_incremental(self):
+        first = self.changes()
+        self.assertEqual([s["id"] for s in first["surveys"]], [self.survey.id])
+        self.assertEqual(len(first["questions"]), 3)
+        self.assertEqual(len(first["choices"]), 6)
+        self.assertEqual(self.changes(first["cursor"])["choices"], [])
+
+        q1 = self.survey.questions.first()
+        choice = q1.choices.first()
+        choice.text = "renommé"
+        choice.save()
+        choice.save()
+        deleted_id = q1.choices.last().id
+        q1.choices.last().delete()
+
+        delta = self.changes(first["cursor"])
+        self.assertEqual([(c["id"], c["text"]) for c in delta["choices"]], [(choice.id, "renommé")])
+        self.assertEqual(delta["deleted_choices"], [deleted_id])
+        self.assertEqual(delta["surveys"], [])
+
+        survey_id = self.survey.id
+        self.survey.delete()
+        gone = self.changes(delta["cursor"])
+        self.assertEqual(gone["deleted_surveys"], [survey_id])
+        self.assertEqual(len(gone["deleted_questions"]), 3)
+
+    def test_paging_and_invalid_cursor(self):
+        with self.settings(MOBILE_CHANGES_PAGE_SIZE=4):
+            page = self.changes()
+            self.assertTrue(page["has_more"])
+            seen = len(page["surveys"]) + len(page["questions"]) + len(page["choices"])
+            while page["has_more"]:
+                page = self.changes(page["cursor"])
+                seen += len(page["surveys"]) + len(page["questions"]) + len(page["choices"])
+        self.assertEqual(seen, 1 + 3 + 6)
+        res = self.client.get("/api/mobile/changes/", {"since": "pas-un-curseur"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_cursor_formats(self):
+        self.assertEqual(changes.decode_cursor(changes.encode_cursor(None, 42)), (0, 42))
+        self.assertEqual(changes.decode_cursor(changes.encode_cursor(917, 42)), (917, 42))
+        for raw in ("c2:1", "c2:-1:4", "c3:5"):
+            with self.assertRaises(changes.InvalidCursor):
+                changes.decode_cursor(base64.urlsafe_b64encode(raw.encode()).decode())
+
+
+class BulkResponseTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, self.q2, self.q_text = self.survey.questions.all()
+        self.c1 = list(self.q1.choices.all())
+        self.respondent = Respondent.objects.create(survey=self.survey, interviewer_name="R")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def items(self, n):
+        return [
+            {"respondent_id": self.respondent.id, "question": self.q1.id, "selected_choices": [self.c1[i % 3].id]}
+            for i in range(n)
+        ]
+
+    def bulk(self, items, **options):
+        return self.client.post("/api/responses/bulk/", {"responses": items, **options}, format="json")
+
+    def test_bulk_creates_and_updates_tallies(self):
+        items = self.items(3) + [{
+            "respondent_data": {"survey": self.survey.id, "interviewer_name": "Nouveau"},
+            "question": self.q_text.id,
+            "answer_text": None,
+        }]
+        res = self.bulk(items)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([r["index"] for r in res.json()["results"]], [0, 1, 2, 3])
+        created = Response.objects.get(pk=res.json()["results"][3]["id"])
+        self.assertEqual((created.respondent.interviewer_name, created.answer_text), ("Nouveau", ""))
+        self.assertEqual(created.created_by, self.owner)
+        self.assertFalse(Response.objects.exclude(survey=self.survey).exists())
+        self.assertEqual(nonzero(tallies.choice_counts(self.survey)), choice_counts(self.survey))
+
+    def test_atomic_rejects_whole_batch(self):
+        items = self.items(3)
+        items[1]["selected_choices"] = [self.c1[0].id, 999999]
+        items[2]["question"] = self.q_text.id  # choix d'une autre question
+        res = self.bulk(items)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual([e["index"] for e in res.json()["errors"]], [1, 2])
+        self.assertEqual(Response.objects.count(), 0)
+
+        res = self.bulk(items, atomic=False)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([r["index"] for r in res.json()["results"]], [0])
+        self.assertEqual(Response.objects.count(), 1)
+
+    def test_same_errors_as_single_create(self):
+        item = {"respondent_id": self.respondent.id, "question": self.q_text.id, "selected_choices": [self.c1[0].id]}
+        single = self.client.post("/api/responses/", item, format="json")
+        self.assertEqual(single.status_code, 400)
+        bulk = self.bulk([item, {"question": "x", "respondent_data": {"survey": self.survey.id}}])
+        errors = bulk.json()["errors"]
+        self.assertEqual(errors[0]["errors"], single.json())
+        self.assertEqual(set(errors[1]["errors"]), {"question", "respondent_data"})
+        self.assertEqual(list(errors[1]["errors"]["respondent_data"]), ["interviewer_name"])
+
+    def test_single_create_accepts_legacy_nested_respondent(self):
+        res = self.client.post(
+            "/api/responses/",
+            {"question": self.q_text.id, "answer_text": "ok", "respondent": {"interviewer_name": "Ancien"}},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201)
+        respondent = Respondent.objects.get(interviewer_name="Ancien")
+        self.assertEqual((respondent.survey, respondent.created_by), (self.survey, self.owner))
+        self.assertEqual(Response.objects.get(pk=res.json()["id"]).respondent, respondent)
+
+        # l'ingestion groupée exige toujours un répondant
+        errors = self.bulk([{"question": self.q_text.id, "answer_text": "ok"}]).json()["errors"]
+        self.assertEqual(errors[0]["errors"], {"respondent_id": ["This field is required."]})
+
+    def test_partial_mode_commits_chunks(self):
+        items = self.items(7)
+        items[3]["question"] = 999999
+        write = ingest.write_responses
+
+        def failing_second_chunk(chunk):
+            if failing_second_chunk.calls == 1:
+                failing_second_chunk.calls += 1
+                raise DatabaseError("boom")
+            failing_second_chunk.calls += 1
+            return write(chunk)
+        failing_second_chunk.calls = 0
+
+        with mock.patch.object(ingest, "write_responses", failing_second_chunk), self.assertLogs("survey.ingest"):
+            res = self.client.post(
+                "/api/responses/bulk/?mode=partial&chunk_size=2", {"responses": items}, format="json"
+            )
+        self.assertEqual(res.status_code, 201)
+        # paquets valides : [0, 1] [2, 4] [5, 6] ; le deuxième échoue
+        self.assertEqual([r["index"] for r in res.json()["results"]], [0, 1, 5, 6])
+        self.assertEqual([e["index"] for e in res.json()["errors"]], [2, 3, 4])
+        self.assertEqual(res.json()["errors"][0]["exception"], ingest.WRITE_FAILED)  # pas le texte de la base
+        self.assertEqual(Response.objects.count(), 4)
+        self.assertEqual(nonzero(tallies.choice_counts(self.survey)), choice_counts(self.survey))
+        self.assertEqual(self.bulk(items, mode="bogus").status_code, 400)
+
+    def test_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            self.bulk(self.items(3))
+        with CaptureQueriesContext(connection) as large:
+            self.bulk(self.items(150))  # un seul lot d'INSERT, même sous SQLite
+        self.assertEqual(len(small), len(large))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1 = self.survey.questions.first()
+        self.respondent = Respondent.objects.create(survey=self.survey, interviewer_name="R")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.owner).access_token}")
+
+    def bulk(self, key, text="ok"):
+        items = [{"respondent_id": self.respondent.id, "question": self.q1.id, "answer_text": text}]
+        return self.client.post("/api/responses/bulk/", {"responses": items}, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_key_replays_stored_response_without_writes(self):
+        first = self.bulk("k1")
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.bulk("k1")
+        self.assertTrue(all(q["sql"].lstrip().upper().startswith("SELECT") for q in ctx.captured_queries))
+        self.assertEqual((again.status_code, again.content), (201, first.content))
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 1)
+
+        self.assertEqual(self.bulk("k1", text="autre").status_code, 422)
+        self.assertEqual(self.bulk("k2").status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get(key="k1").scope, f"user:{self.owner.id}")
+
+    def test_in_progress_abandoned_and_expired_keys(self):
+        self.bulk("k1")
+        IdempotencyKey.objects.filter(key="k1").update(status="processing")
+        res = self.bulk("k1")
+        self.assertEqual(res.status_code, 409)
+        self.assertIn("Retry-After", res)
+
+        # une requête lente n'est pas encore considérée abandonnée
+        IdempotencyKey.objects.filter(key="k1").update(claimed_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.bulk("k1").status_code, 409)
+        IdempotencyKey.objects.filter(key="k1").update(claimed_at=timezone.now() - timedelta(minutes=20))
+        self.assertNotIn("Idempotent-Replayed", self.bulk("k1"))
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(idempotency.purge(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_superseded_request_does_not_touch_the_new_claim(self):
+        old, claimed = idempotency.claim("user:1", "k1", "a" * 64)
+        self.assertTrue(claimed)
+        IdempotencyKey.objects.filter(pk=old.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        new, claimed = idempotency.claim("user:1", "k1", "a" * 64)
+        self.assertTrue(claimed)
+
+        # la requête reprise se termine ensuite : ni réponse enregistrée, ni clé libérée
+        idempotency.store(old, HttpResponse("ancienne", status=201))
+        idempotency.store(old, HttpResponse(status=500))
+        record = IdempotencyKey.objects.get(pk=new.pk)
+        self.assertEqual((record.status, record.claimed_at), ("processing", new.claimed_at))
+
+        idempotency.store(new, HttpResponse("nouvelle", status=201))
+        self.assertEqual(bytes(IdempotencyKey.objects.get(pk=new.pk).response_body), b"nouvelle")
+
+    def test_anonymous_callers_do_not_share_keys(self):
+        url = f"/{self.survey.id}/take/"
+        first = Client(REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(first.post(url, {}, HTTP_IDEMPOTENCY_KEY="k1").status_code, 200)
+        other = Client(REMOTE_ADDR="10.0.0.2")
+        self.assertNotIn("Idempotent-Replayed", other.post(url, {}, HTTP_IDEMPOTENCY_KEY="k1"))
+        self.assertEqual(first.post(url, {}, HTTP_IDEMPOTENCY_KEY="k1")["Idempotent-Replayed"], "true")
+        self.assertEqual(Respondent.objects.filter(survey=self.survey, interviewer_name="Réponse en ligne").count(), 2)
+        self.assertEqual(
+            sorted(IdempotencyKey.objects.values_list("scope", flat=True)), ["ip:10.0.0.1", "ip:10.0.0.2"]
+        )
+
+        # avec une session, la portée est la session plutôt que l'adresse
+        request = RequestFactory().post(url, REMOTE_ADDR="10.0.0.1")
+        request.session = SessionStore()
+        request.session.save()
+        self.assertEqual(idempotency._scope(request), f"session:{request.session.session_key}")
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.other = make_survey(self.owner)
+        self.q1, _, self.q_text = self.survey.questions.all()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def summary(self, query=""):
+        return self.client.get(f"/api/dashboard-summary/{query}").json()
+
+    def submit(self):
+        self.client.post(
+            f"/{self.survey.id}/take/",
+            {f"question_{self.q1.id}": [self.q1.choices.first().id], f"question_{self.q_text.id}": "ok"},
+        )
+
+    def test_totals_maintained_by_write_paths(self):
+        self.assertEqual(self.summary()["total_surveys"], 2)
+        self.submit()
+        self.submit()
+        with self.assertNumQueries(1):
+            snapshot = dashboard.snapshot(self.owner)
+        self.assertEqual((snapshot.total_respondents, snapshot.total_responses), (2, 4))
+
+        respondent = Respondent.objects.filter(survey=self.survey).first()
+        self.client.force_login(self.owner)
+        self.client.post(f"/respondent/{respondent.id}/delete/")
+        data = self.summary()
+        self.assertEqual((data["total_respondents"], data["total_responses"]), (1, 2))
+
+    def test_staleness_bound_and_fresh(self):
+        self.summary()
+        self.submit()
+        self.assertEqual(self.summary()["top_surveys"][0]["responses"], 0)  # classement dans la limite d'âge
+        DashboardSnapshot.objects.update(refreshed_at=timezone.now() - timedelta(minutes=5))
+        top = self.summary()["top_surveys"]
+        self.assertEqual((top[0]["id"], top[0]["responses"]), (self.survey.id, 2))
+
+        DashboardSnapshot.objects.update(total_respondents=99)
+        self.assertEqual(self.summary()["total_respondents"], 99)
+        self.assertEqual(self.summary("?fresh=1")["total_respondents"], 1)
+
+        make_survey(self.owner)
+        self.assertEqual(self.summary()["total_surveys"], 3)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, _, self.q_text = self.survey.questions.all()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def submit(self, interviewer):
+        self.client.post(
+            f"/{self.survey.id}/take/",
+            {"interviewer_name": interviewer, f"question_{self.q1.id}": [self.q1.choices.first().id],
+             f"question_{self.q_text.id}": "ok"},
+        )
+
+    def rows(self):
+        return sorted(
+            CollectionRollup.objects.filter(survey=self.survey)
+            .exclude(respondents=0, responses=0)
+            .values_list("interviewer_name", "bucket", "respondents", "responses")
+        )
+
+    def test_incremental_rollups_match_backfill(self):
+        self.submit("Awa")
+        self.submit("Awa")
+        self.submit("Brice")
+        self.client.post("/api/responses/bulk/", {"responses": [{
+            "respondent_data": {"survey": self.survey.id, "interviewer_name": "Brice"},
+            "question": self.q_text.id, "answer_text": "x",
+        }]}, format="json")
+        incremental = self.rows()
+        self.assertEqual([(name, r, n) for name, _, r, n in incremental], [("Awa", 2, 4), ("Brice", 2, 3)])
+
+        respondent = Respondent.objects.filter(survey=self.survey, interviewer_name="Awa").first()
+        self.client.delete(f"/api/respondents/{respondent.id}/")
+        incremental = self.rows()
+        self.assertEqual(rollups.rebuild(self.survey), 2)
+        self.assertEqual(self.rows(), incremental)
+        self.assertEqual(incremental[0][2:], (1, 2))
+
+    def test_rename_then_delete(self):
+        self.submit("Awa")
+        self.submit("Awa")
+        first, second = Respondent.objects.filter(survey=self.survey)
+        self.client.patch(f"/api/respondents/{first.id}/", {"interviewer_name": "Awa D."}, format="json")
+        answer = second.answers.first()
+        self.client.patch(f"/api/responses/{answer.id}/", {"respondent_data": {"interviewer_name": "Awa K."}},
+                          format="json")
+        self.assertEqual(Respondent.objects.get(pk=second.pk).interviewer_name, "Awa K.")
+
+        # synchronisation mobile : le nom forcé suit le nom du propriétaire
+        interview = {
+            "client_uuid": str(uuid.uuid4()), "survey_id": self.survey.id, "interviewer_name": "terrain",
+            "updated_at_local": "2026-01-01T10:00:00Z", "answers": [{"question_id": self.q_text.id, "answer_text": "ok"}],
+        }
+        self.client.post("/api/mobile/sync/", interview, format="json")
+        User.objects.filter(pk=self.owner.pk).update(username="proprio")
+        self.client.post("/api/mobile/sync/", {**interview, "updated_at_local": "2026-01-01T11:00:00Z"}, format="json")
+        synced = Respondent.objects.get(client_uuid=interview["client_uuid"])
+        self.assertEqual(synced.interviewer_name, "proprio")
+
+        incremental = self.rows()
+        self.assertEqual([(name, r, n) for name, _, r, n in incremental],
+                         [("Awa D.", 1, 2), ("Awa K.", 1, 2), ("proprio", 1, 1)])
+        rollups.rebuild(self.survey)
+        self.assertEqual(self.rows(), incremental)
+
+        for respondent in (first, second, synced):
+            self.client.delete(f"/api/respondents/{respondent.id}/")
+        self.assertEqual(self.rows(), [])
+        self.assertFalse(CollectionRollup.objects.filter(survey=self.survey).exclude(respondents=0, responses=0))
+
+    def test_timeseries_endpoint(self):
+        self.submit("Awa")
+        self.submit("Brice")
+        Respondent.objects.filter(interviewer_name="Brice").update(created_at=timezone.now() - timedelta(days=2))
+        Response.objects.filter(respondent__interviewer_name="Brice").update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        call_command("backfill_rollups", survey=self.survey.id, stdout=StringIO())
+
+        url = f"/api/surveys/{self.survey.id}/timeseries/"
+        data = self.client.get(url, {"interval": "day", "by": "interviewer"}).json()
+        self.assertEqual([(p["interviewer_name"], p["respondents"], p["responses"]) for p in data["series"]],
+                         [("Brice", 1, 2), ("Awa", 1, 2)])
+        start = (timezone.now() - timedelta(days=1)).isoformat()
+        data = self.client.get(url, {"start": start}).json()
+        self.assertEqual([(p["respondents"], p["responses"]) for p in data["series"]], [(1, 2)])
+
+        self.assertEqual(self.client.get(url, {"interval": "minute"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "hier"}).status_code, 400)
+        self.client.force_authenticate(User.objects.create_user("other"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ResponseListTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, self.q2, self.q_text = self.survey.questions.all()
+        c1 = list(self.q1.choices.all())
+        for i in range(5):
+            respondent = Respondent.objects.create(survey=self.survey, interviewer_name=f"R{i}")
+            answer(respondent, self.q1, choices=[c1[i % 3]])
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_unpaginated_by_default(self):
+        res = self.client.get(f"/api/responses/?survey={self.survey.id}")
+        self.assertEqual(len(res.json()), 5)
+        self.assertEqual(res.json()[0]["respondent"]["interviewer_name"], "R0")
+
+    def test_keyset_pages(self):
+        ids, url = [], f"/api/responses/?survey={self.survey.id}&page_size=2"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 2)
+            ids += [row["id"] for row in page["results"]]
+            url = page["next"]
+        self.assertEqual(ids, sorted(Response.objects.values_list("id", flat=True)))
+        self.assertEqual(self.client.get("/api/responses/?cursor=nimportequoi").status_code, 404)
+
+        surveys = self.client.get("/api/surveys/?page_size=1").json()
+        self.assertEqual([s["id"] for s in surveys["results"]], [self.survey.id])
+        self.assertIsNone(surveys["next"])
+
+    def test_sparse_flat_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(f"/api/responses/?survey={self.survey.id}&flat=1&fields=id,respondent_id,question")
+        row = res.json()[0]
+        self.assertEqual(set(row), {"id", "respondent_id", "question"})
+        self.assertIsInstance(row["respondent_id"], int)
+        # ni jointure respondent ni préchargement des choix
+        self.assertFalse(any("survey_respondent" in q["sql"] or "selected_choices" in q["sql"] for q in queries))
+
+
+class SurveyReadTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.surveys = [make_survey(self.owner) for _ in range(3)]
+        Respondent.objects.create(survey=self.surveys[1], interviewer_name="R")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_same_payload_as_writable_serializer(self):
+        from .serializers import SurveySerializer
+
+        request = APIRequestFactory().get("/api/surveys/")
+        expected = SurveySerializer(
+            Survey.objects.filter(owner=self.owner), many=True, context={"request": Request(request)}
+        ).data
+        res = self.client.get("/api/surveys/")
+        self.assertEqual(json.loads(json.dumps(expected)), res.json())
+        self.assertEqual([s["has_responses"] for s in res.json()], [False, True, False])
+
+    def test_list_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/api/surveys/")
+        for _ in range(5):
+            make_survey(self.owner, n_choice_questions=4)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get("/api/surveys/")
+        self.assertEqual(len(few), len(many))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_api_etag_and_304(self):
+        url = f"/api/surveys/{self.survey.id}/"
+        first = self.client.get(url)
+        etag = first["ETag"]
+        self.assertTrue(first.has_header("Last-Modified"))
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertFalse(any("survey_question" in q["sql"] or "survey_choice" in q["sql"] for q in queries))
+        self.assertEqual(self.client.get(f"{url}summary/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        payload = first.json()
+        payload["questions"][0]["text"] = "Question modifiée"
+        self.client.put(url, payload, format="json")
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertEqual(res.json()["questions"][0]["text"], "Question modifiée")
+
+    def test_cached_body_always_matches_the_etag(self):
+        url = f"/api/surveys/{self.survey.id}/"
+        etag = self.client.get(url)["ETag"]  # définition mise en cache
+
+        # modification faite par un autre processus : son cache (LocMemCache) n'est pas le nôtre,
+        # seule la version en base change
+        choice = Choice.objects.filter(question__survey=self.survey).first()
+        Choice.objects.filter(pk=choice.pk).update(text="Option renommée")
+        bump_content_version(self.survey.id)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+        texts = [c["text"] for q in res.json()["questions"] for c in q["choices"]]
+        self.assertIn("Option renommée", texts)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 304)
+
+    def test_if_modified_since_alone_is_not_a_304(self):
+        url = f"/api/surveys/{self.survey.id}/"
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 200)
+
+    def test_take_survey_form_survives_csrf_rotation(self):
+        url = f"/{self.survey.id}/take/"
+        browser = Client(enforce_csrf_checks=True)
+        first = browser.get(url)
+        self.assertFalse(first.has_header("ETag"))
+
+        # nouvelle session (connexion, déconnexion) : nouveau cookie CSRF
+        browser.cookies.clear()
+        page = browser.get(url, HTTP_IF_NONE_MATCH='"take-0"', HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(page.status_code, 200)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page.content.decode()).group(1)
+        res = browser.post(url, {"csrfmiddlewaretoken": token, "interviewer_name": "A"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 1)
+
+
+class SurveyCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_take_survey_definition_cached_and_invalidated(self):
+        url = f"/{self.survey.id}/take/"
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.client.get(url), "Option 0.2")
+        self.assertFalse(any("survey_question" in q["sql"] or "survey_choice" in q["sql"] for q in queries))
+
+        choice = Choice.objects.filter(question__survey=self.survey).first()
+        choice.text = "Option renommée"
+        choice.save()
+        self.assertContains(self.client.get(url), "Option renommée")
+
+    def test_analytics_invalidated_by_response_writes(self):
+        url = f"/api/surveys/{self.survey.id}/analytics/"
+        question = self.survey.questions.filter(question_type="single").first()
+        choice = question.choices.first()
+        self.assertEqual(self.client.get(url).json()["questions"][0]["data"], [0, 0, 0])
+
+        ingest.ingest_responses([{
+            "question": question.id,
+            "respondent_data": {"survey": self.survey.id, "interviewer_name": "A"},
+            "selected_choices": [choice.id],
+        }])
+        self.assertEqual(self.client.get(url).json()["questions"][0]["data"], [1, 0, 0])
+
+    def test_stampede_lock(self):
+        compute = mock.Mock(return_value=["valeur"])
+        self.assertEqual(survey_cache.get_or_compute(self.survey, "test", compute), ["valeur"])
+        self.assertEqual(survey_cache.get_or_compute(self.survey, "test", compute), ["valeur"])
+        self.assertEqual(compute.call_count, 1)
+
+        # un autre processus détient le verrou : on attend, puis on calcule soi-même
+        bump_content_version(self.survey.id)
+        self.survey.refresh_from_db()
+        key = survey_cache.entry_key(self.survey, "test")
+        cache.add(f"{key}:lock", 1)
+        with override_settings(SURVEY_CACHE_LOCK_WAIT=0):
+            survey_cache.get_or_compute(self.survey, "test", compute)
+        self.assertEqual(compute.call_count, 2)
+        self.assertIsNone(cache.get(key))  # le calcul de secours n'écrit pas à la place du détenteur
+
+
+class TermIndexTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q_text = self.survey.questions.get(question_type="text")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def index(self):
+        return dict(TermFrequency.objects.filter(question=self.q_text, count__gt=0).values_list("term", "count"))
+
+    def test_tokenize_french(self):
+        self.assertEqual(
+            terms.tokenize("L’enquête d'aujourd'hui : les prix sont TROP élevés, 100 FCFA !"),
+            ["enquête", "aujourd'hui", "prix", "élevés", "fcfa"],
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        res = self.client.post("/api/responses/bulk/", {"responses": [
+            {"question": self.q_text.id, "respondent_data": {"survey": self.survey.id, "interviewer_name": "A"},
+             "answer_text": text}
+            for text in ("Prix élevés", "les prix du marché", "Marché propre")
+        ]}, format="json")
+        self.assertEqual(self.index(), {"prix": 2, "élevés": 1, "marché": 2, "propre": 1})
+
+        first = res.json()["results"][0]["id"]
+        self.client.patch(f"/api/responses/{first}/", {"answer_text": "marché bruyant"}, format="json")
+        self.client.delete(f"/api/responses/{res.json()['results'][2]['id']}/")
+        expected = {"prix": 1, "marché": 2, "bruyant": 1}
+        self.assertEqual(self.index(), expected)
+
+        tallies.rebuild(self.survey)
+        self.assertEqual(self.index(), expected)
+        with self.assertNumQueries(1):
+            self.assertEqual(terms.top_terms(self.q_text, 1), [("marché", 2)])
+
+
+class SubmissionSpoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(spool.close)
+        spooled = override_settings(
+            SUBMISSION_SPOOL_ENABLED=True, SUBMISSION_SPOOL_PATH=os.path.join(tmp.name, "spool.sqlite3")
+        )
+        spooled.enable()
+        self.addCleanup(spooled.disable)
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        self.q1, _, self.q_text = self.survey.questions.all()
+        self.choice = self.q1.choices.first()
+
+    def post(self, key):
+        return self.client.post(
+            f"/{self.survey.id}/take/",
+            {"submission_uuid": key, f"question_{self.q1.id}": [self.choice.id], f"question_{self.q_text.id}": "ok"},
+        )
+
+    def test_spooled_submission_written_exactly_once(self):
+        key = str(uuid.uuid4())
+        self.assertEqual(self.post(key).status_code, 200)
+        self.assertEqual(self.post(key).status_code, 200)
+        self.assertFalse(Respondent.objects.filter(survey=self.survey).exists())
+        stats = spool.stats()
+        self.assertEqual((stats["depth"], stats["accepted"], stats["duplicates"]), (1, 1, 1))
+
+        self.assertEqual(spool.drain(), 1)
+        self.assertEqual(spool.drain(), 0)
+        respondent = Respondent.objects.get(survey=self.survey)
+        self.assertEqual(str(respondent.client_uuid), key)
+        self.assertEqual(respondent.answers.count(), 2)
+        self.assertEqual(respondent.created_by, self.owner)
+
+        # lot rejoué (arrêt du drainer avant retrait de la file) : rien n'est réécrit
+        self.post(key)
+        spool.drain()
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 1)
+        self.assertEqual(ChoiceTally.objects.get(choice=self.choice).count, 1)
+        self.assertEqual(spool.stats()["depth"], 0)
+
+    def test_backpressure_and_deleted_questions(self):
+        with override_settings(SUBMISSION_SPOOL_MAX_DEPTH=1):
+            self.assertEqual(self.post(str(uuid.uuid4())).status_code, 200)
+            res = self.post(str(uuid.uuid4()))
+            self.assertEqual(res.status_code, 503)
+            self.assertIn("Retry-After", res)
+        self.assertEqual(spool.stats()["rejected"], 1)
+
+        self.q_text.delete()
+        spool.drain()
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 1)
+
+    def test_failing_submission_goes_to_dead_letters(self):
+        poison, good, taken = (str(uuid.uuid4()) for _ in range(3))
+        self.client.post(f"/{self.survey.id}/take/", {"submission_uuid": poison, "interviewer_name": "x" * 300})
+        self.post(good)
+        self.post(taken)
+        Respondent.objects.create(survey=make_survey(self.owner), interviewer_name="B", client_uuid=taken)
+        payload = spool._connect().execute("SELECT payload FROM submission WHERE uuid = ?", (poison,)).fetchone()[0]
+        self.assertEqual(json.loads(payload)["interviewer_name"], "x" * 150)
+
+        write = ingest.write_submissions
+
+        def refuse_poison(submissions):
+            if any(s["uuid"] == poison for s in submissions):
+                raise DataError("value too long")
+            return write(submissions)
+
+        # base indisponible : le lot reste en file
+        with mock.patch.object(ingest, "write_submissions", side_effect=OperationalError("database is locked")):
+            with self.assertRaises(OperationalError):
+                spool.drain()
+        self.assertEqual(spool.stats()["depth"], 3)
+
+        with mock.patch.object(ingest, "write_submissions", side_effect=refuse_poison), self.assertLogs("survey.spool"):
+            self.assertEqual(spool.drain(), 3)
+        self.assertEqual(list(Respondent.objects.filter(survey=self.survey).values_list("client_uuid", flat=True)),
+                         [uuid.UUID(good)])
+        stats = spool.stats()
+        self.assertEqual((stats["depth"], stats["drained"], stats["dead"]), (0, 1, 2))
+        dead = dict(spool._connect().execute("SELECT uuid, error FROM dead").fetchall())
+        self.assertEqual(set(dead), {poison, taken})
+        self.assertEqual(dead[taken], spool.UUID_CONFLICT)
+
+    def test_synchronous_submission_is_idempotent(self):
+        key = str(uuid.uuid4())
+        with override_settings(SUBMISSION_SPOOL_ENABLED=False):
+            self.post(key)
+            self.post(key)
+            self.assertEqual(self.post("pas-un-uuid").status_code, 400)
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 1)
+        self.assertEqual(spool.stats()["depth"], 0)
+
+    def test_concurrent_resubmission_and_uuid_of_another_survey(self):
+        key = str(uuid.uuid4())
+        submission = {
+            "uuid": key, "survey_id": self.survey.id, "owner_id": self.owner.id,
+            "interviewer_name": "A", "answers": [[self.q_text.id, "ok", []]],
+        }
+        first = ingest.write_submissions([submission])[key]
+
+        # l'autre envoi écrit le même uuid entre la lecture et l'insertion
+        written = ingest._existing([key])
+        with mock.patch.object(ingest, "_existing", side_effect=[{}, written]):
+            self.assertEqual(ingest.write_submissions([submission]), {key: first})
+        self.assertEqual(Respondent.objects.filter(survey=self.survey).count(), 1)
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 1)
+
+        other = make_survey(self.owner)
+        self.assertEqual(ingest.write_submissions([{**submission, "survey_id": other.id}]), {})
+        self.assertFalse(other.respondents.exists())
+        with override_settings(SUBMISSION_SPOOL_ENABLED=False):
+            res = self.client.post(f"/{other.id}/take/", {"submission_uuid": key})
+        self.assertEqual(res.status_code, 409)
+
+
+class WordcloudTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        q_text = self.survey.questions.get(question_type="text")
+        for i in range(3):
+            respondent = Respondent.objects.create(survey=self.survey, interviewer_name=f"R{i}")
+            answer(respondent, q_text, text=f"livraison rapide produit {i}")
+        tallies.rebuild(self.survey)
+        self.client.force_login(self.owner)
+
+    def test_summary_renders_placeholder_then_image_is_served(self):
+        with override_settings(WORDCLOUD_ROOT=self.root.name):
+            res = self.client.get(f"/survey/{self.survey.id}/summary/")
+            self.assertContains(res, 'id="wordcloud-placeholder"')
+            url = res.context["wordcloud_url"]
+            key = url.rsplit("/", 1)[1].removesuffix(".png")
+            self.assertEqual(url, f"/survey/{self.survey.id}/wordcloud/{key}.png")
+
+            # rendu mis en file une seule fois, par le worker des exports
+            self.assertEqual(self.client.get(url).status_code, 202)
+            self.assertEqual(ExportJob.objects.filter(format=wordclouds.WORDCLOUD, status="pending").count(), 1)
+            self.assertEqual(self.client.get("/api/exports/").json(), [])
+            export_jobs.work(once=True)
+            img = self.client.get(url)
+            self.assertEqual(img.status_code, 200)
+            self.assertEqual(img["Content-Type"], "image/png")
+            self.assertIn("immutable", img["Cache-Control"])
+            self.assertNotContains(self.client.get(f"/survey/{self.survey.id}/summary/"), 'id="wordcloud-placeholder"')
+
+            self.assertEqual(self.client.get(url.replace(key, "0" * 64)).status_code, 404)
+
+    def test_cleanup_keeps_only_the_current_image(self):
+        with override_settings(WORDCLOUD_ROOT=self.root.name):
+            wordclouds.schedule(self.survey, "c" * 64)
+            export_jobs.work(once=True)
+            current = ExportJob.objects.get(format=wordclouds.WORDCLOUD).file_path
+
+            old = wordclouds.path_for(self.survey.id, "a" * 64)
+            old.write_bytes(b"png")
+            os.utime(old, (0, 0))
+            gone = wordclouds.path_for(self.survey.id + 1, "b" * 64)
+            gone.parent.mkdir(parents=True)
+            gone.write_bytes(b"png")
+            self.assertEqual(export_jobs.cleanup(), 2)
+            self.assertEqual(
+                [str(p) for p in Path(self.root.name).rglob("*.png")], [current]
+            )
+            self.assertFalse(gone.parent.exists())
+
+
+@override_settings(EXPORT_TTL_HOURS=1)
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        override = override_settings(EXPORT_ROOT=self.root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.owner = User.objects.create_user("owner", password="pwd")
+        self.survey = make_survey(self.owner)
+        q1 = self.survey.questions.first()
+        for i in range(3):
+            respondent = Respondent.objects.create(survey=self.survey, interviewer_name=f"R{i}")
+            answer(respondent, q1, choices=[q1.choices.first()])
+        tallies.rebuild(self.survey)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_start_poll_download(self):
+        res = self.client.post(f"/api/surveys/{self.survey.id}/exports/", {"format": "csv"}, format="json")
+        self.assertEqual(res.status_code, 202)
+        job_url = f"/api/exports/{res.json()['id']}/"
+        self.assertEqual(res.json()["status"], "pending")
+        self.assertEqual(self.client.get(f"{job_url}download/").status_code, 409)
+
+        export_jobs.work(once=True)
+        job = self.client.get(job_url).json()
+        self.assertEqual((job["status"], job["progress"]), ("done", 100))
+        download = self.client.get(job["download_url"])
+        self.assertEqual(download.status_code, 200)
+        rows = list(csv.reader(StringIO(b"".join(download.streaming_content).decode("utf-8-sig"))))
+        self.assertEqual(len(rows), 1 + 3)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("other"))
+        self.assertEqual(other.get(job_url).status_code, 404)
+        self.assertEqual(
+            self.client.post(f"/api/surveys/{self.survey.id}/exports/", {"format": "doc"}, format="json").status_code,
+            400,
+        )
+
+    def test_pdf_job_and_expiry_cleanup(self):
+        job = export_jobs.enqueue(self.survey, self.owner, "pdf")
+        export_jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        with open(job.file_path, "rb") as f:
+            self.assertEqual(f.read(4), b"%PDF")
+
+        export_jobs.cleanup(now=job.expires_at)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "expired")
+        self.assertEqual(os.listdir(self.root.name), [])
+        self.assertEqual(self.client.get(f"/api/exports/{job.id}/download/").status_code, 410)
+
+    def test_stale_running_job_is_reclaimed(self):
+        job = export_jobs.enqueue(self.survey, self.owner, "xlsx")
+        first = export_jobs.claim_next()
+        self.assertEqual(first.pk, job.pk)
+        self.assertIsNone(export_jobs.claim_next())
+
+        ExportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        reclaimed = export_jobs.claim_next()
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+
+        # le premier worker termine après la reprise : il n'écrase pas la nouvelle tentative
+        with self.assertLogs("survey.export_jobs", "WARNING"):
+            self.assertFalse(export_jobs.run(first))
+        self.assertEqual(ExportJob.objects.get(pk=job.pk).status, "running")
+        self.assertEqual(os.listdir(self.root.name), [])
+
+        # abandonné pendant la dernière tentative : échec, plus jamais « en cours »
+        with self.settings(EXPORT_JOB_MAX_ATTEMPTS=2):
+            ExportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+            self.assertIsNone(export_jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", export_jobs.ABANDONED))
+        self.assertEqual(self.client.get(f"/api/exports/{job.id}/").json()["status"], "failed")
+
+    def test_pdf_view_uses_no_named_temp_file(self):
+        self.client.force_login(self.owner)
+        with mock.patch("tempfile.NamedTemporaryFile") as named:
+            res = self.client.get(f"/{self.survey.id}/export/pdf/")
+        self.assertFalse(named.called)
+        self.assertTrue(b"".join(res.streaming_content).startswith(b"%PDF"))
+
+
+EXPLAIN_RESPONSES = int(os.environ.get("SURVEY_EXPLAIN_RESPONSES", "1000000"))
+BIG_TABLES = ("survey_response_selected_choices", "survey_response", "survey_respondent")
+FULL_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (%s)\b" % "|".join(BIG_TABLES)),
+    "sqlite": re.compile(r"\bSCAN (%s)\b" % "|".join(BIG_TABLES)),
+}
+
+
+@skipIf(
+    not os.environ.get("SURVEY_EXPLAIN_TESTS") or connection.vendor not in FULL_SCAN,
+    "SURVEY_EXPLAIN_TESTS=1 requis (base PostgreSQL, ~1M réponses générées)",
+)
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN de la requête principale de chaque vue sur une base de
+    SURVEY_EXPLAIN_RESPONSES réponses : aucun parcours séquentiel des grosses tables.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        from .benchmarks import seed_survey
+
+        surveys, questions = 20, 10
+        owners = [User.objects.create_user(f"plan-{i}") for i in range(4)]
+        for i in range(surveys):
+            seed_survey(owners[i % len(owners)], EXPLAIN_RESPONSES // (surveys * questions), questions=questions)
+        tallies.rebuild()
+        cls.owner = owners[0]
+        cls.survey = Survey.objects.filter(owner=cls.owner).first()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def explain(self, sql):
+        prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+
+    def api(self, viewset, action, path, **kwargs):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, self.owner)
+        return viewset.as_view({"get": action})(request, **kwargs)
+
+    def list_queryset(self, viewset, path):
+        """Queryset de la vue liste (filtres compris), expliqué sans être évalué."""
+        view = viewset(action="list", format_kwarg=None)
+        view.request = Request(APIRequestFactory().get(path))
+        view.request.user = self.owner
+        return view.filter_queryset(view.get_queryset())
+
+    def targets(self):
+        from .api_views import SurveyViewSet, ResponseViewSet, RespondentViewSet, dashboard_summary
+        from .sync import sync_interviews
+
+        survey = self.survey
+        request = APIRequestFactory().get("/api/dashboard/")
+        force_authenticate(request, self.owner)
+        client_uuids = list(survey.respondents.values_list("client_uuid", flat=True)[:5])
+        return {
+            "api surveys": self.list_queryset(SurveyViewSet, "/api/surveys/"),
+            "api responses ?survey": self.list_queryset(ResponseViewSet, f"/api/responses/?survey={survey.id}"),
+            "api respondents ?survey": self.list_queryset(
+                RespondentViewSet, f"/api/respondents/?survey={survey.id}"
+            ),
+            "api analytics": lambda: self.api(SurveyViewSet, "analytics", "/", pk=survey.id),
+            "dashboard": lambda: dashboard_summary(request),
+            "summary charts": lambda: build_chart_data(survey, counts=tallies.choice_counts(survey)),
+            "export long": lambda: next(exports.survey_long_rows(survey, chunk_size=100)),
+            "export wide": lambda: next(exports.survey_wide_rows(survey)),
+            "sync lookup": lambda: sync_interviews([
+                {"client_uuid": u, "survey_id": survey.id, "updated_at_local": survey.created_at, "answers": []}
+                for u in client_uuids
+            ]),
+        }
+
+    def test_no_sequential_scan_on_large_tables(self):
+        pattern = FULL_SCAN[connection.vendor]
+        failures = []
+        for name, target in self.targets().items():
+            if isinstance(target, QuerySet):
+                plans = [(str(target.query), target.explain())]
+            else:
+                with CaptureQueriesContext(connection) as queries:
+                    target()
+                plans = [
+                    (query["sql"], self.explain(query["sql"]))
+                    for query in queries
+                    if query["sql"].lstrip().upper().startswith("SELECT")
+                ]
+            failures.extend(f"{name}:\n  {sql}\n  {plan}" for sql, plan in plans if pattern.search(plan))
+        self.assertFalse(failures, "\n\n".join(failures))
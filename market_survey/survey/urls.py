@@ -3,8 +3,8 @@ from django.urls import path, include
 from rest_framework import routers
 
 from . import views
-from .api_views import SurveyViewSet, ResponseViewSet, RespondentViewSet
-from .api_views import mobile_sync_respondent
+from .api_views import SurveyViewSet, ResponseViewSet, RespondentViewSet, ExportJobViewSet
+from .api_views import dashboard_summary, mobile_sync_respondent, mobile_sync_batch, mobile_changes, submission_spool_stats
 from .openai_views import chat_proxy
 
 # ---------- ROUTER API ----------
@@ -12,6 +12,7 @@ router = routers.DefaultRouter()
 router.register(r"surveys", SurveyViewSet, basename="api-surveys")
 router.register(r"responses", ResponseViewSet, basename="api-responses")
 router.register(r"respondents", RespondentViewSet, basename="api-respondents")
+router.register(r"exports", ExportJobViewSet, basename="api-exports")
 
 # ---------- URLS ----------
 urlpatterns = [
@@ -23,7 +24,9 @@ urlpatterns = [
     path("<int:survey_id>/take/", views.take_survey, name="take_survey"),
     path("<int:survey_id>/edit/", views.survey_edit, name="survey_edit"),
     path("survey/<int:survey_id>/summary/", views.survey_summary, name="survey_summary"),
+    path("survey/<int:survey_id>/wordcloud/<str:key>.png", views.survey_wordcloud, name="survey_wordcloud"),
     path("<int:survey_id>/export/excel/", views.export_survey_excel, name="export_survey_excel"),
+    path("<int:survey_id>/export/wide/<str:fmt>/", views.export_survey_wide, name="export_survey_wide"),
     path("<int:survey_id>/export/pdf/", views.export_survey_pdf, name="export_survey_pdf"),
     path("<int:survey_id>/delete/", views.survey_delete, name="survey_delete"),
     path("survey/<int:survey_id>/delete_responses/", views.delete_all_responses, name="delete_all_responses"),
@@ -32,7 +35,11 @@ urlpatterns = [
 
     # ------- API custom endpoints -------
     path("api/openai/chat/", chat_proxy, name="api_openai_chat"),
+    path("api/dashboard-summary/", dashboard_summary, name="dashboard_summary"),
     path("api/mobile/sync/", mobile_sync_respondent, name="mobile_sync_respondent"),
+    path("api/mobile/sync/batch/", mobile_sync_batch, name="mobile_sync_batch"),
+    path("api/mobile/changes/", mobile_changes, name="mobile_changes"),
+    path("api/submissions/spool/", submission_spool_stats, name="submission_spool_stats"),
 
     # ------- API REST router (/api/...) -------
     path("api/", include(router.urls)),
@@ -1,22 +1,27 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.db import transaction
 from .models import Survey, Question, Choice, Respondent, Response
-from openpyxl import Workbook
-from django.http import HttpResponse, FileResponse,JsonResponse
+from django.http import HttpResponse, FileResponse,JsonResponse, StreamingHttpResponse
 import json
 import qrcode
 from io import BytesIO
 import base64
 from django.urls import reverse
-from wordcloud import WordCloud
-from collections import Counter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-import tempfile
 from .decorators import group_required
+from .analytics import CHOICE_TYPES, cached_chart_data
+from .serializers import cached_questions
+from . import ingest, spool, tallies
+from . import exports
+from . import terms, wordclouds
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
+import re
+import uuid
+from django.conf import settings
+
+WORDCLOUD_KEY = re.compile(r"[0-9a-f]{64}")
+INTERVIEWER_NAME_MAX = Respondent._meta.get_field("interviewer_name").max_length
 
 def get_survey_or_404(request, survey_id):
     user = request.user
@@ -29,22 +34,6 @@ def get_public_survey_or_404(survey_id):
     return get_object_or_404(Survey, id=survey_id)
 
 
-def generate_wordcloud_and_stats(text_list):
-    """Retourne image base64 et top words (liste (mot, count))."""
-    full_text = " ".join(text_list).lower()
-    if not full_text.strip():
-        return None, []
-    wc = WordCloud(width=600, height=400, background_color="white").generate(full_text)
-    buffer = BytesIO()
-    wc.to_image().save(buffer, format="PNG")
-    img_b64 = base64.b64encode(buffer.getvalue()).decode()
-
-    # Statistiques de fréquence (mots > 3 lettres)
-    words = [w for w in full_text.split() if len(w) > 3]
-    freq = Counter(words).most_common(10)
-    return img_b64, freq
-
-
 def generate_qr_for_survey(request, survey):
     """Retourne data URI PNG du QR code pointant vers la page take_survey."""
     base_url = request.build_absolute_uri('/')[:-1]  # ex: http://127.0.0.1:8000
@@ -106,29 +95,8 @@ def survey_summary(request, survey_id):
 
     respondents_qs = Respondent.objects.filter(survey=survey)
 
-    chart_data = []
-    for question in survey.questions.all():
-        entry = {"text": question.text, "type": question.question_type}
-
-        if question.question_type in ['single', 'multiple']:
-            labels, values = [], []
-            for choice in question.choices.all():
-                labels.append(choice.text)
-                count = Response.objects.filter(
-                    question=question,
-                    respondent__in=respondents_qs,
-                    selected_choices=choice
-                ).count()
-                values.append(count)
-            entry["labels"], entry["data"] = labels, values
-        else:
-            answers = Response.objects.filter(
-                question=question,
-                respondent__in=respondents_qs
-            ).values_list('answer_text', flat=True)
-            entry["answers"] = [a for a in answers if a and str(a).strip()]
-
-        chart_data.append(entry)
+    # Comptes par choix lus dans ChoiceTally, réponses libres en une requête groupée (en cache)
+    chart_data = cached_chart_data(survey)
 
     context = {
         "survey": survey,
@@ -137,119 +105,110 @@ def survey_summary(request, survey_id):
         "qr_code": generate_qr_for_survey(request, survey),
     }
 
-    text_answers = [
-        r.answer_text.strip()
-        for r in Response.objects.filter(
-            question__survey=survey,
-            question__question_type='text',
-            respondent__in=respondents_qs
-        )
-        if r.answer_text and r.answer_text.strip()
-    ]
-
-    if text_answers:
-        wc_image, top_words = generate_wordcloud_and_stats(text_answers)
-        if wc_image:
-            context["wordcloud_img"] = f"data:image/png;base64,{wc_image}"
-            context["top_words"] = top_words
+    # Fréquences lues dans l'index TermFrequency ; nuage de mots rendu en
+    # arrière-plan : la page affiche un espace réservé et charge l'image par
+    # sa propre URL dès qu'elle est prête
+    frequencies = terms.survey_terms(survey)
+    if frequencies:
+        key = wordclouds.digest(frequencies)
+        wordclouds.schedule(survey, key)
+        context["wordcloud_url"] = reverse("survey_wordcloud", args=[survey.id, key])
+        context["wordcloud_ready"] = wordclouds.path_for(survey.id, key).exists()
+        context["top_words"] = frequencies[:10]
     else:
-        context["wordcloud_img"] = None
+        context["wordcloud_url"] = None
         context["top_words"] = []
 
     return render(request, "survey/survey_summary.html", context)
 
 
-
-def export_survey_pdf(request, survey_id):
+def survey_wordcloud(request, survey_id, key):
+    """
+    Image PNG du nuage de mots `key` (empreinte des fréquences de termes).
+    202 tant que le rendu (file des exports) n'est pas terminé ; une fois
+    écrite, l'image ne change plus : cache HTTP d'un an.
+    """
     survey = get_survey_or_404(request, survey_id)
-    responses = Response.objects.filter(question__survey=survey).select_related('respondent', 'question')
-    respondents = Respondent.objects.filter(survey=survey)
-
-    styles = getSampleStyleSheet()
-    elements = []
-
-    elements.append(Paragraph(f"📊 Rapport d’enquête : {survey.title}", styles["Title"]))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"Description : {survey.description}", styles["Normal"]))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"Nombre d’enquêteurs : {respondents.count()}", styles["Normal"]))
-    elements.append(Spacer(1, 12))
-
-    for question in survey.questions.all():
-        elements.append(Paragraph(f"• {question.text}", styles["Heading4"]))
-        answers = responses.filter(question=question)
-        if question.question_type == 'text':
-            for ans in answers:
-                if ans.answer_text:
-                    elements.append(Paragraph(f"- {ans.answer_text}", styles["Normal"]))
-        else:
-            elements.append(Paragraph(f"({answers.count()} réponses)", styles["Normal"]))
-        elements.append(Spacer(1, 10))
-
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    doc = SimpleDocTemplate(temp.name, pagesize=A4)
-    doc.build(elements)
+    if not WORDCLOUD_KEY.fullmatch(key):
+        raise Http404
+    path = wordclouds.path_for(survey.id, key)
+    if not path.exists():
+        frequencies = terms.survey_terms(survey)
+        if not frequencies or wordclouds.digest(frequencies) != key:
+            raise Http404
+        wordclouds.schedule(survey, key)
+        response = HttpResponse(status=202)
+        response["Retry-After"] = "1"
+        response["Cache-Control"] = "no-store"
+        return response
+
+    response = FileResponse(open(path, "rb"), content_type="image/png")
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
 
-    return FileResponse(open(temp.name, "rb"), as_attachment=True, filename=f"{survey.title}_rapport.pdf")
 
 
-def export_survey_excel(request, survey_id):
+def export_survey_pdf(request, survey_id):
     survey = get_survey_or_404(request, survey_id)
-    # Récupération des répondants classés par date
-    respondents = Respondent.objects.filter(survey=survey).order_by('-created_at')
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Données d'enquête"
-
-    # En-têtes sans l'ID unique
-    ws.append([
-        "Nom du Participant", 
-        "Enquêteur", 
-        "Date", 
-        "Question", 
-        "Réponse"
-    ])
-
-    for respondent in respondents:
-        # Optimisation pour récupérer les questions et les choix multiples d'un coup
-        responses = Response.objects.filter(respondent=respondent).select_related('question').prefetch_related('selected_choices')
-        
-        for response in responses:
-            # Traitement des réponses selon le type de question
-            if response.question.question_type in ["single", "multiple"]:
-                selected = ", ".join([c.text for c in response.selected_choices.all()])
-                answer = selected or "(Aucune sélection)"
-            else:
-                answer = response.answer_text or "(Vide)"
+    # rapport construit en mémoire (données agrégées, aucun fichier temporaire)
+    return FileResponse(
+        BytesIO(exports.survey_pdf_bytes(survey)),
+        as_attachment=True,
+        filename=f"{survey.title}_rapport.pdf",
+        content_type=exports.PDF_CONTENT_TYPE,
+    )
 
-            # Ajout de la ligne avec participant_name
-            ws.append([
-                respondent.participant_name or "Anonyme",
-                respondent.interviewer_name,
-                respondent.created_at.strftime("%d/%m/%Y %H:%M"),
-                response.question.text,
-                answer
-            ])
 
-    # Figer la ligne du haut pour faciliter la lecture lors du scroll
-    ws.freeze_panes = 'A2'
+def export_survey_excel(request, survey_id):
+    survey = get_survey_or_404(request, survey_id)
 
-    response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    # Classeur écrit en flux : une seule requête parcourue par lots,
+    # mémoire constante quel que soit le nombre de répondants
+    response = StreamingHttpResponse(
+        exports.stream_survey_xlsx(survey),
+        content_type=exports.XLSX_CONTENT_TYPE,
+    )
     filename = f"{survey.title}_export.xlsx"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    wb.save(response)
     return response
 
 
+def export_survey_wide(request, survey_id, fmt):
+    """
+    Export « large » : une ligne par répondant, une colonne par question
+    (colonnes 0/1 par choix pour les questions à choix multiple).
+    Formats : csv (flux), parquet, arrow (nécessitent pyarrow).
+    """
+    survey = get_survey_or_404(request, survey_id)
+    if fmt not in exports.WIDE_FORMATS:
+        raise Http404
+    content_type, extension = exports.WIDE_FORMATS[fmt]
+    filename = f"{survey.title}_export_large.{extension}"
+
+    if fmt == "csv":
+        response = StreamingHttpResponse(exports.stream_survey_wide_csv(survey), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    if exports.pyarrow is None:
+        return HttpResponse("Export Parquet/Arrow indisponible : pyarrow n'est pas installé.", status=501)
+
+    return FileResponse(
+        exports.survey_wide_columnar_file(survey, fmt),
+        as_attachment=True,
+        filename=filename,
+        content_type=content_type,
+    )
+
+
 def delete_all_responses(request, survey_id):
     survey = get_survey_or_404(request, survey_id)
 
     if request.method == "POST":
-        # supprime réponses et répondants
-        Response.objects.filter(respondent__survey=survey).delete()
-        Respondent.objects.filter(survey=survey).delete()
+        # supprime réponses et répondants (compteurs compris, en une transaction)
+        tallies.delete_respondents(
+            Respondent.objects.filter(survey=survey), responses=Response.objects.filter(survey=survey)
+        )
         messages.success(request, f"Toutes les réponses et enquêteurs pour '{survey.title}' ont été supprimés.")
         return redirect('survey_summary', survey_id=survey.id)
 
@@ -264,8 +223,7 @@ def delete_respondent(request, respondent_id):
     if not (request.user.is_staff or request.user.is_superuser or survey.owner == request.user):
         raise Http404
     if request.method == "POST":
-        Response.objects.filter(respondent=respondent).delete()
-        respondent.delete()
+        tallies.delete_respondents(Respondent.objects.filter(pk=respondent.pk))
         messages.success(request, f"L'enquêteur {respondent.interviewer_name} et ses réponses ont été supprimés.")
         return redirect('survey_summary', survey_id=survey.id)
 
@@ -278,66 +236,108 @@ def survey_detail(request, survey_id):
     questions = survey.questions.all()
     return render(request, 'survey/detail.html', {'survey': survey, 'questions': questions})
 
+def _valid_choice_ids(values, allowed):
+    """Ids de choix envoyés (chaînes) appartenant à `allowed`, sans doublon ; les autres sont ignorés."""
+    ids = []
+    for value in values:
+        try:
+            choice_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if choice_id in allowed and choice_id not in ids:
+            ids.append(choice_id)
+    return ids
+
+
+def _posted_text(request, name):
+    """Champ texte du formulaire, sans espaces autour ni caractère NUL (refusé par PostgreSQL)."""
+    return request.POST.get(name, '').replace("\x00", "").strip()
+
+
 def take_survey(request, survey_id):
+    # Pas de GET conditionnel ici : la page contient le jeton CSRF de la
+    # session, une page en cache (304) le rendrait obsolète après une
+    # connexion ou une rotation du cookie. L'API JSON garde ETag / 304.
+
     # On récupère le sondage (vue publique, pas besoin d'être owner)
     survey = get_public_survey_or_404(survey_id)
-    questions = survey.questions.all()
 
     if request.method == "POST":
         # On récupère le nom de l'enquêteur. 
-        # Si vide (cas du lien public), on met "Réponse en ligne"
-        interviewer_name = request.POST.get('interviewer_name', '').strip()
+        # Si vide (cas du lien public), on met "Réponse en ligne".
+        # Tronqué à la taille de la colonne : la soumission peut être mise en
+        # file et écrite plus tard, elle doit passer telle quelle en base
+        interviewer_name = _posted_text(request, 'interviewer_name')[:INTERVIEWER_NAME_MAX].strip()
         if not interviewer_name:
             interviewer_name = "Réponse en ligne"
 
-        # Création du répondant
-        respondent = Respondent.objects.create(
-            survey=survey,
-            interviewer_name=interviewer_name,
-            # Très important : on lie la réponse au compte de celui qui a créé le sondage
-            # même si le répondant n'est pas connecté
-            created_by=survey.owner 
-        )
+        # Identifiant de la soumission (généré par le navigateur) : un renvoi
+        # du même formulaire n'est enregistré qu'une fois
+        try:
+            submission_uuid = str(uuid.UUID(request.POST.get('submission_uuid') or str(uuid.uuid4())))
+        except ValueError:
+            return HttpResponse("Identifiant de soumission invalide.", status=400)
 
-        for question in questions:
-            field_name = f'question_{question.id}'
+        # Définition (questions et choix) lue dans le cache : les ids de choix
+        # envoyés sont validés contre les choix de chaque question, sans requête
+        answers = []
+        for question in cached_questions(survey):
+            field_name = f'question_{question["id"]}'
 
-            if question.question_type in ['single', 'multiple']:
+            if question["question_type"] in CHOICE_TYPES:
                 selected_choices = request.POST.getlist(field_name)
                 if selected_choices:
-                    response_obj = Response.objects.create(
-                        respondent=respondent,
-                        question=question
-                    )
-                    for choice_id in selected_choices:
-                        try:
-                            choice = Choice.objects.get(id=int(choice_id))
-                            response_obj.selected_choices.add(choice)
-                        except (Choice.DoesNotExist, ValueError):
-                            continue
+                    allowed = {choice["id"] for choice in question["choices"]}
+                    answers.append([question["id"], "", _valid_choice_ids(selected_choices, allowed)])
             else:
-                answer_text = request.POST.get(field_name, '').strip()
+                answer_text = _posted_text(request, field_name)
                 if answer_text:
-                    Response.objects.create(
-                        respondent=respondent,
-                        question=question,
-                        answer_text=answer_text
-                    )
+                    answers.append([question["id"], answer_text, []])
+
+        submission = {
+            "uuid": submission_uuid,
+            "survey_id": survey.id,
+            # Très important : on lie la réponse au compte de celui qui a créé le sondage
+            # même si le répondant n'est pas connecté
+            "owner_id": survey.owner_id,
+            "interviewer_name": interviewer_name,
+            "answers": answers,
+        }
+
+        if spool.enabled():
+            # Écriture différée : la soumission est mise en file, drain_submissions l'écrit
+            try:
+                spool.append(submission)
+            except spool.SpoolFull:
+                response = HttpResponse("Trop de réponses en attente, réessayez dans quelques instants.", status=503)
+                response["Retry-After"] = str(getattr(settings, "SUBMISSION_SPOOL_RETRY_AFTER", 30))
+                return response
+            respondent_id = None
+        else:
+            # Une seule unité de travail : répondant, réponses, choix et compteurs
+            # sont écrits ensemble ou pas du tout
+            with transaction.atomic():
+                respondent_id = ingest.write_submissions([submission]).get(submission_uuid)
+            if respondent_id is None:
+                return HttpResponse("Identifiant de soumission déjà utilisé pour une autre enquête.", status=409)
 
         # Si c'est une requête API (venant de React), on renvoie du JSON
         if request.headers.get('Content-Type') == 'application/json' or request.path.startswith('/api/'):
              return JsonResponse({
                  "status": "success", 
-                 "respondent_id": respondent.id,
+                 "respondent_id": respondent_id,
+                 "submission_uuid": submission_uuid,
+                 "queued": respondent_id is None,
                  "interviewer_name": interviewer_name
              })
 
         # Sinon, rendu classique Django (fallback)
         return render(request, 'survey/thanks.html', {'survey': survey})
 
+    # GET : définition (questions et choix en dict) lue dans le cache
     return render(request, 'survey/take_survey.html', {
         'survey': survey,
-        'questions': questions
+        'questions': cached_questions(survey)
     })
 
 
@@ -395,7 +395,6 @@ def survey_edit(request, survey_id):
                 for c in request.POST.getlist(f"new_choices_{i}[]"):
                     if c and c.strip():
                         Choice.objects.create(question=q, text=c.strip())
-
         return redirect("survey_detail", survey_id=survey.id)
 
     # On passe 'has_responses' au template pour pouvoir griser les champs en HTML
@@ -0,0 +1,101 @@
+# survey/wordclouds.py
+"""
+Nuages de mots du résumé, calculés hors de la requête.
+
+L'image est construite à partir des fréquences de termes déjà indexées
+(survey/terms.py, WordCloud.generate_from_frequencies) : elle est enregistrée
+sous WORDCLOUD_ROOT/<enquête>/<sha256 des fréquences>.png et servie par sa
+propre URL, avec un cache HTTP long (le contenu d'un nom de fichier ne change
+jamais).
+
+Le rendu passe par la file des exports (ExportJob au format « wordcloud »,
+traité par `manage.py export_worker`) : il survit à un redémarrage et n'est
+fait qu'une fois quel que soit le nombre de processus web. Le worker rend les
+fréquences courantes de l'enquête ; son nettoyage périodique (prune) ne garde
+que l'image la plus récente de chaque enquête.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import ExportJob, Survey
+from .terms import survey_terms
+
+WORDCLOUD = "wordcloud"  # ExportJob.format
+
+
+def root():
+    return Path(getattr(settings, "WORDCLOUD_ROOT", Path(settings.BASE_DIR) / "media" / "wordclouds"))
+
+
+def digest(frequencies):
+    """Empreinte des fréquences [(terme, n)] : nom du fichier image."""
+    return hashlib.sha256(json.dumps(sorted(frequencies), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def path_for(survey_id, key):
+    return root() / str(survey_id) / f"{key}.png"
+
+
+def render(target, frequencies):
+    """Génère l'image. Écriture atomique : fichier temporaire puis rename."""
+    from wordcloud import WordCloud
+
+    if target.exists():
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    cloud = WordCloud(width=600, height=400, background_color="white")
+    image = cloud.generate_from_frequencies(dict(frequencies)).to_image()
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, format="PNG")
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return target
+
+
+def schedule(survey, key):
+    """
+    Met en file le rendu du nuage de `survey` si l'image `key` n'existe pas et
+    qu'aucun rendu n'est déjà en attente. Retourne le job, ou None si l'image est prête.
+    """
+    if path_for(survey.id, key).exists():
+        return None
+    queued = ExportJob.objects.filter(survey=survey, format=WORDCLOUD, status__in=("pending", "running")).first()
+    return queued or ExportJob.objects.create(survey=survey, format=WORDCLOUD)
+
+
+def run(job):
+    """Rendu d'un job de la file (appelé par export_jobs.run) ; chemin de l'image, None sans termes."""
+    frequencies = survey_terms(job.survey)
+    if not frequencies:
+        return None
+    return render(path_for(job.survey_id, digest(frequencies)), frequencies)
+
+
+def prune():
+    """
+    Ne garde que l'image la plus récente de chaque enquête et supprime celles
+    des enquêtes supprimées. Retourne le nombre de fichiers supprimés.
+    """
+    directory = root()
+    if not directory.is_dir():
+        return 0
+    folders = [path for path in directory.iterdir() if path.is_dir() and path.name.isdigit()]
+    live = {str(pk) for pk in Survey.objects.filter(id__in=[int(f.name) for f in folders]).values_list("id", flat=True)}
+    removed = 0
+    for folder in folders:
+        images = sorted(folder.glob("*.png"), key=lambda path: path.stat().st_mtime)
+        for path in images[:-1] if folder.name in live else images:
+            path.unlink()
+            removed += 1
+        if folder.name not in live and not any(folder.iterdir()):
+            folder.rmdir()
+    return removed